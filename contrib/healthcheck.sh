@@ -13,6 +13,7 @@ elif [ ! -f /tmp/_background ] || [ $(( $(date +%s) - $(stat -c "%Y" /tmp/_backg
 	touch /tmp/_background
 
 	# avoid timeout, so only run housekeeping or these jobs
+	python3 /opt/app/manage.py send_digests
 	python3 /opt/app/manage.py send_hermine
 
 	rm /tmp/_background
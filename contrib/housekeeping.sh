@@ -14,5 +14,7 @@ fi
 
 echo "$(date) | Starting Housekeeping"
 ./manage.py clearsessions
+./manage.py archive_usages
+./manage.py update_termin_labels
 echo "$(date) | Finished Housekeeping"
 
@@ -7,11 +7,46 @@ echo -e "Starting Granian on \033[96m${BIND_HOST}\033[0m:\033[96m${PORT}\033[0m"
 
 export STATIC_URL="/static/"
 
+# restart background jobs when they exit, e.g. after losing the database
+supervise() {
+	while true; do
+		"$@"
+		echo "⚠️ $* exited with status $?, restarting in 10 seconds"
+		sleep 10
+	done
+}
+
+# keep data of the info monitors warm, so requests do not wait for them
+if [ "${MONITOR_REFRESH:-true}" = "true" ]; then
+	supervise ./manage.py monitor_refresh &
+fi
+
+# calendars are synced in their own loop, so slow CalDAV servers do not
+# delay the jobs of the healthcheck
+if [ -n "${RESERVIERUNG_CALDAV_URL}" ]; then
+	while true; do
+		./manage.py sync_caldav
+		sleep "${CALDAV_SYNC_INTERVAL:-300}"
+	done &
+fi
+
+# webhooks of Stein.app are only stored by the webserver
+if [ -n "${STEIN_API_KEY}" ]; then
+	supervise ./manage.py process_stein_webhooks &
+fi
+
+# streams of the info monitors keep their connections open, serve them
+# from the event loop of ASGI
+GRANIAN_INTERFACE="wsgi"
+if [ "${MONITOR_STREAM:-false}" = "true" ]; then
+	GRANIAN_INTERFACE="asgi"
+fi
+
 exec granian \
 	--host "${BIND_HOST}" \
 	--port "${PORT}" \
 	--static-path-route "${STATIC_URL%"/"}" \
 	--static-path-mount "${STATIC_ROOT}" \
-	--interface wsgi \
+	--interface "${GRANIAN_INTERFACE}" \
 	--no-ws \
-	kantine.wsgi:application
+	"kantine.${GRANIAN_INTERFACE}:application"
@@ -10,7 +10,13 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from granian.utils.proxies import wrap_asgi_with_proxy_headers
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kantine.settings')
 
 application = get_asgi_application()
+
+application = wrap_asgi_with_proxy_headers(
+    application,
+    trusted_hosts=os.environ.get("PROXY_SOURCE", "172.16.0.0/12").split(" "),
+)
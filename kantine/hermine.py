@@ -14,6 +14,8 @@ import time
 
 import requests
 
+from kantine.outbound import session
+
 try:
     import socketio
 except ModuleNotFoundError:
@@ -60,9 +62,8 @@ class StashCatClient:
         if include_auth:
             data["client_key"] = self.client_key
 
-        response = requests.post(f"{self.base_url}/{url}", data=data, headers=self.headers,
-                                 timeout=20,
-                                 **kwargs)
+        response = session.post(f"{self.base_url}/{url}", data=data, headers=self.headers,
+                                **kwargs)
         try:
             response.raise_for_status()
         except requests.RequestException as exception:
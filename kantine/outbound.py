@@ -0,0 +1,88 @@
+"""Shared HTTP session for requests to external services.
+
+Connections are kept alive in a pool per host, idempotent requests are
+retried with jittered backoff and every request gets a timeout and its
+duration is logged.
+"""
+
+from http.cookiejar import DefaultCookiePolicy
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from caldav.davclient import DAVClient
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# seconds to connect and to wait for data, may be given per request
+TIMEOUT = (
+    float(os.environ.get("OUTBOUND_CONNECT_TIMEOUT", 5)),
+    float(os.environ.get("OUTBOUND_READ_TIMEOUT", 20)),
+)
+# connections kept per host
+POOL_SIZE = 10
+
+# POST is not retried, messages must not be sent twice
+RETRY = Retry(
+    total=int(os.environ.get("OUTBOUND_RETRIES", 2)),
+    backoff_factor=0.5,
+    backoff_jitter=0.5,
+    status_forcelist=(429, 502, 503, 504),
+    raise_on_status=False,
+)
+
+
+class OutboundSession(requests.Session):
+    def __init__(self) -> None:
+        super().__init__()
+        # behave like plain requests, do not share cookies between services
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=RETRY)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", TIMEOUT)
+        host = urlsplit(url).hostname or ""
+        started = time.monotonic()
+        failed = True
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            _record(host, time.monotonic() - started, failed)
+
+
+def _record(host: str, seconds: float, failed: bool) -> None:
+    logger.debug("request to %s took %.3f s%s", host, seconds, " (failed)" if failed else "")
+
+
+class OutboundDAVClient(DAVClient):
+    def request(self, url, *args, **kwargs):
+        started = time.monotonic()
+        failed = True
+        try:
+            response = super().request(url, *args, **kwargs)
+            failed = response.status >= 500
+            return response
+        finally:
+            _record(urlsplit(str(url)).hostname or self.url.hostname or "", time.monotonic() - started, failed)
+
+
+session = OutboundSession()
+
+_dav_clients = threading.local()
+
+
+def get_dav_client(url: str = "") -> DAVClient:
+    """DAVClient for url, kept per thread to reuse its connections."""
+    clients = _dav_clients.__dict__.setdefault("clients", {})
+    if url not in clients:
+        clients[url] = OutboundDAVClient(url=url, timeout=TIMEOUT[1])
+    return clients[url]
@@ -126,9 +126,34 @@ DATABASES = {
         'NAME': _read_setting('DB_NAME',
                               '/tmp/db.sqlite3'  # nosec hardcoded_tmp_directory
                               if DB_TYPE == "sqlite3" else ''),
+        # SQLite does not support SELECT ... FOR UPDATE, so lock the database
+        # at the beginning of each transaction (see Resource.lock)
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'} if DB_TYPE == "sqlite3" else {},
+        # tests use an in-memory database otherwise, which can not be shared
+        # by threads of the concurrency tests
+        'TEST': {'NAME': '/tmp/test_db.sqlite3'  # nosec hardcoded_tmp_directory
+                 } if DB_TYPE == "sqlite3" else {},
     }
 }
 
+# Caches
+
+_MONITOR_CACHE_BACKEND = _read_setting("MONITOR_CACHE_BACKEND",
+                                      "django.core.cache.backends.locmem.LocMemCache")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # front tier of monitor.models.CacheItem, bounded LRU per worker unless
+    # configured to use a shared cache
+    "monitor": {
+        "BACKEND": _MONITOR_CACHE_BACKEND,
+        "LOCATION": _read_setting("MONITOR_CACHE_LOCATION", "monitor"),
+        "OPTIONS": {"MAX_ENTRIES": 256} if _MONITOR_CACHE_BACKEND.endswith(".LocMemCache") else {},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -216,6 +241,12 @@ STORAGES = {
 
 STATIC_URL = _read_setting("STATIC_URL", "/static/")
 STATIC_ROOT = _read_setting("STATIC_ROOT", BASE_DIR / "static")
+# monitor_refresh writes the data of all monitors below STATIC_ROOT, which is
+# fetched by the screens instead of asking django
+MONITOR_SNAPSHOTS = _read_setting("MONITOR_SNAPSHOTS", False, is_bool=True)
+# push data of the monitors to the screens as server-sent events, requires
+# running kantine.asgi (see contrib/start_webserver.sh)
+MONITOR_STREAM = _read_setting("MONITOR_STREAM", False, is_bool=True)
 
 MEDIA_URL = _read_setting("MEDIA_URL", "/media/")
 MEDIA_ROOT = _read_setting("MEDIA_ROOT", BASE_DIR / "media")
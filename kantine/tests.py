@@ -0,0 +1,26 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+import requests
+from requests.adapters import HTTPAdapter
+
+from kantine.outbound import TIMEOUT, session
+
+
+def fake_response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b""
+    return response
+
+
+class OutboundSessionTest(SimpleTestCase):
+    def test_timeout_and_samples(self):
+        with mock.patch.object(HTTPAdapter, "send", side_effect=[fake_response(200), fake_response(503)]) as send:
+            with self.assertLogs("kantine.outbound", "DEBUG") as logs:
+                session.get("https://stein.app/api/api/ext/assets/")
+                session.get("https://cloud.example.org/ocs/v2.php", timeout=3)
+
+        self.assertEqual([call.kwargs["timeout"] for call in send.call_args_list], [TIMEOUT, 3])
+        self.assertEqual([(record.args[0], record.args[2]) for record in logs.records],
+                         [("stein.app", ""), ("cloud.example.org", " (failed)")])
@@ -1,10 +1,10 @@
-import requests
 import os
 from functools import cached_property
 from typing import Any
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from kantine.hermine import get_hermine_client
+from kantine.outbound import session
 from login_hermine import models
 
 
@@ -58,9 +58,9 @@ class ExternalHermineClient:
         return f"user/{name}"
 
     def send(self, target, message):
-        requests.post(f"{self.root_url}{target}",
-                      data=message.encode("utf-8"),
-                      headers={"Content-Type": "text/plain; charset=utf-8"})
+        session.post(f"{self.root_url}{target}",
+                     data=message.encode("utf-8"),
+                     headers={"Content-Type": "text/plain; charset=utf-8"})
 
 
 class Command(BaseCommand):
@@ -1,10 +1,9 @@
 from datetime import timedelta
 
-import requests
-
+from kantine.outbound import session
 from .models import CacheItem
 
 
 @CacheItem.cache(expiration=timedelta(minutes=2))
 def query_announce(announce_url):
-    return requests.get(announce_url).json()
+    return session.get(announce_url).json()
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class MonitorConfig(AppConfig):
     name = 'monitor'
+
+    def ready(self) -> None:
+        # connect signals and update handlers pushing to streams
+        __import__("monitor.stream")
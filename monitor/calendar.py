@@ -1,22 +1,21 @@
 from datetime import datetime, timedelta
 
-from caldav.davclient import DAVClient
 import icalendar
 
+from kantine.outbound import get_dav_client
 from .models import CacheItem
 
 
 @CacheItem.cache(expiration=timedelta(minutes=5))
 def query_calendar(caldav_url, count):
-    with DAVClient() as client:
-        cal = client.calendar(url=caldav_url)
-        cal_events = cal.search(
-            start=datetime.now(),
-            end=datetime.now() + timedelta(days=90),  # will use only first count items
-            event=True,
-            expand=True,
-            sort_keys=("dtstart",)
-        )
+    cal = get_dav_client().calendar(url=caldav_url)
+    cal_events = cal.search(
+        start=datetime.now(),
+        end=datetime.now() + timedelta(days=90),  # will use only first count items
+        event=True,
+        expand=True,
+        sort_keys=("dtstart",)
+    )
 
     events = []
     for cal_event in cal_events:
@@ -0,0 +1,97 @@
+import argparse
+from datetime import timedelta
+import time
+import traceback
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from monitor.models import CacheItem
+from monitor.snapshots import write_snapshot
+from monitor.views import MONITORS
+
+
+class Command(BaseCommand):
+    help = "Aktualisiere die Datenquellen der Infomonitore vor ihrem Ablauf"
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--lead", type=int, default=30,
+            help="Sekunden vor dem Ablauf, zu denen eine Quelle aktualisiert "
+                 "wird. Standard: %(default)s")
+        parser.add_argument(
+            "--discover-interval", type=int, default=600,
+            help="Sekunden, nach denen die Monitore erneut abgefragt werden, "
+                 "um neue Quellen zu finden. Standard: %(default)s")
+        parser.add_argument(
+            "--snapshot-interval", type=int, default=30,
+            help="Sekunden, nach denen die Daten der Monitore erneut in ihre "
+                 "Dateien geschrieben werden, wenn MONITOR_SNAPSHOTS aktiv ist"
+                 ". Standard: %(default)s")
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Nur einmal fällige Quellen aktualisieren und beenden.")
+
+    def handle(self, *args, lead: int, discover_interval: int, snapshot_interval: int, once: bool,
+               **kwargs) -> None:
+        lead = timedelta(seconds=lead)
+        discovered_at = None
+        # key => time after which a source raising an unexpected error is retried
+        retry_at = {}
+
+        while True:
+            close_old_connections()
+
+            # datasources call their CacheItem sources with the current
+            # arguments, which are recorded in CacheItem.known_calls
+            if discovered_at is None or time.monotonic() - discovered_at > discover_interval:
+                for _, datasource in MONITORS.values():
+                    self._run(datasource)
+                discovered_at = time.monotonic()
+
+            now = timezone.now()
+            next_run = now + timedelta(seconds=discover_interval)
+            items = {item.key: item for item in CacheItem.objects.filter(
+                key__in=list(CacheItem.known_calls),
+            ).only("key", "expires", "has_error")}
+
+            for key, (source, source_args, source_kwargs) in list(CacheItem.known_calls.items()):
+                item = items.get(key)
+                # failures are retried after retry_after only
+                due = None if item is None else item.expires if item.has_error else item.expires - lead
+                due = max(filter(None, [due, retry_at.get(key)]), default=None)
+                if due is not None and due > now:
+                    next_run = min(next_run, due)
+                    continue
+
+                if not self._run(source, *source_args, force_update=True, **source_kwargs):
+                    retry_at[key] = now + lead
+                    next_run = min(next_run, retry_at[key])
+                    continue
+
+                retry_at.pop(key, None)
+                item = CacheItem.objects.only("expires", "has_error").filter(key=key).first()
+                if item is not None:
+                    next_run = min(next_run, item.expires if item.has_error else item.expires - lead)
+
+            if settings.MONITOR_SNAPSHOTS:
+                # data contains relative times, so write it regularly
+                for monitor_uuid, (_, datasource) in MONITORS.items():
+                    self._run(lambda: write_snapshot(monitor_uuid, datasource()))
+                next_run = min(next_run, timezone.now() + timedelta(seconds=snapshot_interval))
+
+            if once:
+                break
+
+            time.sleep(min(max((next_run - timezone.now()).total_seconds(), 1), discover_interval))
+
+    def _run(self, func, *args, **kwargs) -> bool:
+        # keep running if a single source is broken
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            self.stderr.write(traceback.format_exc())
+            return False
+        return True
@@ -0,0 +1,54 @@
+import argparse
+from datetime import timedelta
+import time
+import traceback
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from monitor.models import SteinWebhookEvent
+from monitor.stein_app import STEIN_BURST, STEIN_RATE, TokenBucket, process_webhook_events
+
+# processed webhooks are kept this long for debugging
+KEEP_PROCESSED = timedelta(days=7)
+
+
+class Command(BaseCommand):
+    help = "Verarbeite empfangene Webhooks von Stein.app"
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--interval", type=float, default=2,
+            help="Sekunden zwischen den Abfragen neuer Webhooks. Standard: %(default)s")
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Nur einmal offene Webhooks verarbeiten und beenden.")
+
+    def handle(self, *args, interval: float, once: bool, **kwargs) -> None:
+        bucket = TokenBucket(STEIN_RATE, STEIN_BURST)
+        cleaned_at = None
+
+        while True:
+            close_old_connections()
+
+            # keep running if a batch fails, its webhooks are retried
+            try:
+                # webhooks received meanwhile are handled together
+                done = process_webhook_events(bucket)
+                if done or once:
+                    self.stdout.write(self.style.SUCCESS(f"{done} Webhooks verarbeitet."))
+
+                if cleaned_at is None or time.monotonic() - cleaned_at > 60 * 60:
+                    SteinWebhookEvent.objects.filter(processed_at__lt=timezone.now() - KEEP_PROCESSED).delete()
+                    cleaned_at = time.monotonic()
+            except Exception:
+                if once:
+                    raise
+                self.stderr.write(traceback.format_exc())
+                done = 0
+
+            if once:
+                break
+            if not done:
+                time.sleep(interval)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0002_cacheitem_error_value_cacheitem_has_error_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cacheitem',
+            name='refreshing_until',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0004_steinwebhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SteinAsset',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('bu_id', models.PositiveIntegerField(db_index=True)),
+                ('label', models.CharField(max_length=200)),
+                ('category', models.CharField(max_length=200)),
+                ('group_id', models.PositiveIntegerField(null=True)),
+                ('status', models.CharField(max_length=16)),
+                ('reservation', models.BooleanField(default=False)),
+                ('comment', models.TextField(blank=True)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('last_modified_by', models.CharField(blank=True, max_length=200)),
+                ('status_since', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SteinAssetTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('changed_at', models.DateTimeField()),
+                ('status', models.CharField(blank=True, max_length=16)),
+                ('reservation', models.BooleanField(default=False)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='monitor.steinasset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['asset', 'changed_at'], name='monitor_ste_asset_i_21b288_idx')],
+            },
+        ),
+    ]
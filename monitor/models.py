@@ -2,9 +2,13 @@ from datetime import timedelta
 from functools import wraps
 from contextlib import suppress
 import hashlib
+import threading
 
-from django.db import models
+from django.core.cache import caches
+from django.db import connection, models, transaction
+from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 
 class CacheItem(models.Model):
@@ -15,6 +19,18 @@ class CacheItem(models.Model):
     # Note that receiving a TemporaryFailure with error_value None is different from receiving no error
     has_error = models.BooleanField(default=False)
     error_value = models.JSONField(default=None, null=True)
+    # set while one worker refreshes the expired item
+    refreshing_until = models.DateTimeField(null=True)
+
+    # Items are kept in the cache cache_alias in front of the database at most
+    # this long, so updates by other workers are picked up after this time
+    FRONT_MAX_AGE = timedelta(seconds=30)
+    # Other workers do not refresh an expired item for this long after one
+    # worker started refreshing it
+    REFRESH_LEASE = timedelta(minutes=2)
+    # key => (decorated function, args, kwargs) of all calls in this process,
+    # used by monitor_refresh
+    known_calls = {}
 
     class TemporaryFailure(Exception):
         def __init__(self, error_value, retry_after) -> None:
@@ -22,51 +38,97 @@ class CacheItem(models.Model):
             self.retry_after = retry_after
 
     @classmethod
-    def cache(cls, expiration: timedelta):
+    def cache(cls, expiration: timedelta, *, cache_alias: str = "monitor"):
+        """Cache results of func in the database.
+
+        Items valid in the database are also stored in the Django cache
+        cache_alias (see settings.CACHES), which is used first. Expired items
+        are returned as they are while one worker refreshes them in a
+        background thread. Update handlers are only called when the database
+        item changes.
+        """
         def decorator(func):
             def _build_cache_key(args, kwargs):
                 key = f"{func.__qualname__}#{args}#{sorted(kwargs.items())}"
                 return hashlib.sha256(key.encode()).hexdigest()
 
+            def _store_front(key, item):
+                timeout = min(item.expires - timezone.now(), cls.FRONT_MAX_AGE).total_seconds()
+                if timeout > 0:
+                    caches[cache_alias].set(f"cacheitem#{key}",
+                                            (item.has_error, item.value, item.error_value),
+                                            timeout)
+
+            def _refresh(key, args, kwargs, old_value):
+                try:
+                    result = func(*args, **kwargs)
+                except cls.TemporaryFailure as error:
+                    update_kwargs = {
+                        "has_error": True,
+                        "error_value": error.error_value,
+                        "expires": timezone.now() + error.retry_after,
+                    }
+                else:
+                    update_kwargs = {
+                        "value": result,
+                        "has_error": False,
+                        "expires": timezone.now() + expiration,
+                    }
+
+                item, _ = cls.objects.update_or_create(
+                    key=key,
+                    defaults={**update_kwargs, "refreshing_until": None},
+                )
+                _store_front(key, item)
+
+                if not item.has_error and old_value != item.value:
+                    for update_handler in func._update_handlers:
+                        update_handler(args, kwargs, old_value, item.value)
+
+                return item
+
+            def _refresh_in_background(key, args, kwargs, old_value):
+                def _run():
+                    # unexpected errors keep the lease until it runs out, so
+                    # failing sources are not queried on every request
+                    try:
+                        _refresh(key, args, kwargs, old_value)
+                    finally:
+                        connection.close()
+
+                threading.Thread(target=_run, name=f"refresh {func.__qualname__}", daemon=True).start()
+
             func._update_handlers = []
 
             @wraps(func)
             def wrapper(*args, force_update = False, **kwargs):
                 key = _build_cache_key(args, kwargs)
+                cls.known_calls[key] = (wrapper, args, kwargs)
+                if not force_update:
+                    front_item = caches[cache_alias].get(f"cacheitem#{key}")
+                    if front_item is not None:
+                        has_error, value, error_value = front_item
+                        return error_value if has_error else value
+
                 item = None
-                old_value = None
                 with suppress(cls.DoesNotExist):
                     item = cls.objects.get(key=key)
-                    old_value = item.value
 
-                if force_update or item is None or item.expires < timezone.now():
-                    try:
-                        result = func(*args, **kwargs)
-                    except cls.TemporaryFailure as error:
-                        update_kwargs = {
-                            "has_error": True,
-                            "error_value": error.error_value,
-                            "expires": timezone.now() + error.retry_after,
-                        }
-                    else:
-                        update_kwargs = {
-                            "value": result,
-                            "has_error": False,
-                            "expires": timezone.now() + expiration,
-                        }
-
-                    item, _ = cls.objects.update_or_create(
+                now = timezone.now()
+                if force_update or item is None:
+                    item = _refresh(key, args, kwargs, None if item is None else item.value)
+                elif item.expires < now:
+                    # serve the stale item, only the worker getting the lease refreshes it
+                    if cls.objects.filter(
+                        Q(refreshing_until__isnull=True) | Q(refreshing_until__lt=now),
                         key=key,
-                        defaults=update_kwargs,
-                    )
+                    ).update(refreshing_until=now + cls.REFRESH_LEASE):
+                        _refresh_in_background(key, args, kwargs, item.value)
+                else:
+                    _store_front(key, item)
 
                 if item.has_error:
                     return item.error_value
-
-                if old_value != item.value:
-                    for update_handler in func._update_handlers:
-                        update_handler(args, kwargs, old_value, item.value)
-
                 return item.value
 
             def _add_update_handler(handler):
@@ -77,3 +139,137 @@ class CacheItem(models.Model):
             return wrapper
 
         return decorator
+
+
+class SteinWebhookEvent(models.Model):
+    """Webhook of Stein.app, processed by the process_stein_webhooks command."""
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    # given by the url of the webhook
+    bu_id = models.IntegerField(null=True)
+    payload = models.JSONField()
+    attempts = models.PositiveIntegerField(default=0)
+    processed_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["received_at"], condition=Q(processed_at__isnull=True),
+                         name="steinwebhookevent_pending"),
+        ]
+
+
+class SteinAsset(models.Model):
+    """Last known state of an asset in Stein.app, see SteinAsset.store."""
+
+    # id of the asset in Stein.app
+    id = models.PositiveIntegerField(primary_key=True)
+    bu_id = models.PositiveIntegerField(db_index=True)
+    label = models.CharField(max_length=200)
+    category = models.CharField(max_length=200)
+    group_id = models.PositiveIntegerField(null=True)
+    status = models.CharField(max_length=16)
+    reservation = models.BooleanField(default=False)
+    comment = models.TextField(blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    last_modified_by = models.CharField(max_length=200, blank=True)
+    status_since = models.DateTimeField()
+    deleted_at = models.DateTimeField(null=True)
+
+    STORED_FIELDS = ["bu_id", "label", "category", "group_id", "status", "reservation", "comment",
+                     "last_modified", "last_modified_by", "status_since", "deleted_at"]
+
+    def as_stein_data(self) -> dict:
+        """Asset in the format of the Stein.app API."""
+        return {
+            "id": self.pk,
+            "buId": self.bu_id,
+            "label": self.label,
+            "category": self.category,
+            "groupId": self.group_id,
+            "status": self.status,
+            "operationReservation": self.reservation,
+            "comment": self.comment,
+            "lastModified": self.last_modified,
+            "lastModifiedBy": self.last_modified_by,
+        }
+
+    @classmethod
+    def store(cls, bu_id: int, assets: list[dict]) -> list[tuple[dict | None, dict | None]]:
+        """Store assets of bu_id as returned by the Stein.app API.
+
+        Only assets whose lastModified changed are written, changes of status
+        or reservation are recorded as SteinAssetTransition. Returns the
+        changed assets as pairs of old and new data (None if not existing).
+        """
+        now = timezone.now()
+        known_assets = {asset.pk: asset for asset in cls.objects.filter(
+            Q(bu_id=bu_id, deleted_at__isnull=True) | Q(pk__in=[data["id"] for data in assets]))}
+
+        changes = []
+        changed_assets = []
+        transitions = []
+        for data in assets:
+            asset = known_assets.pop(data["id"], None)
+            if asset is None:
+                # first seen, the last modification is the best guess for the start of its state
+                asset = cls(pk=data["id"], status_since=parse_datetime(data.get("lastModified") or "") or now)
+            elif (asset.deleted_at is None and asset.bu_id == bu_id
+                  and data.get("lastModified") and asset.last_modified == data["lastModified"]):
+                continue
+
+            old_data = None if asset._state.adding or asset.deleted_at else asset.as_stein_data()
+            reservation = data.get("operationReservation", False)
+            if old_data is None and not asset._state.adding:
+                # listed again after being deleted
+                asset.status_since = now
+            elif old_data is not None and (asset.status != data["status"] or asset.reservation != reservation):
+                asset.status_since = now
+
+            asset.bu_id = bu_id
+            asset.label = data["label"]
+            asset.category = data["category"]
+            asset.group_id = data.get("groupId")
+            asset.status = data["status"]
+            asset.reservation = reservation
+            asset.comment = data.get("comment") or ""
+            asset.last_modified = data.get("lastModified") or ""
+            asset.last_modified_by = data.get("lastModifiedBy") or ""
+            asset.deleted_at = None
+
+            if old_data is None or old_data["status"] != asset.status or old_data["operationReservation"] != reservation:
+                transitions.append(SteinAssetTransition(asset_id=asset.pk, changed_at=asset.status_since,
+                                                        status=asset.status, reservation=reservation))
+            changed_assets.append(asset)
+            changes.append((old_data, data))
+
+        # remaining assets of the BU are not listed anymore
+        for asset in known_assets.values():
+            if asset.deleted_at is not None or asset.bu_id != bu_id:
+                continue
+            changes.append((asset.as_stein_data(), None))
+            asset.deleted_at = asset.status_since = now
+            transitions.append(SteinAssetTransition(asset_id=asset.pk, changed_at=now, status="",
+                                                    reservation=False))
+            changed_assets.append(asset)
+
+        with transaction.atomic():
+            cls.objects.bulk_create(changed_assets, update_conflicts=True, unique_fields=["id"],
+                                    update_fields=cls.STORED_FIELDS)
+            SteinAssetTransition.objects.bulk_create(transitions)
+
+        return changes
+
+
+class SteinAssetTransition(models.Model):
+    """New status or reservation of a SteinAsset, kept for statistics."""
+
+    asset = models.ForeignKey(SteinAsset, on_delete=models.CASCADE, related_name="transitions")
+    changed_at = models.DateTimeField()
+    # empty if the asset was deleted
+    status = models.CharField(max_length=16, blank=True)
+    reservation = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["asset", "changed_at"]),
+        ]
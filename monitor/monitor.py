@@ -1,12 +1,17 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from datetime import date, datetime, timedelta
 
+from django.db import connection
+from django.db.models import Min
 from django.utils import timezone
 
 from reservierung.models import Resource
 from reservierung.templatetags.timerange import daterange_filter, timerange_filter, timedelta_until
 from .announce import query_announce
 from .calendar import query_calendar
+from .models import CacheItem, SteinAsset
 from .polls import query_polls
 from .stein_app import query_stein_assets
 
@@ -79,6 +84,7 @@ def build_stein():
     }
 
     assets = []
+    # keeps the stored assets up to date
     stein_data = query_stein_assets(int(buid))
 
     if stein_data is None:
@@ -90,17 +96,24 @@ def build_stein():
             "comment": "Datenabruf fehlgeschlagen",
         }]
 
-    for asset in stein_data:
-        if asset["status"] not in STEIN_STATES:
-            continue
-        status_prio, status_label, status_color = STEIN_STATES[asset["status"]]
+    # assets fetched before they were stored
+    if not SteinAsset.objects.filter(bu_id=int(buid)).exists():
+        SteinAsset.store(int(buid), stein_data)
+
+    for asset in SteinAsset.objects.filter(
+        bu_id=int(buid),
+        deleted_at__isnull=True,
+        status__in=STEIN_STATES,
+    ).order_by("label"):
+        status_prio, status_label, status_color = STEIN_STATES[asset.status]
 
         assets.append((status_prio, {
-            "label": asset["label"],
-            "category": asset["category"],
+            "label": asset.label,
+            "category": asset.category,
             "status_label": status_label,
             "status_color": status_color,
-            "comment": asset["comment"] or "",
+            "since": timezone.localtime(asset.status_since).strftime("seit %d.%m."),
+            "comment": asset.comment,
         }))
 
     return [data for _, data in sorted(assets, key=lambda item: item[0])]
@@ -197,11 +210,69 @@ def build_reservierung():
     ]
 
 
+# name => (builder, seconds to wait for it, value if it never succeeded)
+INFOMONITOR_SOURCES = {
+    "announce": (build_announce, 3, None),
+    "termine": (build_termine, 5, []),
+    "stein": (build_stein, 5, []),
+    "polls": (build_polls, 5, []),
+    "reservierung": (build_reservierung, 5, []),
+}
+
+_executor = ThreadPoolExecutor(max_workers=len(INFOMONITOR_SOURCES), thread_name_prefix="infomonitor")
+# name => last successful result of a builder
+_last_values = {}
+# name => Future of the running builder, shared by concurrent polls
+_running = {}
+
+
+# bounds of the refresh hint in seconds, data of the database and relative
+# times may change at any time
+MIN_REFRESH_IN = 5
+MAX_REFRESH_IN = 30
+
+
+def next_refresh_in() -> int:
+    """Seconds until the next source used in this process expires."""
+    now = timezone.now()
+    next_expires = CacheItem.objects.filter(
+        key__in=list(CacheItem.known_calls),
+        expires__gt=now,
+    ).aggregate(next_expires=Min("expires"))["next_expires"]
+    if next_expires is None:
+        return MAX_REFRESH_IN
+    return min(max(int((next_expires - now).total_seconds()) + 1, MIN_REFRESH_IN), MAX_REFRESH_IN)
+
+
+def _run_builder(name, builder):
+    try:
+        _last_values[name] = builder()
+    finally:
+        # threads of the pool are reused, do not keep connections open
+        connection.close()
+    return _last_values[name]
+
+
 def query_infomonitor():
-    return {
-        "announce": build_announce(),
-        "termine": build_termine(),
-        "stein": build_stein(),
-        "polls": build_polls(),
-        "reservierung": build_reservierung(),
-    }
+    """Run all builders concurrently.
+
+    Builders missing their deadline keep running in the background, their
+    last successful result is returned instead and they are listed in stale.
+    """
+    started = time.monotonic()
+    futures = {}
+    for name, (builder, _, _) in INFOMONITOR_SOURCES.items():
+        future = _running.get(name)
+        if future is None or future.done():
+            future = _running[name] = _executor.submit(_run_builder, name, builder)
+        futures[name] = future
+
+    data = {"stale": []}
+    for name, future in futures.items():
+        _, deadline, default = INFOMONITOR_SOURCES[name]
+        try:
+            data[name] = future.result(timeout=max(0, started + deadline - time.monotonic()))
+        except TimeoutError:
+            data[name] = _last_values.get(name, default)
+            data["stale"].append(name)
+    return data
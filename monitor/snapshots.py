@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# below STATIC_ROOT and STATIC_URL
+SNAPSHOT_DIR = "monitor/snapshots"
+
+# monitor uuid => hash of the last written snapshot
+_written_hashes = {}
+
+
+def content_hash(data) -> str:
+    return hashlib.sha256(json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()).hexdigest()
+
+
+def snapshot_path(monitor_uuid) -> Path:
+    return Path(settings.STATIC_ROOT) / SNAPSHOT_DIR / f"{monitor_uuid}.json"
+
+
+def snapshot_url(monitor_uuid) -> str:
+    return f"{settings.STATIC_URL}{SNAPSHOT_DIR}/{monitor_uuid}.json"
+
+
+def write_snapshot(monitor_uuid, data: dict) -> bool:
+    """Write data of a monitor as served by infomonitor_data to its file.
+
+    The data gets a hash of its content. The file is replaced atomically and
+    only if the content changed. Returns if the file was written.
+    """
+    data_hash = content_hash(data)
+    path = snapshot_path(monitor_uuid)
+    if _written_hashes.get(str(monitor_uuid)) == data_hash and path.exists():
+        return False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write next to the target, so screens never read a partial file
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as tmp_file:
+        try:
+            json.dump({**data, "hash": data_hash}, tmp_file, cls=DjangoJSONEncoder)
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+    os.chmod(tmp_file.name, 0o644)
+    os.replace(tmp_file.name, path)
+
+    _written_hashes[str(monitor_uuid)] = data_hash
+    return True
@@ -1,16 +1,20 @@
 import json
+import logging
 import os
 import time
 from collections import defaultdict
 from datetime import timedelta
 
+from django.core.cache import cache
 from django.http import Http404, JsonResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-import requests
 
+from kantine.outbound import session
 from login_hermine.utils import send_hermine_channel
-from .models import CacheItem
+from .models import CacheItem, SteinAsset, SteinWebhookEvent
 
+logger = logging.getLogger(__name__)
 
 STEIN_GROUPS = {
     1: "Fahrzeuge",
@@ -28,9 +32,18 @@ STEIN_STATES = {
     "maint": "In der Werkstatt",
 }
 
+# avoid rate limit by stein api: one request per second, short bursts allowed
+STEIN_RATE = 1.0
+STEIN_BURST = 3
+
+# assets rarely move to other BUs
+ASSET_BU_TIMEOUT = 24 * 60 * 60
+# webhooks failing this often are dropped
+WEBHOOK_MAX_ATTEMPTS = 5
+
 
 def _query_stein(url, **kwargs):
-    return requests.get(
+    return session.get(
         url,
         **kwargs,
         headers={
@@ -56,22 +69,20 @@ def query_stein_assets(bu_id: int, /):
 
 @query_stein_assets.on_update
 def update_stein_assets(args, kwargs, old_data, new_data):
-    if old_data is None:
+    bu_id, = args
+    # without stored assets all of them would be reported as new
+    initial = not SteinAsset.objects.filter(bu_id=bu_id).exists()
+    changed_assets = SteinAsset.store(bu_id, new_data)
+
+    if old_data is None or initial:
         return
 
     hermine_gruppe = os.environ.get("LUK_HERMINE_CHANNEL")
     if not hermine_gruppe:
         return
 
-    old_assets = {asset["id"]: asset for asset in old_data}
-    new_assets = {asset["id"]: asset for asset in new_data}
-    combined = {
-        asset_id: (old_assets.get(asset_id), new_assets.get(asset_id))
-        for asset_id in set().union(old_assets, new_assets)
-    }
-
     changes = defaultdict(list)
-    for asset_id, (old, new) in combined.items():
+    for old, new in changed_assets:
         if new is None:
             changes["Gelöscht"].append(f"{old['label']} ({old['category']}).")
             continue
@@ -124,31 +135,101 @@ def update_stein_assets(args, kwargs, old_data, new_data):
     send_hermine_channel(hermine_gruppe, f"[STEIN.APP] {change_message}")
 
 
-@csrf_exempt
-def view_webhook(request, bu_id=None):
-    if request.headers.get("X-Secret", "") != os.environ.get("STEIN_WEBHOOK_SECRET", ""):
-        raise Http404
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int, *, clock=time.monotonic, sleep=time.sleep) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
 
-    data = json.load(request)
-    print("rcvd stein webhook", bu_id, data, flush=True)
+    def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        while True:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            self.sleep((1 - self.tokens) / self.rate)
+
+
+def _remember_asset_bu_ids(bu_id, assets):
+    for asset in assets or []:
+        cache.set(f"stein_asset_bu#{asset['id']}", bu_id, ASSET_BU_TIMEOUT)
 
-    update_bu_ids = set()
 
+def _query_asset_bu_id(item, bucket):
+    bu_id = cache.get(f"stein_asset_bu#{item['id']}")
+    if bu_id is None:
+        bucket.acquire()
+        bu_id = _query_stein(item["url"])["buId"]
+        cache.set(f"stein_asset_bu#{item['id']}", bu_id, ASSET_BU_TIMEOUT)
+    return bu_id
+
+
+def _event_bu_ids(event, bucket):
     # avoid fetching of bu_ids if it is not necessary
-    if bu_id is not None:
-        update_bu_ids.add(bu_id)
-    else:
-        for item in data["items"]:
-            if item["type"] == "bu" and item["action"] == "update":
-                update_bu_ids.add(item["id"])
+    if event.bu_id is not None:
+        return {event.bu_id}
+
+    bu_ids = set()
+    for item in event.payload["items"]:
+        if item["type"] == "bu" and item["action"] == "update":
+            bu_ids.add(item["id"])
 
-            if item["type"] == "asset" and item["action"] == "update":
-                update_bu_ids.add(_query_stein(item["url"])["buId"])
+        if item["type"] == "asset" and item["action"] == "update":
+            bu_ids.add(_query_asset_bu_id(item, bucket))
+    return bu_ids
 
-            # avoid rate limit by stein api
-            time.sleep(1.0)
+
+def process_webhook_events(bucket: TokenBucket, limit: int = 100) -> int:
+    """Refresh the BUs of pending webhooks.
+
+    BUs of assets are looked up once and remembered, each BU is refreshed
+    once for all pending webhooks. All requests wait for bucket. Returns
+    the number of webhooks which are done, failed webhooks are retried.
+    """
+    events = list(SteinWebhookEvent.objects.filter(processed_at__isnull=True).order_by("pk")[:limit])
+
+    update_bu_ids = set()
+    failed_events = []
+    for event in events:
+        try:
+            update_bu_ids |= _event_bu_ids(event, bucket)
+        except (OSError, ValueError, KeyError):
+            failed_events.append(event)
 
     for bu_id in update_bu_ids:
-        query_stein_assets(bu_id, force_update=True)
+        bucket.acquire()
+        _remember_asset_bu_ids(bu_id, query_stein_assets(bu_id, force_update=True))
+
+    now = timezone.now()
+    SteinWebhookEvent.objects.filter(
+        pk__in=[event.pk for event in events if event not in failed_events],
+    ).update(processed_at=now)
+    done = len(events) - len(failed_events)
+    for event in failed_events:
+        event.attempts += 1
+        if event.attempts >= WEBHOOK_MAX_ATTEMPTS:
+            event.processed_at = now
+            done += 1
+        event.save(update_fields=["attempts", "processed_at"])
+
+    return done
+
+
+@csrf_exempt
+def view_webhook(request, bu_id=None):
+    if request.headers.get("X-Secret", "") != os.environ.get("STEIN_WEBHOOK_SECRET", ""):
+        raise Http404
+
+    data = json.load(request)
+    logger.debug("Received webhook of Stein.app for BU %s: %s", bu_id, data)
+
+    # requests to stein api are sent by process_stein_webhooks
+    SteinWebhookEvent.objects.create(bu_id=bu_id, payload=data)
 
     return JsonResponse({})
@@ -0,0 +1,170 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import suppress
+import itertools
+import json
+import logging
+import secrets
+import threading
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from reservierung.models import ResourceUsage, Termin
+from .announce import query_announce
+from .calendar import query_calendar
+from .monitor import next_refresh_in
+from .polls import query_polls
+from .snapshots import content_hash
+from .stein_app import query_stein_assets
+
+# seconds between comments keeping idle connections open
+KEEPALIVE = 15
+# number of events a reconnecting screen may resume from
+HISTORY = 32
+# screens reconnect after this many milliseconds
+RECONNECT_MS = 10000
+
+logger = logging.getLogger(__name__)
+
+# event ids of other processes or previous runs are never resumed
+_process_id = secrets.token_hex(4)
+_event_counter = itertools.count(1)
+
+# monitor uuid => MonitorChannel of this process
+_channels = {}
+_channels_lock = threading.Lock()
+
+
+class MonitorChannel:
+    """Data of one monitor, built once per change for all connected screens.
+
+    The data is rebuilt when a source or a reservation changes in this
+    process and at least when the next source expires, which picks up
+    changes made by other processes.
+    """
+
+    def __init__(self, datasource, loop: asyncio.AbstractEventLoop) -> None:
+        self.datasource = datasource
+        self.loop = loop
+        self.subscribers = 0
+        self.event_id = None
+        self.data = {}
+        self.stale = []
+        self.hashes = {}
+        # event id => section hashes sent with it
+        self.history = OrderedDict()
+        self._wake = asyncio.Event()
+        self._next_event = loop.create_future()
+        self._task = None
+
+    def wake(self) -> None:
+        # called from threads of sync views and sources
+        self.loop.call_soon_threadsafe(self._wake.set)
+
+    def _build(self):
+        try:
+            return self.datasource(), next_refresh_in()
+        finally:
+            # runs in a thread pool, do not keep connections open
+            connection.close()
+
+    async def _run(self) -> None:
+        while self.subscribers:
+            self._wake.clear()
+            try:
+                data, refresh_in = await sync_to_async(self._build, thread_sensitive=False)()
+            except Exception:
+                # keep screens connected, the next attempt may succeed
+                logger.exception("Building data of info monitor failed")
+                await asyncio.sleep(RECONNECT_MS / 1000)
+                continue
+            stale = data.pop("stale", [])
+            hashes = {name: content_hash(value)[:16] for name, value in data.items()}
+            if hashes != self.hashes or stale != self.stale:
+                self.data, self.stale, self.hashes = data, stale, hashes
+                self.event_id = f"{_process_id}-{next(_event_counter)}"
+                self.history[self.event_id] = hashes
+                while len(self.history) > HISTORY:
+                    self.history.popitem(last=False)
+
+                next_event, self._next_event = self._next_event, self.loop.create_future()
+                next_event.set_result(None)
+
+            with suppress(TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), refresh_in)
+
+    def _format_event(self, known_hashes: dict) -> str:
+        # same format as infomonitor_data, sections the screen has are left out
+        data = json.dumps({
+            **{name: value for name, value in self.data.items()
+               if known_hashes.get(name) != self.hashes[name]},
+            "stale": self.stale,
+            "hashes": self.hashes,
+        }, cls=DjangoJSONEncoder)
+        return f"id: {self.event_id}\ndata: {data}\n\n"
+
+    async def events(self, last_event_id: str | None):
+        self.subscribers += 1
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._run())
+
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            # resumed screens only get sections changed since their last event
+            sent_event_id = last_event_id if last_event_id in self.history else None
+            known_hashes = self.history.get(sent_event_id, {})
+            while True:
+                if self.event_id is not None and self.event_id != sent_event_id:
+                    event_id, hashes = self.event_id, self.hashes
+                    yield self._format_event(known_hashes)
+                    sent_event_id, known_hashes = event_id, hashes
+                    # the data may have changed while the event was sent
+                    continue
+
+                try:
+                    await asyncio.wait_for(asyncio.shield(self._next_event), KEEPALIVE)
+                except TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.subscribers -= 1
+
+
+async def stream_events(monitor_uuid: str, datasource, last_event_id: str | None):
+    # views may run in a temporary event loop when adapted for sync
+    # middlewares, the response is streamed by the loop of the server
+    loop = asyncio.get_running_loop()
+    with _channels_lock:
+        channel = _channels.get(monitor_uuid)
+        if channel is None or channel.loop is not loop:
+            channel = _channels[monitor_uuid] = MonitorChannel(datasource, loop)
+
+    async for event in channel.events(last_event_id):
+        yield event
+
+
+def notify_changed() -> None:
+    with _channels_lock:
+        channels = list(_channels.values())
+    for channel in channels:
+        if not channel.loop.is_closed():
+            channel.wake()
+
+
+@query_announce.on_update
+@query_calendar.on_update
+@query_polls.on_update
+@query_stein_assets.on_update
+def update_streams(args, kwargs, old_data, new_data) -> None:
+    notify_changed()
+
+
+@receiver(post_save, sender=Termin)
+@receiver(post_delete, sender=Termin)
+@receiver(post_save, sender=ResourceUsage)
+@receiver(post_delete, sender=ResourceUsage)
+def update_streams_for_reservierung(**_kwargs) -> None:
+    notify_changed()
@@ -1,3 +1,449 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from io import StringIO
+import json
+import os
+from pathlib import Path
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from monitor import snapshots, stream
+from monitor.models import CacheItem, SteinAsset, SteinAssetTransition, SteinWebhookEvent
+from monitor.stein_app import WEBHOOK_MAX_ATTEMPTS, TokenBucket, process_webhook_events, update_stein_assets
+from reservierung.models import Termin
+
+
+def make_source(results):
+    """Source cached by CacheItem returning (or raising) results in order."""
+    @CacheItem.cache(expiration=timedelta(minutes=60))
+    def source(name):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return source
+
+
+def isolate_cache_items(test):
+    """Start test without cached items and forget its calls afterwards."""
+    caches["monitor"].clear()
+    known_calls = mock.patch.dict(CacheItem.known_calls)
+    known_calls.start()
+    test.addCleanup(known_calls.stop)
+
+
+class CacheItemFrontTest(TestCase):
+    def setUp(self):
+        isolate_cache_items(self)
+
+    def test_hit_skips_database(self):
+        source = make_source(["a"])
+        self.assertEqual(source("x"), "a")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(source("x"), "a")
+
+    def test_force_update_rewrites_front(self):
+        source = make_source(["a", "b"])
+        source("x")
+
+        self.assertEqual(source("x", force_update=True), "b")
+        with self.assertNumQueries(0):
+            self.assertEqual(source("x"), "b")
+        self.assertEqual(CacheItem.objects.get().value, "b")
+
+    def test_temporary_failure_expires_early(self):
+        source = make_source(["a", CacheItem.TemporaryFailure("kaputt", timedelta(seconds=5))])
+        front = caches["monitor"]
+
+        with mock.patch.object(front, "set", wraps=front.set) as set_:
+            self.assertEqual(source("x"), "a")
+            self.assertEqual(source("x", force_update=True), "kaputt")
+
+        (_, value, timeout), (_, error, error_timeout) = [call.args for call in set_.call_args_list]
+        self.assertEqual((value, timeout), ((False, "a", None), CacheItem.FRONT_MAX_AGE.total_seconds()))
+        self.assertEqual(error, (True, "a", "kaputt"))
+        self.assertGreater(error_timeout, 0)
+        self.assertLessEqual(error_timeout, 5)
+        self.assertEqual(source("x"), "kaputt")
+
+
+class CacheItemRefreshTest(TransactionTestCase):
+    def setUp(self):
+        isolate_cache_items(self)
+
+        # background refreshes are run by the test
+        self.refreshes = []
+        thread = mock.patch("monitor.models.threading.Thread")
+        thread.start().side_effect = lambda target, **kwargs: mock.Mock(
+            start=lambda: self.refreshes.append(target))
+        self.addCleanup(thread.stop)
+
+    def expire(self, **kwargs):
+        CacheItem.objects.update(expires=timezone.now() - timedelta(seconds=1), **kwargs)
+        caches["monitor"].clear()
+
+    def test_stale_item_is_served_during_refresh(self):
+        source = make_source(["a", "b"])
+        source("x")
+        self.expire()
+
+        self.assertEqual([source("x") for _ in range(3)], ["a"] * 3)
+        self.assertEqual(len(self.refreshes), 1)
+        self.assertIsNotNone(CacheItem.objects.get().refreshing_until)
+
+        self.refreshes.pop()()
+        item = CacheItem.objects.get()
+        self.assertEqual((item.value, item.refreshing_until), ("b", None))
+        self.assertGreater(item.expires, timezone.now())
+        self.assertEqual(source("x"), "b")
+
+    def test_expired_lease_is_taken_over(self):
+        source = make_source(["a", "b"])
+        source("x")
+        self.expire(refreshing_until=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual(source("x"), "a")
+        self.assertEqual(self.refreshes, [])
+
+        self.expire(refreshing_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(source("x"), "a")
+        self.assertEqual(len(self.refreshes), 1)
+        self.refreshes.pop()()
+        self.assertEqual(source("x"), "b")
+
+    def test_update_handlers(self):
+        source = make_source(["a", "a", CacheItem.TemporaryFailure(None, timedelta(minutes=1)), "b"])
+        handler = mock.Mock()
+        source.on_update(handler)
+
+        source("x")
+        handler.assert_called_once_with(("x",), {}, None, "a")
+
+        handler.reset_mock()
+        source("x", force_update=True)
+        source("x", force_update=True)
+        handler.assert_not_called()
+
+        # the value of the failed refresh is kept
+        source("x", force_update=True)
+        handler.assert_called_once_with(("x",), {}, "a", "b")
+
+
+class MonitorRefreshTest(TransactionTestCase):
+    class Sleeping(Exception):
+        pass
+
+    def setUp(self):
+        isolate_cache_items(self)
+        monitors = mock.patch.dict("monitor.management.commands.monitor_refresh.MONITORS", clear=True)
+        monitors.start()
+        self.addCleanup(monitors.stop)
+
+    def run_once(self):
+        """Seconds the command sleeps after one pass."""
+        with mock.patch("monitor.management.commands.monitor_refresh.time.sleep",
+                        side_effect=self.Sleeping) as sleep, self.assertRaises(self.Sleeping):
+            call_command("monitor_refresh", "--lead=30", stdout=StringIO(), stderr=StringIO())
+        (seconds,), _ = sleep.call_args
+        return seconds
+
+    def test_refresh_before_expiry(self):
+        results = ["a", "b"]
+        source = make_source(results)
+        source("x")
+
+        CacheItem.objects.update(expires=timezone.now() + timedelta(seconds=100))
+        self.assertAlmostEqual(self.run_once(), 70, delta=2)
+        self.assertEqual(results, ["b"])
+
+        CacheItem.objects.update(expires=timezone.now() + timedelta(seconds=20))
+        self.assertAlmostEqual(self.run_once(), 600, delta=2)
+        self.assertEqual(results, [])
+        self.assertEqual(CacheItem.objects.get().value, "b")
+
+    def test_failure_waits_for_retry_after(self):
+        results = [CacheItem.TemporaryFailure(None, timedelta(seconds=10)), "a"]
+        source = make_source(results)
+        source("x")
+
+        # failures are not refreshed ahead of their expiry
+        self.assertAlmostEqual(self.run_once(), 10, delta=2)
+        self.assertEqual(results, ["a"])
+
+        CacheItem.objects.update(expires=timezone.now() - timedelta(seconds=1))
+        self.run_once()
+        self.assertEqual(CacheItem.objects.get().value, "a")
+
+
+class SnapshotTest(SimpleTestCase):
+    monitor_uuid = "e1d2c073-1833-4cd0-9c72-0222b122bac9"
+
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        settings = override_settings(STATIC_ROOT=static_root.name, STATIC_URL="/static/")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        written_hashes = mock.patch.dict(snapshots._written_hashes, clear=True)
+        written_hashes.start()
+        self.addCleanup(written_hashes.stop)
+        self.directory = Path(static_root.name) / "monitor" / "snapshots"
+
+    def test_write_snapshot(self):
+        data = {"termine": [{"label": "Dienstabend"}], "stale": []}
+
+        with mock.patch("monitor.snapshots.os.replace", wraps=os.replace) as replace:
+            self.assertTrue(snapshots.write_snapshot(self.monitor_uuid, data))
+
+        # written next to the target and moved in place
+        (tmp_name, target), _ = replace.call_args
+        self.assertEqual(Path(tmp_name).parent, self.directory)
+        self.assertEqual(Path(target), self.directory / f"{self.monitor_uuid}.json")
+        self.assertEqual(os.listdir(self.directory), [f"{self.monitor_uuid}.json"])
+        self.assertEqual(json.loads(Path(target).read_text()),
+                         {**data, "hash": snapshots.content_hash(data)})
+        self.assertEqual(snapshots.snapshot_url(self.monitor_uuid),
+                         f"/static/monitor/snapshots/{self.monitor_uuid}.json")
+
+        # unchanged data is not written again
+        with mock.patch("monitor.snapshots.os.replace") as replace:
+            self.assertFalse(snapshots.write_snapshot(self.monitor_uuid, dict(reversed(data.items()))))
+        replace.assert_not_called()
+
+    def test_failed_write_keeps_snapshot(self):
+        snapshots.write_snapshot(self.monitor_uuid, {"stale": []})
+        path = self.directory / f"{self.monitor_uuid}.json"
+        content = path.read_text()
+
+        with mock.patch("monitor.snapshots.json.dump", side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                snapshots.write_snapshot(self.monitor_uuid, {"stale": ["termine"]})
+
+        self.assertEqual(path.read_text(), content)
+        self.assertEqual(os.listdir(self.directory), [f"{self.monitor_uuid}.json"])
+
+
+class InfomonitorDataTest(TestCase):
+    monitor_uuid = "e1d2c073-1833-4cd0-9c72-0222b122bac9"
+
+    def setUp(self):
+        data = {"termine": [{"label": "Dienstabend"}], "stein": [], "stale": ["polls"]}
+        monitors = mock.patch.dict("monitor.views.MONITORS", {
+            self.monitor_uuid: ("monitor/infomonitor.html", lambda: dict(data)),
+        })
+        monitors.start()
+        self.addCleanup(monitors.stop)
+        self.url = reverse("monitor:data", args=(self.monitor_uuid,))
+
+    def test_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["stale"], ["polls"])
+        self.assertEqual(response["X-Next-Refresh-In"], str(response.json()["next_refresh_in"]))
+
+        response = self.client.get(self.url, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("X-Next-Refresh-In", response)
+
+        response = self.client.get(self.url, headers={"If-None-Match": '"outdated"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_known_sections(self):
+        hashes = self.client.get(self.url).json()["hashes"]
+
+        data = self.client.get(self.url, {"have": [hashes["termine"]]}).json()
+        self.assertNotIn("termine", data)
+        self.assertEqual(data["stein"], [])
+        self.assertEqual(data["hashes"], hashes)
+
+
+class StreamEventsTest(TestCase):
+    monitor_uuid = "e1d2c073-1833-4cd0-9c72-0222b122bac9"
+
+    def setUp(self):
+        channels = mock.patch.dict(stream._channels, clear=True)
+        channels.start()
+        self.addCleanup(channels.stop)
+        # rebuild on changes only
+        refresh_in = mock.patch("monitor.stream.next_refresh_in", return_value=60)
+        refresh_in.start()
+        self.addCleanup(refresh_in.stop)
+
+    async def receive(self, events):
+        """Event id and data of the next event."""
+        event = await asyncio.wait_for(anext(events), 5)
+        fields = dict(line.split(": ", 1) for line in event.strip().split("\n"))
+        return fields["id"], json.loads(fields["data"])
+
+    async def test_events(self):
+        sections = {"termine": [{"label": "Dienstabend"}], "stein": []}
+        datasource = mock.Mock(side_effect=lambda: {**sections, "stale": []})
+        screens = [stream.stream_events(self.monitor_uuid, datasource, None) for _ in range(2)]
+
+        try:
+            for events in screens:
+                self.assertEqual(await anext(events), f"retry: {stream.RECONNECT_MS}\n\n")
+            (first_id, first), (other_id, other) = [await self.receive(events) for events in screens]
+            self.assertEqual(first_id, other_id)
+            self.assertEqual(first, other)
+            self.assertEqual(first["termine"], [{"label": "Dienstabend"}])
+            self.assertEqual(first["stein"], [])
+            self.assertEqual(datasource.call_count, 1)
+
+            # only the changed section is sent again
+            sections["stein"] = [{"label": "MTW"}]
+            now = timezone.now()
+            await sync_to_async(Termin.objects.create)(label="Übung", start=now, end=now + timedelta(hours=2))
+            for events in screens:
+                second_id, second = await self.receive(events)
+                self.assertNotIn("termine", second)
+                self.assertEqual(second["stein"], [{"label": "MTW"}])
+                self.assertEqual(second["hashes"].keys(), {"termine", "stein"})
+            self.assertEqual(datasource.call_count, 2)
+
+            # resumed screens get the sections changed since their last event
+            resumed = stream.stream_events(self.monitor_uuid, datasource, first_id)
+            screens.append(resumed)
+            await anext(resumed)
+            resumed_id, data = await self.receive(resumed)
+            self.assertEqual(resumed_id, second_id)
+            self.assertEqual(data, second)
+            self.assertEqual(datasource.call_count, 2)
+        finally:
+            for events in screens:
+                await events.aclose()
+            stream._channels[self.monitor_uuid]._task.cancel()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ProcessWebhookEventsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(1.0, 1, clock=self.clock, sleep=self.clock.sleep)
+
+        self.asset_requests = []
+        query_stein = mock.patch("monitor.stein_app._query_stein", side_effect=self.query_asset)
+        query_stein.start()
+        self.addCleanup(query_stein.stop)
+        query_assets = mock.patch("monitor.stein_app.query_stein_assets", return_value=[{"id": 11}, {"id": 12}])
+        self.query_assets = query_assets.start()
+        self.addCleanup(query_assets.stop)
+
+    def query_asset(self, url):
+        self.asset_requests.append(url)
+        return {"buId": 5}
+
+    def create_event(self, *items, bu_id=None):
+        return SteinWebhookEvent.objects.create(bu_id=bu_id, payload={"items": [
+            {"type": item_type, "action": "update", "id": item_id,
+             "url": f"https://stein.app/api/api/ext/assets/{item_id}"}
+            for item_type, item_id in items
+        ]})
+
+    def test_one_refresh_per_bu(self):
+        self.create_event(bu_id=5)
+        self.create_event(("bu", 5))
+        self.create_event(("asset", 11), ("asset", 11))
+
+        self.assertEqual(process_webhook_events(self.bucket), 3)
+
+        self.query_assets.assert_called_once_with(5, force_update=True)
+        self.assertEqual(self.asset_requests, ["https://stein.app/api/api/ext/assets/11"])
+        self.assertFalse(SteinWebhookEvent.objects.filter(processed_at__isnull=True).exists())
+        # the refresh waited for the asset request
+        self.assertEqual(self.clock.sleeps, [1.0])
+
+    def test_asset_bu_is_remembered(self):
+        self.create_event(("bu", 5))
+        process_webhook_events(self.bucket)
+
+        # assets of refreshed BUs are known
+        self.create_event(("asset", 12))
+        self.assertEqual(process_webhook_events(self.bucket), 1)
+        self.assertEqual(self.asset_requests, [])
+        self.assertEqual(self.query_assets.call_count, 2)
+
+    def test_failed_events(self):
+        event = self.create_event(("asset", 13))
+
+        with mock.patch("monitor.stein_app._query_stein", side_effect=OSError("Connection refused")):
+            for attempt in range(1, WEBHOOK_MAX_ATTEMPTS):
+                self.assertEqual(process_webhook_events(self.bucket), 0)
+                event.refresh_from_db()
+                self.assertEqual((event.attempts, event.processed_at), (attempt, None))
+
+            # dropped after the last attempt
+            self.assertEqual(process_webhook_events(self.bucket), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, WEBHOOK_MAX_ATTEMPTS)
+        self.assertIsNotNone(event.processed_at)
+        self.query_assets.assert_not_called()
+
+
+def stein_asset(asset_id, label, status="ready", last_modified="2026-10-01T08:00:00Z", **data):
+    return {"id": asset_id, "buId": 5, "label": label, "category": "Fahrzeug", "groupId": 1,
+            "status": status, "operationReservation": False, "comment": "",
+            "lastModified": last_modified, "lastModifiedBy": "Alice A", **data}
+
+
+class SteinAssetTest(TestCase):
+    def setUp(self):
+        self.assets = [stein_asset(1, "MTW"), stein_asset(2, "GKW")]
+
+    def test_store(self):
+        self.assertEqual(SteinAsset.store(5, self.assets), [(None, asset) for asset in self.assets])
+        self.assertEqual(SteinAssetTransition.objects.count(), 2)
+
+        # unchanged assets are not written
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(SteinAsset.store(5, self.assets), [])
+        self.assertFalse([query["sql"] for query in queries.captured_queries
+                          if query["sql"].startswith(("INSERT", "UPDATE"))])
+
+        changed = stein_asset(1, "MTW", status="maint", last_modified="2026-10-02T08:00:00Z")
+        self.assertEqual(SteinAsset.store(5, [changed]), [(self.assets[0], changed), (self.assets[1], None)])
+        self.assertEqual(list(SteinAssetTransition.objects.filter(asset=1).values_list("status", flat=True)),
+                         ["ready", "maint"])
+        self.assertEqual(list(SteinAssetTransition.objects.filter(asset=2).values_list("status", flat=True)),
+                         ["ready", ""])
+        self.assertIsNotNone(SteinAsset.objects.get(pk=2).deleted_at)
+
+    @mock.patch.dict(os.environ, {"LUK_HERMINE_CHANNEL": "luk"})
+    @mock.patch("monitor.stein_app.send_hermine_channel")
+    def test_first_store_is_silent(self, send_hermine_channel):
+        # the first data of a BU is not reported as new assets, even if the
+        # source had a value before
+        update_stein_assets((5,), {}, [], self.assets)
+        send_hermine_channel.assert_not_called()
+        self.assertEqual(SteinAsset.objects.count(), 2)
+
+        changed = stein_asset(1, "MTW", status="maint", last_modified="2026-10-02T08:00:00Z")
+        update_stein_assets((5,), {}, self.assets, [changed, self.assets[1]])
+        send_hermine_channel.assert_called_once()
+        channel, message = send_hermine_channel.call_args.args
+        self.assertEqual(channel, "luk")
+        self.assertIn("MTW (Fahrzeug) (von Einsatzbereit, kein Kommentar angegeben).", message)
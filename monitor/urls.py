@@ -9,6 +9,9 @@ urlpatterns = [
     path("data/<uuid:monitor_uuid>",
          views.infomonitor_data,
          name="data"),
+    path("stream/<uuid:monitor_uuid>",
+         views.infomonitor_stream,
+         name="stream"),
     path("hook/stein.app/<int:bu_id>",
          stein_app.view_webhook),
     path("hook/stein.app",
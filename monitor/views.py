@@ -1,8 +1,11 @@
-from django.http import Http404, JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.views.generic import TemplateView
 
-from .monitor import query_infomonitor
+from .monitor import next_refresh_in, query_infomonitor
+from .snapshots import content_hash, snapshot_url
+from .stream import stream_events
 
 
 MONITORS = {
@@ -20,7 +23,12 @@ class InfoMonitorView(TemplateView):
 
     def get_context_data(self, monitor_uuid):
         context = super().get_context_data()
-        context["data_url"] = reverse("monitor:data", args=(monitor_uuid,))
+        if settings.MONITOR_SNAPSHOTS:
+            context["data_url"] = snapshot_url(monitor_uuid)
+        else:
+            context["data_url"] = reverse("monitor:data", args=(monitor_uuid,))
+        if settings.MONITOR_STREAM:
+            context["stream_url"] = reverse("monitor:stream", args=(monitor_uuid,))
         return context
 
 
@@ -30,4 +38,44 @@ def infomonitor_data(request, monitor_uuid):
     except KeyError as error:
         raise Http404 from error
 
-    return JsonResponse(datasource())
+    data = datasource()
+    stale = data.pop("stale", [])
+    hashes = {name: content_hash(value)[:16] for name, value in data.items()}
+    etag = f'"{content_hash([hashes, stale])[:32]}"'
+    refresh_in = next_refresh_in()
+
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        # leave out sections the client already has
+        known_hashes = set(request.GET.getlist("have"))
+        response = JsonResponse({
+            **{name: value for name, value in data.items() if hashes[name] not in known_hashes},
+            "stale": stale,
+            "hashes": hashes,
+            "next_refresh_in": refresh_in,
+        })
+
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    response["X-Next-Refresh-In"] = str(refresh_in)
+    return response
+
+
+async def infomonitor_stream(request, monitor_uuid):
+    # streams keep their connection open, which requires running as ASGI
+    if not settings.MONITOR_STREAM:
+        raise Http404
+    try:
+        _, datasource = MONITORS[str(monitor_uuid)]
+    except KeyError as error:
+        raise Http404 from error
+
+    response = StreamingHttpResponse(
+        stream_events(str(monitor_uuid), datasource, request.headers.get("Last-Event-ID")),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # do not buffer events in a reverse proxy
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,12 +1,22 @@
-from django.contrib import admin
+import csv
+from datetime import datetime, time
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.urls import path, reverse_lazy
+from django.utils import timezone
+from django.views.generic import FormView
+import icalendar
 
-from . import models
+from . import models, views
 from .templatetags.timerange import timerange_filter
 
 
 @admin.register(models.User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ("username", "surname", "firstname")
+    list_display = ("username", "surname", "firstname", "digest")
+    list_filter = ("digest",)
 
 
 class ResourceUsageInline(admin.StackedInline):
@@ -15,6 +25,232 @@ class ResourceUsageInline(admin.StackedInline):
     fields = ("approved_at", "rejected_at", "rejected_by", "resource")
 
 
+class ImportTermineForm(forms.Form):
+    file = forms.FileField(
+        label="Datei",
+        help_text="CSV-Datei (Trennzeichen Semikolon) mit den Spalten Bezeichner, Start, Ende, Ressourcen "
+                  "und optional Beschreibung, Zeitpunkte im Format TT.MM.JJJJ HH:MM. Alternativ eine "
+                  "ICS-Datei, deren Kategorien die Ressourcen angeben. Ressourcen werden über ihr Kürzel "
+                  "angegeben und durch Leerzeichen getrennt.",
+    )
+    owner = forms.ModelChoiceField(models.User.objects, label="Eigentümer")
+    confirm_warnings = forms.BooleanField(
+        label="Warnungen ignorieren",
+        required=False,
+    )
+
+
+class ImportTermineView(FormView):
+    model_admin = None
+    form_class = ImportTermineForm
+    template_name = "admin/reservierung/termin/import.html"
+    success_url = reverse_lazy("admin:reservierung_termin_changelist")
+
+    def get_context_data(self, **kwargs):
+        return {**admin.site.each_context(self.request),
+                "title": "Termine importieren",
+                **super().get_context_data(**kwargs)}
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.model_admin.has_add_permission(request):
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        # keep locks of form_valid until all changes are committed
+        with transaction.atomic():
+            return super().post(*args, **kwargs)
+
+    def form_valid(self, form):
+        owner = form.cleaned_data["owner"]
+        upload = form.cleaned_data["file"]
+
+        # rows are read while validating them, only the Termine are kept
+        if upload.name.lower().endswith(".ics"):
+            rows = self._read_ics(upload)
+        else:
+            rows = self._read_csv(upload)
+
+        try:
+            termine, errors, warnings = self._validate_rows(rows, owner)
+        except (ValueError, KeyError) as exception:
+            form.add_error("file", str(exception))
+            return self.form_invalid(form)
+
+        for error in errors:
+            form.add_error("file", error)
+        if errors:
+            return self.form_invalid(form)
+
+        if not termine:
+            form.add_error("file", "Keine Termine für Import gefunden.")
+            return self.form_invalid(form)
+
+        # serialise with concurrent bookings before looking for conflicts
+        all_resources = {resource for _, _, termin_resources in termine for resource in termin_resources}
+        models.Resource.lock(all_resources)
+        warnings.extend(self._find_conflicts(termine))
+
+        if warnings and not form.cleaned_data["confirm_warnings"]:
+            for line, message in sorted(warnings):
+                form.add_error("file", f"Zeile {line}: {message}")
+            return self.form_invalid(form)
+
+        # inform each manager once for the whole import
+        notifications = models.UsageNotifications()
+        created_termine = views.create_termine(
+            [(termin, termin_resources) for _, termin, termin_resources in termine],
+            owner, notifications)
+        notifications.send()
+
+        self.model_admin.message_user(
+            self.request,
+            f"{len(created_termine)} Termine importiert.",
+            messages.SUCCESS,
+        )
+
+        return super().form_valid(form)
+
+    @staticmethod
+    def _validate_rows(rows, owner):
+        """Return Termine with their resources, errors and warnings of rows."""
+        resources = models.Resource.objects.in_bulk(field_name="slug")
+        errors = []
+        warnings = []
+        termine = []
+        for line, label, description, start, end, slugs in rows:
+            unknown_slugs = [slug for slug in slugs if slug not in resources]
+            if unknown_slugs:
+                errors.append(f"Zeile {line}: Unbekannte Ressourcen {', '.join(unknown_slugs)}.")
+                continue
+
+            # apply rules of TerminForm, conflicts are checked batched below
+            termin_form = views.TerminForm(data={
+                "label": label,
+                "description": description,
+                "start": start,
+                "end": end,
+                "resources": [str(resources[slug].pk) for slug in slugs],
+                "confirm_warnings": True,
+            }, check_conflicts=False)
+            if not termin_form.is_valid():
+                errors.extend(f"Zeile {line}: {message}"
+                              for field_errors in termin_form.errors.values() for message in field_errors)
+                continue
+
+            termin_resources = [resources[slug] for slug in slugs]
+            for resource in termin_resources:
+                if not resource.selectable:
+                    errors.append(f"Zeile {line}: Die Ressource {resource.label} kann nicht gebucht werden.")
+            termine.append((line, models.Termin(label=label, description=description, owner=owner,
+                                                start=start, end=end), termin_resources))
+            warnings.extend((line, message) for _, message in termin_form.warnings)
+
+        return termine, errors, warnings
+
+    @staticmethod
+    def _find_conflicts(termine):
+        """List (line, message) for Termine blocked by usages or other lines."""
+        # query conflicts once per resource for all Termine
+        resource_termine = {}
+        for line, termin, termin_resources in termine:
+            for resource in termin_resources:
+                resource_termine.setdefault(resource, []).append((line, termin))
+
+        warnings = []
+        for resource, lines in resource_termine.items():
+            imported = [(other_line, other)
+                        for related_resource in resource.related_resources
+                        for other_line, other in resource_termine.get(related_resource, [])]
+            for (line, termin), usages in zip(lines, models.ResourceUsage.find_related_intervals(
+                    [(termin.start, termin.end) for _, termin in lines], [resource])):
+                if usages:
+                    warnings.append((line, f"Die Ressource {resource.label} ist in dem Zeitraum bereits blockiert."))
+
+                other_lines = sorted({other_line for other_line, other in imported
+                                      if other_line != line and other.end > termin.start and other.start < termin.end})
+                if other_lines:
+                    warnings.append((line, f"Die Ressource {resource.label} ist in dem Zeitraum bereits durch "
+                                           f"Zeile {', '.join(map(str, other_lines))} blockiert."))
+        return warnings
+
+    @staticmethod
+    def _parse_datetime(value):
+        value = value.strip()
+        for format_ in ("%d.%m.%Y %H:%M", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M"):
+            try:
+                return timezone.make_aware(datetime.strptime(value, format_))
+            except ValueError:
+                pass
+        raise ValueError(f"Ungültiger Zeitpunkt: {value}")
+
+    def _read_csv(self, file):
+        reader = csv.DictReader((line.decode("utf-8-sig") for line in file), delimiter=";")
+        for row in reader:
+            if not any(row.values()):
+                continue
+
+            if any(field not in row for field in ["Bezeichner", "Start", "Ende", "Ressourcen"]):
+                msg = "Datei enthält nicht die benötigten Spalten Bezeichner, Start, Ende und Ressourcen."
+                raise ValueError(msg)
+
+            # rows with less fields than the header have None values
+            missing_fields = [field for field in ["Bezeichner", "Start", "Ende", "Ressourcen"]
+                              if row[field] is None]
+            if missing_fields:
+                raise ValueError(f"Zeile {reader.line_num}: Fehlende Werte für {', '.join(missing_fields)}.")
+
+            yield (reader.line_num,
+                   row["Bezeichner"].strip(),
+                   (row.get("Beschreibung") or "").strip(),
+                   self._parse_datetime(row["Start"]),
+                   self._parse_datetime(row["Ende"]),
+                   row["Ressourcen"].split())
+
+    def _read_ics(self, file):
+        # read event by event instead of parsing the whole calendar at once
+        timezones = []
+        component = None
+        for line_num, line in enumerate(file, start=1):
+            line = line.decode("utf-8-sig")
+            if line.startswith("BEGIN:VTIMEZONE") or line.startswith("BEGIN:VEVENT"):
+                component = [line]
+                component_line = line_num
+            elif component is not None:
+                component.append(line)
+                if line.startswith("END:VTIMEZONE"):
+                    timezones.extend(component)
+                    component = None
+                elif line.startswith("END:VEVENT"):
+                    event = icalendar.Calendar.from_ical(
+                        "BEGIN:VCALENDAR\r\n" + "".join(timezones + component) + "END:VCALENDAR\r\n",
+                    ).events[0]
+                    component = None
+
+                    if "RRULE" in event or "RDATE" in event:
+                        raise ValueError(f"Zeile {component_line}: Wiederkehrende Termine werden nicht "
+                                         f"unterstützt, bitte die einzelnen Termine exportieren.")
+
+                    yield (component_line,
+                           str(event.get("SUMMARY") or ""),
+                           str(event.get("DESCRIPTION") or ""),
+                           self._to_datetime(event.start),
+                           self._to_datetime(event.end),
+                           event.categories)
+
+        if component is not None:
+            raise ValueError(f"Unvollständiger Kalendereintrag ab Zeile {component_line}.")
+
+    @staticmethod
+    def _to_datetime(value):
+        # all-day events start at midnight
+        if not isinstance(value, datetime):
+            value = datetime.combine(value, time())
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+
 @admin.register(models.Termin)
 class TerminAdmin(admin.ModelAdmin):
     list_display = ("timerange", "label", "owner")
@@ -24,6 +260,15 @@ class TerminAdmin(admin.ModelAdmin):
     def timerange(self, obj):
         return timerange_filter(obj.start, obj.end)
 
+    def get_urls(self):
+        urls = super().get_urls()
+        urls = [
+            path("import/",
+                 self.admin_site.admin_view(ImportTermineView.as_view(model_admin=self)),
+                 name="reservierung_termin_import"),
+        ] + urls
+        return urls
+
 
 class ResourceManagerInline(admin.TabularInline):
     model = models.ResourceManager
@@ -33,12 +278,27 @@ class ResourceManagerInline(admin.TabularInline):
 
 @admin.register(models.Resource)
 class ResourceAdmin(admin.ModelAdmin):
-    list_display = ("label",)
-    list_filter = ("selectable",)
+    list_display = ("label", "stein_asset_id", "caldav_calendar")
+    list_filter = ("selectable", "tags")
+    filter_horizontal = ("tags",)
     prepopulated_fields = {"slug": ("label",)}
     inlines = (ResourceManagerInline,)
 
 
+@admin.register(models.ResourceTag)
+class ResourceTagAdmin(admin.ModelAdmin):
+    list_display = ("label", "slug")
+    prepopulated_fields = {"slug": ("label",)}
+
+
+@admin.register(models.ArchivedResourceUsage)
+class ArchivedResourceUsageAdmin(admin.ModelAdmin):
+    list_display = ("termin", "resource", "archived_at")
+    list_filter = ("resource",)
+    readonly_fields = ("termin", "resource", "created_at", "approved_at", "rejected_at", "rejected_by",
+                       "archived_at", "confirmations", "log_messages")
+
+
 @admin.register(models.Funktion)
 class FunktionAdmin(admin.ModelAdmin):
     pass
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ReservierungConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reservierung'
+
+    def ready(self) -> None:
+        # connect signals
+        __import__("reservierung.signals")
+        # register handler for changes of Stein.app assets
+        __import__("reservierung.stein")
@@ -0,0 +1,126 @@
+from datetime import timedelta
+import hashlib
+
+from caldav.davclient import DAVClient
+from django.utils import timezone
+import icalendar
+
+from kantine.utils import find_login_url
+from . import models
+
+# approved usages of Termine which ended up to this long ago are published,
+# older events are left untouched in the calendar
+SYNC_PAST = timedelta(days=30)
+
+
+def render_event(usage: models.ResourceUsage) -> str:
+    description = [usage.termin.description] if usage.termin.description else []
+    if usage.termin.owner:
+        description.append(f"Angefragt von {usage.termin.owner}")
+
+    event = icalendar.Event()
+    event.add("uid", f"reservierung-{usage.pk}")
+    # keep data stable between runs, see CalendarEntry.version
+    event.add("dtstamp", usage.approved_at)
+    event.add("dtstart", usage.termin.start)
+    event.add("dtend", usage.termin.end)
+    event.add("summary", usage.termin.label)
+    event.add("description", "\n".join(description))
+    event.add("url", find_login_url(usage.get_absolute_url()))
+
+    calendar = icalendar.Calendar()
+    calendar.add("prodid", "-//THW Kantine//Reservierung//DE")
+    calendar.add("version", "2.0")
+    calendar.add_component(event)
+    return calendar.to_ical().decode()
+
+
+def _calendar_url(client: DAVClient, calendar: str):
+    return client.url.join(f"{calendar.strip('/')}/")
+
+
+def _delete_entry(client: DAVClient, entry: models.CalendarEntry) -> str | None:
+    """Delete the event of entry from its calendar, return an error if failed."""
+    response = client.delete(str(_calendar_url(client, entry.calendar).join(entry.name)))
+    if response.status >= 300 and response.status != 404:
+        return f"{entry.resource}: Löschen von {entry.name} fehlgeschlagen ({response.status})"
+    return None
+
+
+def sync_resource(client: DAVClient, resource: models.Resource) -> tuple[int, int, list[str]]:
+    """Publish approved usages of resource to its calendar.
+
+    Only usages whose event changed since the last run are uploaded, events
+    of usages which are not approved anymore are deleted. Events are moved
+    if the calendar of resource changed and deleted if it was cleared.
+    Returns number of uploaded and deleted events and a list of errors.
+    """
+    now = timezone.now()
+    cutoff = now - SYNC_PAST
+    calendar_url = _calendar_url(client, resource.caldav_calendar)
+
+    entries = list(resource.calendar_entries.all())
+    remaining = {entry.pk: entry for entry in entries}
+    entries_by_usage = {entry.usage_id: entry for entry in entries if entry.usage_id is not None}
+
+    usages = resource.usages.filter(
+        approved_at__isnull=False,
+        rejected_at__isnull=True,
+        termin__end__gte=cutoff,
+    ).select_related("termin__owner", "resource")
+    if not resource.caldav_calendar:
+        usages = usages.none()
+
+    uploaded = 0
+    errors = []
+    for usage in usages:
+        data = render_event(usage)
+        version = hashlib.sha256(data.encode()).hexdigest()
+
+        entry = entries_by_usage.get(usage.pk)
+        if entry is not None:
+            del remaining[entry.pk]
+            if entry.calendar == resource.caldav_calendar and entry.version == version:
+                continue
+
+            # calendar changed, remove the event from the previous one
+            if entry.calendar != resource.caldav_calendar:
+                error = _delete_entry(client, entry)
+                if error is not None:
+                    errors.append(error)
+                    continue
+        else:
+            entry = models.CalendarEntry(resource=resource, usage=usage, name=f"reservierung-{usage.pk}.ics")
+
+        response = client.put(str(calendar_url.join(entry.name)), data,
+                              {"Content-Type": "text/calendar; charset=utf-8"})
+        if response.status >= 300:
+            errors.append(f"{resource}: Hochladen von {entry.name} fehlgeschlagen ({response.status})")
+            # not in any calendar anymore, upload again next time
+            if entry.pk is not None and entry.calendar != resource.caldav_calendar:
+                entry.delete()
+            continue
+
+        entry.calendar = resource.caldav_calendar
+        entry.version = version
+        entry.end = usage.termin.end
+        entry.synced_at = now
+        entry.save()
+        uploaded += 1
+
+    deleted = 0
+    for entry in remaining.values():
+        # aged out, keep event in calendar unless the calendar changed
+        if entry.end < cutoff and entry.calendar == resource.caldav_calendar:
+            entry.delete()
+            continue
+
+        error = _delete_entry(client, entry)
+        if error is not None:
+            errors.append(error)
+            continue
+
+        entry.delete()
+        deleted += 1
+
+    return uploaded, deleted, errors
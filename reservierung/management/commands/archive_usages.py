@@ -0,0 +1,75 @@
+import argparse
+import calendar
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from reservierung import models
+from reservierung.signals import update_deleted_usage_daily_usages
+
+
+def subtract_months(value: datetime, months: int) -> datetime:
+    year, month = divmod(value.year * 12 + value.month - 1 - months, 12)
+    # use last day of month if it is shorter, e.g. for the 31st
+    day = min(value.day, calendar.monthrange(year, month + 1)[1])
+    return value.replace(year=year, month=month + 1, day=day)
+
+
+@contextmanager
+def skip_daily_usage_update() -> Iterator[None]:
+    """Daily usages include archived usages, so moving usages to the archive
+    does not change them. Skips the recalculation for each deleted usage."""
+    post_delete.disconnect(update_deleted_usage_daily_usages, sender=models.ResourceUsage)
+    try:
+        yield
+    finally:
+        post_delete.connect(update_deleted_usage_daily_usages, sender=models.ResourceUsage)
+
+
+class Command(BaseCommand):
+    help = "Verschiebe Buchungen vergangener Termine in das Archiv"
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--months", type=int, default=24,
+            help="Archiviere Buchungen von Terminen, die vor mehr als so viele"
+                 "n Monaten geendet haben. Standard: %(default)s")
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Anzahl der Buchungen, die je Transaktion archiviert werden. "
+                 "Standard: %(default)s")
+
+    def handle(self, *args, months: int, batch_size: int, **kwargs) -> None:
+        cutoff = subtract_months(timezone.now(), months)
+        usages = models.ResourceUsage.objects.filter(
+            termin__end__lt=cutoff,
+        ).order_by("pk").prefetch_related(
+            Prefetch("confirmations",
+                     queryset=models.ResourceUsageConfirmation.objects.select_related("approver")),
+            Prefetch("log_messages",
+                     queryset=models.ResourceUsageLogMessage.objects.select_related("user").order_by("timestamp")),
+        )
+
+        archived = 0
+        while True:
+            with transaction.atomic():
+                batch = list(usages[:batch_size])
+                if not batch:
+                    break
+
+                models.ArchivedResourceUsage.objects.bulk_create(
+                    models.ArchivedResourceUsage.from_usage(usage) for usage in batch)
+                # removes confirmations, log messages and conflict pairs as well
+                with skip_daily_usage_update():
+                    models.ResourceUsage.objects.filter(pk__in=[usage.pk for usage in batch]).delete()
+
+            archived += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{archived} Buchungen von Terminen bis {cutoff:%d.%m.%Y} archiviert."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reservierung import models
+
+
+class Command(BaseCommand):
+    help = "Berechne die Tagesauslastung aller Ressourcen neu"
+
+    def handle(self, *args, **kwargs) -> None:
+        with transaction.atomic():
+            days = set()
+            for usage_model in (models.ResourceUsage, models.ArchivedResourceUsage):
+                for resource_id, start, end in usage_model.objects.values_list(
+                        "resource_id", "termin__start", "termin__end").iterator():
+                    days.update((resource_id, day) for day, _ in models.split_days(start, end))
+
+            models.ResourceDailyUsage.objects.all().delete()
+            models.ResourceDailyUsage.update_for(days)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Tagesauslastung für {models.ResourceDailyUsage.objects.count()} Tage berechnet."))
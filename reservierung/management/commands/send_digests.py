@@ -0,0 +1,59 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from reservierung import models
+
+
+class Command(BaseCommand):
+    help = "Sende gesammelte Benachrichtigungen über neue Buchungen"
+
+    def handle(self, *args, **kwargs) -> None:
+        now = timezone.now()
+
+        # users switching back to immediate get their remaining notifications
+        due = (Q(digest=models.User.DIGEST_IMMEDIATE)
+               | Q(digest_sent_at__isnull=True))
+        for digest, interval in models.User.DIGEST_INTERVALS.items():
+            due |= Q(digest=digest, digest_sent_at__lte=now - interval)
+        due_users = models.User.objects.filter(due)
+
+        sent = 0
+        with transaction.atomic():
+            pending = models.PendingNotification.objects.filter(user__in=due_users).select_related(
+                "user", "usage__termin__owner", "usage__resource",
+            ).order_by("usage__termin__start", "usage__resource__label").select_for_update(of=("self",))
+
+            lines = defaultdict(lambda: defaultdict(list))
+            pending_ids = []
+            for notification in pending:
+                pending_ids.append(notification.pk)
+                usage = notification.usage
+                # skip votes which are not required anymore
+                if notification.kind == models.PendingNotification.VOTE and (
+                    usage.approved_at is not None or usage.rejected_at is not None
+                ):
+                    continue
+                lines[notification.user][notification.kind].append(
+                    models.SUMMARY_LINE.format(**usage._message_kwargs()))
+
+            for user, user_lines in lines.items():
+                sections = [
+                    section.format(usage_list="\n".join(user_lines[kind]))
+                    for kind, section in [(models.PendingNotification.VOTE, models.DIGEST_SECTION_VOTE),
+                                          (models.PendingNotification.INFORM, models.DIGEST_SECTION_INFORM)]
+                    if user_lines[kind]
+                ]
+                models.User.send_multiple([user], models.DIGEST_MESSAGE, sections="\n\n".join(sections))
+                sent += 1
+
+            models.PendingNotification.objects.filter(pk__in=pending_ids).delete()
+            # the interval starts again for all due users, even without
+            # notifications, so the first one after a quiet period waits for
+            # the next digest as well
+            due_users.exclude(digest=models.User.DIGEST_IMMEDIATE).update(digest_sent_at=now)
+
+        self.stdout.write(self.style.SUCCESS(f"{sent} Zusammenfassungen versendet."))
@@ -0,0 +1,32 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from kantine.outbound import get_dav_client
+from reservierung import models
+from reservierung.caldav_sync import sync_resource
+
+
+class Command(BaseCommand):
+    help = "Übertrage bestätigte Buchungen in die CalDAV-Kalender der Ressourcen"
+
+    def handle(self, *args, **kwargs) -> None:
+        caldav_url = os.environ.get("RESERVIERUNG_CALDAV_URL", "")
+        if not caldav_url:
+            return
+
+        uploaded = deleted = 0
+        client = get_dav_client(caldav_url.rstrip("/") + "/")
+        # resources without calendar may still have events to delete
+        for resource in models.Resource.objects.filter(
+            ~Q(caldav_calendar="") | Q(calendar_entries__isnull=False),
+        ).distinct():
+            resource_uploaded, resource_deleted, errors = sync_resource(client, resource)
+            uploaded += resource_uploaded
+            deleted += resource_deleted
+            for error in errors:
+                self.stderr.write(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{uploaded} Kalendereinträge übertragen, {deleted} gelöscht."))
@@ -0,0 +1,24 @@
+import argparse
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from reservierung import models
+from reservierung.management.commands.archive_usages import subtract_months
+
+
+class Command(BaseCommand):
+    help = "Berechne die Vorschläge für Terminbezeichner neu"
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--months", type=int, default=12,
+            help="Berücksichtige Termine der letzten so vielen Monate. "
+                 "Standard: %(default)s")
+
+    def handle(self, *args, months: int, **kwargs) -> None:
+        with transaction.atomic():
+            count = models.TerminLabel.rebuild(subtract_months(timezone.now(), months))
+
+        self.stdout.write(self.style.SUCCESS(f"{count} Terminbezeichner berechnet."))
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_conflicts(apps, schema_editor):
+    Resource = apps.get_model("reservierung", "Resource")
+    ResourceUsage = apps.get_model("reservierung", "ResourceUsage")
+    ResourceUsageConflict = apps.get_model("reservierung", "ResourceUsageConflict")
+
+    parents = dict(Resource.objects.values_list("pk", "part_of"))
+    children = {}
+    for resource_id, parent_id in parents.items():
+        children.setdefault(parent_id, []).append(resource_id)
+
+    def _related(resource_id):
+        related = set()
+        upper_id = resource_id
+        while upper_id is not None:
+            related.add(upper_id)
+            upper_id = parents[upper_id]
+        lower_ids = [resource_id]
+        while lower_ids:
+            lower_id = lower_ids.pop()
+            related.add(lower_id)
+            lower_ids.extend(children.get(lower_id, []))
+        return related
+
+    related_ids = {}
+    usages = ResourceUsage.objects.filter(rejected_at__isnull=True).values_list(
+        "pk", "resource_id", "termin_id", "termin__start", "termin__end", "approved_at",
+    ).order_by("termin__start")
+
+    # single pass over all usages by start, keeping those still running
+    pairs = []
+    running = []
+    for usage in usages:
+        pk, resource_id, termin_id, start, end, approved_at = usage
+        if resource_id not in related_ids:
+            related_ids[resource_id] = _related(resource_id)
+        running = [other for other in running if other[4] > start]
+        for other in running:
+            if other[2] == termin_id or other[1] not in related_ids[resource_id] or other[3] >= end:
+                continue
+            overlap = {"start": start, "end": min(end, other[4])}
+            pairs.append(ResourceUsageConflict(usage_id=pk, conflicting_id=other[0],
+                                               conflicting_approved=other[5] is not None, **overlap))
+            pairs.append(ResourceUsageConflict(usage_id=other[0], conflicting_id=pk,
+                                               conflicting_approved=approved_at is not None, **overlap))
+        running.append(usage)
+
+    ResourceUsageConflict.objects.bulk_create(pairs, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0004_alter_funktion_funktion_label'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceUsageConflict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('conflicting_approved', models.BooleanField(default=False)),
+                ('conflicting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reservierung.resourceusage')),
+                ('usage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conflict_pairs', to='reservierung.resourceusage')),
+            ],
+            options={
+                'verbose_name': 'Buchungskonflikt',
+                'verbose_name_plural': 'Buchungskonflikte',
+                'constraints': [models.UniqueConstraint(fields=('usage', 'conflicting'), name='usage_conflicting')],
+            },
+        ),
+        migrations.RunPython(fill_conflicts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0005_resourceusageconflict'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='termin',
+            index=models.Index(fields=['repeat_uuid'], name='reservierun_repeat__0c37c5_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0006_termin_repeat_uuid_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedResourceUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('rejected_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('confirmations', models.JSONField(default=list)),
+                ('log_messages', models.JSONField(default=list)),
+            ],
+            options={
+                'verbose_name': 'Archivierte Buchung',
+                'verbose_name_plural': 'Archivierte Buchungen',
+                'ordering': ('termin', 'resource'),
+            },
+        ),
+        migrations.AlterField(
+            model_name='resourceusagelogmessage',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='resourceusagelogmessage',
+            index=models.Index(fields=['usage', 'timestamp'], name='reservierun_usage_i_959590_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedresourceusage',
+            name='rejected_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reservierung.user'),
+        ),
+        migrations.AddField(
+            model_name='archivedresourceusage',
+            name='resource',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_usages', to='reservierung.resource'),
+        ),
+        migrations.AddField(
+            model_name='archivedresourceusage',
+            name='termin',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_usages', to='reservierung.termin'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0007_archivedresourceusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked_seconds', models.PositiveIntegerField(default=0, help_text='Gebuchte Zeit aller nicht abgelehnten Buchungen an diesem Tag.')),
+                ('approved_seconds', models.PositiveIntegerField(default=0, help_text='Gebuchte Zeit aller bestätigten Buchungen an diesem Tag.')),
+                ('termin_count', models.PositiveIntegerField(default=0, help_text='Anzahl der Termine mit nicht abgelehnten Buchungen an diesem Tag.')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usages', to='reservierung.resource')),
+            ],
+            options={
+                'verbose_name': 'Tagesauslastung',
+                'verbose_name_plural': 'Tagesauslastungen',
+                'ordering': ('resource', 'date'),
+                'constraints': [models.UniqueConstraint(fields=('resource', 'date'), name='resource_date')],
+            },
+        ),
+    ]
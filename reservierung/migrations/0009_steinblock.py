@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0008_resourcedailyusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='stein_asset_id',
+            field=models.PositiveIntegerField(blank=True, help_text='ID des zugehörigen Assets in Stein.app. Ist das Asset in der Werkstatt, nicht einsatzbereit oder im Einsatz, wird die Ressource automatisch gesperrt.', null=True, unique=True, verbose_name='Stein-Asset'),
+        ),
+        migrations.CreateModel(
+            name='SteinBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20, verbose_name='Stein-Status')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stein_blocks', to='reservierung.resource')),
+                ('termin', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stein_block', to='reservierung.termin')),
+            ],
+            options={
+                'verbose_name': 'Stein-Sperrung',
+                'verbose_name_plural': 'Stein-Sperrungen',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0009_steinblock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='digest',
+            field=models.CharField(choices=[('immediate', 'Sofort'), ('hourly', 'Stündliche Zusammenfassung'), ('daily', 'Tägliche Zusammenfassung')], default='immediate', help_text='Benachrichtigungen über neue Buchungen und benötigte Zustimmungen sofort oder gesammelt erhalten.', max_length=10, verbose_name='Neue Anfragen'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='digest_sent_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='PendingNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('inform', 'Information'), ('vote', 'Zustimmung')], max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('usage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reservierung.resourceusage')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_notifications', to='reservierung.user')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'usage', 'kind'), name='pendingnotification_unique')],
+            },
+        ),
+    ]
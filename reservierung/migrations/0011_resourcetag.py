@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0010_user_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=40, unique=True, verbose_name='Bezeichner')),
+                ('slug', models.SlugField(unique=True, verbose_name='URL-Bezeichner')),
+            ],
+            options={
+                'verbose_name': 'Tag',
+                'verbose_name_plural': 'Tags',
+                'ordering': ('label',),
+            },
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='tags',
+            field=models.ManyToManyField(blank=True, help_text='Eigenschaften der Ressource (z.B. Laut / Leise), nach denen bei der Suche nach freien Ressourcen gefiltert werden kann.', related_name='resources', to='reservierung.resourcetag', verbose_name='Tags'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0011_resourcetag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=150, unique=True, verbose_name='Bezeichner')),
+                ('search_label', models.CharField(max_length=150)),
+                ('count', models.PositiveIntegerField(verbose_name='Anzahl')),
+                ('last_used', models.DateTimeField(verbose_name='Zuletzt verwendet')),
+                ('duration', models.DurationField()),
+                ('resource_ids', models.JSONField(default=list)),
+            ],
+            options={
+                'verbose_name': 'Terminbezeichner',
+                'verbose_name_plural': 'Terminbezeichner',
+                'ordering': ('-count', 'label'),
+                'indexes': [models.Index(fields=['search_label'], name='terminlabel_search_label', opclasses=('varchar_pattern_ops',))],
+            },
+        ),
+    ]
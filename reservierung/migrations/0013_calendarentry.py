@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0012_terminlabel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='caldav_calendar',
+            field=models.CharField(blank=True, help_text='Name des Kalenders unterhalb von RESERVIERUNG_CALDAV_URL, in den bestätigte Buchungen dieser Ressource übertragen werden.', max_length=100, verbose_name='CalDAV-Kalender'),
+        ),
+        migrations.CreateModel(
+            name='CalendarEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Dateiname')),
+                ('etag', models.CharField(blank=True, max_length=200, verbose_name='ETag')),
+                ('version', models.CharField(max_length=64)),
+                ('end', models.DateTimeField(verbose_name='Ende')),
+                ('synced_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Übertragen')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_entries', to='reservierung.resource')),
+                ('usage', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='calendar_entry', to='reservierung.resourceusage')),
+            ],
+            options={
+                'verbose_name': 'Kalendereintrag',
+                'verbose_name_plural': 'Kalendereinträge',
+                'constraints': [models.UniqueConstraint(fields=('resource', 'name'), name='calendarentry_resource_name')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:59
+
+from django.db import migrations, models
+
+
+def fill_calendar(apps, schema_editor):
+    CalendarEntry = apps.get_model("reservierung", "CalendarEntry")
+    Resource = apps.get_model("reservierung", "Resource")
+
+    # existing events were uploaded to the current calendar of their resource
+    for resource_id, calendar in Resource.objects.filter(
+        calendar_entries__isnull=False,
+    ).distinct().values_list("pk", "caldav_calendar"):
+        CalendarEntry.objects.filter(resource_id=resource_id).update(calendar=calendar)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservierung', '0013_calendarentry'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='calendarentry',
+            name='etag',
+        ),
+        migrations.AddField(
+            model_name='calendarentry',
+            name='calendar',
+            field=models.CharField(default='', help_text='CalDAV-Kalender der Ressource beim Übertragen.', max_length=100, verbose_name='Kalender'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_calendar, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,15 @@
-from collections import defaultdict
+from collections import Counter, defaultdict
 from collections.abc import Iterable, Iterator
-from contextlib import suppress
-from datetime import datetime
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from datetime import date, datetime, time, timedelta
 import uuid
 
 from django import forms
 from django.db import models
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.template.defaultfilters import slugify
 
 from kantine.utils import find_login_url
@@ -32,6 +34,34 @@ MESSAGE_REJECTED = "Hallo {firstname}, die Buchung von {resource_label} für {te
 MESSAGE_UNREJECTED = "Hallo {firstname}, die Stornierung der Buchung von {resource_label} für {termin_label} ({timerange}) wurde zurückgezogen: {usage_link}"
 MESSAGE_DELETED = "Hallo {firstname}, die Buchung von {resource_label} for {termin_label} ({timerange}) wurde gelöscht."
 
+# Summaries are formated using str.format and may use the following kwargs:
+# - firstname: Firstname of the receiving user
+# - surname: Surname of the receiving user
+# - usage_list: One line per usage containing resource, termin, timerange and link
+SUMMARY_INFORM = "Hallo {firstname}, die folgenden Buchungen wurden neu erstellt:\n{usage_list}"
+SUMMARY_VOTE = "Hallo {firstname}, für die folgenden Buchungen wird deine Zustimmung benötigt:\n{usage_list}"
+SUMMARY_CONFIRM = "Hallo {firstname}, die folgenden Buchungen wurden bestätigt:\n{usage_list}"
+SUMMARY_CONFIRM_COMMENT = "Hallo {firstname}, die folgenden Buchungen wurden mit einem Kommentar bestätigt:\n{usage_list}"
+SUMMARY_UNCONFIRM = "Hallo {firstname}, die Bestätigung der folgenden Buchungen wurde zurückgezogen:\n{usage_list}"
+SUMMARY_REJECTED = "Hallo {firstname}, die folgenden Buchungen wurden storniert:\n{usage_list}"
+SUMMARY_DELETED = "Hallo {firstname}, die folgenden Buchungen wurden gelöscht:\n{usage_list}"
+SUMMARY_STEIN_BLOCKED = "Hallo {firstname}, die folgenden Buchungen überschneiden sich mit einer Sperrung aus Stein.app:\n{usage_list}"
+SUMMARY_LINE = "- {resource_label} für {termin_label} ({timerange}): {usage_link}"
+
+# Digests are formated using str.format and may use the following kwargs:
+# - firstname: Firstname of the receiving user
+# - surname: Surname of the receiving user
+# - sections: DIGEST_SECTION_* separated by blank lines
+DIGEST_MESSAGE = "Hallo {firstname}, hier ist deine Zusammenfassung der Reservierungen:\n\n{sections}"
+DIGEST_SECTION_VOTE = "Deine Zustimmung wird benötigt:\n{usage_list}"
+DIGEST_SECTION_INFORM = "Neu erstellt:\n{usage_list}"
+
+# Series may consist of at most this many Termine
+SERIES_MAX_TERMINE = 100
+
+# list of ResourceUsageLogMessage to be created, see ResourceUsageLogMessage.buffered
+_log_buffer = ContextVar("log_buffer", default=None)
+
 
 class User(models.Model):
     # Any field may be empty to be filled on first login
@@ -54,6 +84,30 @@ class User(models.Model):
         help_text="Nachname wie in THWin",
     )
 
+    DIGEST_IMMEDIATE = "immediate"
+    DIGEST_HOURLY = "hourly"
+    DIGEST_DAILY = "daily"
+    DIGEST_INTERVALS = {
+        DIGEST_HOURLY: timedelta(hours=1),
+        DIGEST_DAILY: timedelta(days=1),
+    }
+    digest = models.CharField(
+        max_length=10,
+        choices=[
+            (DIGEST_IMMEDIATE, "Sofort"),
+            (DIGEST_HOURLY, "Stündliche Zusammenfassung"),
+            (DIGEST_DAILY, "Tägliche Zusammenfassung"),
+        ],
+        default=DIGEST_IMMEDIATE,
+        verbose_name="Neue Anfragen",
+        help_text="Benachrichtigungen über neue Buchungen und benötigte Zustimmungen sofort "
+                  "oder gesammelt erhalten.",
+    )
+    digest_sent_at = models.DateTimeField(
+        null=True,
+        editable=False,
+    )
+
     def send_hermine(self, message):
         if not self.firstname or not self.surname:
             raise ValueError
@@ -145,16 +199,21 @@ class Termin(models.Model):
 
     @property
     def state(self):
-        states = [usage.state for usage in self.usages.all()]
+        # usages of past Termine may have been moved to the archive
+        usages = list(self.usages.all()) or self.archived_usages.all()
+        states = [usage.state for usage in usages]
         if "rejected" in states:
             return "rejected"
         if "requested" in states:
             return "requested"
         return "approved"
 
-    @property
+    @cached_property
     def is_repeated(self):
-        return Termin.objects.filter(repeat_uuid=self.repeat_uuid).count() > 1
+        return Termin.objects.filter(repeat_uuid=self.repeat_uuid).exclude(pk=self.pk).exists()
+
+    def get_series(self) -> models.QuerySet["Termin"]:
+        return Termin.objects.filter(repeat_uuid=self.repeat_uuid)
 
     def get_overlap(self, other: "Termin") -> tuple[datetime, datetime]:
         """Find overlapping time with other Termin.
@@ -200,19 +259,58 @@ class Termin(models.Model):
         ordering = ("start", "label")
         indexes = [
             models.Index(fields=("start", "end")),
+            models.Index(fields=("repeat_uuid",)),
         ]
 
-    def remove_usage(self, resource, user):
+    def remove_usage(self, resource, user, notifications: "UsageNotifications | None" = None):
         try:
             usage = ResourceUsage.objects.filter(termin=self, resource=resource).get()
         except ResourceUsage.DoesNotExist:
             return
 
-        usage.send_delete()
+        if notifications is None:
+            usage.send_delete()
+        else:
+            notifications.add(SUMMARY_DELETED, usage.get_audience(), usage)
         usage.delete()
 
 
+class UsageNotifications:
+    """Collect notifications for many usages to send one summary per user.
+
+    Messages are rendered when added, so usages may be deleted before send.
+    """
+
+    def __init__(self) -> None:
+        # (summary message, User) => list of usage lines
+        self._messages = defaultdict(list)
+
+    def add(self, message: str, users: Iterable[User], usage: "ResourceUsage") -> None:
+        kind = PendingNotification.SUMMARIES.get(message)
+        if kind is not None:
+            users = PendingNotification.defer(kind, users, usage)
+
+        line = SUMMARY_LINE.format(**usage._message_kwargs())
+        for user in users:
+            self._messages[(message, user)].append(line)
+
+    def send(self) -> None:
+        for (message, user), lines in self._messages.items():
+            User.send_multiple([user], message, usage_list="\n".join(lines))
+        self._messages.clear()
+
+
 class VotingGroups(dict[str, list[tuple[str, User]]]):
+    @classmethod
+    def from_managers(cls, managers: Iterable["ResourceManager"]) -> "VotingGroups":
+        voting_groups = cls()
+        for manager in managers:
+            voting_group = manager.voting_group
+            voting_groups.setdefault(voting_group, [])
+            voting_groups[voting_group].extend(
+                (manager.funktion, user) for user in manager.funktion.user.all())
+        return voting_groups
+
     def is_open(self) -> bool:
         return list(voting_group for voting_group in self if voting_group) == []
 
@@ -220,6 +318,64 @@ class VotingGroups(dict[str, list[tuple[str, User]]]):
         return any(any(user == manager_user for _, manager_user in users)
                    for voting_group, users in self.items() if voting_group)
 
+    def add_conflicting(self, /, usages: Iterable["ResourceUsage"]) -> None:
+        """Require approval of the owners of (approved) conflicting usages.
+
+        Only used for self-regulating resources, see
+        ResourceUsage.get_voting_groups.
+        """
+        for usage in usages:
+            owner = usage.termin.owner
+            if owner:
+                self.setdefault(f"Buchung #{usage.id}", []).append(
+                    (f"Terminersteller {usage.termin.label}", owner))
+
+    def get_missing(self, /, approvers: Iterable[User | None]) -> set[str]:
+        """Voting groups without a vote of one of approvers."""
+        approvers = set(approvers)
+        return {voting_group for voting_group, users in self.items()
+                if voting_group and not any(manager_user in approvers for _, manager_user in users)}
+
+    def approves(self, /, approvers: Iterable[User | None], has_conflicts: bool) -> bool:
+        """Check if votes of approvers approve a usage.
+
+        Usages of self-regulating resources are only approved if no conflict
+        exists.
+        """
+        if self.is_open():
+            return not has_conflicts
+        return not self.get_missing(approvers)
+
+
+class ResourceTree:
+    """Hierarchy of Resources by their ids, walked without further queries."""
+
+    def __init__(self, parents: dict[int, int | None]) -> None:
+        self.parents = parents
+        self.children = defaultdict(list)
+        for resource_id, parent_id in parents.items():
+            self.children[parent_id].append(resource_id)
+
+    @classmethod
+    def fetch(cls) -> "ResourceTree":
+        return cls(dict(Resource.objects.values_list("pk", "part_of_id")))
+
+    def traverse_up(self, resource_id: int) -> Iterator[int]:
+        """Same as Resource.traverse_up, but with ids."""
+        while resource_id is not None:
+            yield resource_id
+            resource_id = self.parents[resource_id]
+
+    def traverse_down(self, resource_id: int) -> Iterator[int]:
+        """Same as Resource.traverse_down, but with ids."""
+        yield resource_id
+        for child_id in self.children[resource_id]:
+            yield from self.traverse_down(child_id)
+
+    def related_ids(self, resource_id: int) -> set[int]:
+        """Same as Resource.related_resources, but with ids."""
+        return set(self.traverse_up(resource_id)) | set(self.traverse_down(resource_id))
+
 
 class Resource(models.Model):
     part_of = models.ForeignKey(
@@ -254,6 +410,31 @@ class Resource(models.Model):
                   "cht geändert werden, um ggf. bestehende URLs nicht zu besch"
                   "ädigen.",
     )
+    stein_asset_id = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        unique=True,
+        verbose_name="Stein-Asset",
+        help_text="ID des zugehörigen Assets in Stein.app. Ist das Asset in de"
+                  "r Werkstatt, nicht einsatzbereit oder im Einsatz, wird die "
+                  "Ressource automatisch gesperrt.",
+    )
+    caldav_calendar = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="CalDAV-Kalender",
+        help_text="Name des Kalenders unterhalb von RESERVIERUNG_CALDAV_URL, i"
+                  "n den bestätigte Buchungen dieser Ressource übertragen werd"
+                  "en.",
+    )
+    tags = models.ManyToManyField(
+        "ResourceTag",
+        blank=True,
+        related_name="resources",
+        verbose_name="Tags",
+        help_text="Eigenschaften der Ressource (z.B. Laut / Leise), nach denen"
+                  " bei der Suche nach freien Ressourcen gefiltert werden kann.",
+    )
 
     @property
     def related_resources(self) -> set["Resource"]:
@@ -279,6 +460,20 @@ class Resource(models.Model):
         for child in self.consists_of.all():
             yield from child.traverse_down()
 
+    @classmethod
+    def lock(cls, /, resources: Iterable["Resource"]) -> None:
+        """Lock resources and their parts until the end of the transaction.
+
+        Usages can only conflict if their resources share a part, so changes
+        to possibly conflicting usages get serialised while bookings of
+        unrelated resources keep running in parallel. Must be called within
+        transaction.atomic. SQLite does not support row locks, but locks the
+        whole database as transactions are started with BEGIN IMMEDIATE.
+        """
+        resource_ids = {part.pk for resource in resources for part in resource.traverse_down()}
+        # lock in consistent order to avoid deadlocks
+        list(cls.objects.filter(pk__in=resource_ids).order_by("pk").select_for_update().values_list("pk"))
+
     def get_next_usage(self) -> "ResourceUsage | None":
         """Get next ResourceUsage matching this Resource."""
         try:
@@ -306,13 +501,7 @@ class Resource(models.Model):
 
         str (voting group) => list of (str (funktion_label), User)
         """
-        voting_groups = VotingGroups()
-        for manager in self.managers.all():
-            voting_group = manager.voting_group
-            voting_groups.setdefault(voting_group, [])
-            voting_groups[voting_group].extend(
-                (manager.funktion, user) for user in manager.funktion.user.all())
-        return voting_groups
+        return VotingGroups.from_managers(self.managers.all())
 
     def _get_admin_query(self) -> models.QuerySet["ResourceManager"]:
         return ResourceManager.objects.filter(admin=True, resource__in=self.traverse_up())
@@ -321,12 +510,7 @@ class Resource(models.Model):
         return self._get_admin_query().filter(funktion__user=user).exists()
 
     def get_admins(self) -> Iterator[tuple[User | None, "ResourceManager"]]:
-        for admin in self._get_admin_query():
-            users = admin.funktion.user.all()
-            for user in users:
-                yield (user, admin)
-            if not users:
-                yield (None, admin)
+        return ResourceManager.iter_users(self._get_admin_query())
 
     def get_absolute_url(self):
         return reverse("reservierung:resource_detail",
@@ -341,6 +525,38 @@ class Resource(models.Model):
         ordering = ("label",)
 
 
+class ResourceTag(models.Model):
+    label = models.CharField(
+        max_length=40,
+        unique=True,
+        verbose_name="Bezeichner",
+    )
+    slug = models.SlugField(
+        unique=True,
+        verbose_name="URL-Bezeichner",
+    )
+
+    @classmethod
+    def get_resource_ids(cls, slugs: Iterable[str]) -> set[int]:
+        """Find ids of all Resources tagged with every given tag."""
+        slugs = set(slugs)
+        tagged = defaultdict(set)
+        for resource_id, slug in Resource.tags.through.objects.filter(
+            resourcetag__slug__in=slugs,
+        ).values_list("resource_id", "resourcetag__slug"):
+            tagged[resource_id].add(slug)
+        return {resource_id for resource_id, resource_slugs in tagged.items()
+                if resource_slugs == slugs}
+
+    def __str__(self):
+        return f"{self.label}"
+
+    class Meta:
+        verbose_name = "Tag"
+        verbose_name_plural = "Tags"
+        ordering = ("label",)
+
+
 class Funktion(models.Model):
     user = models.ManyToManyField(
         User,
@@ -394,6 +610,21 @@ class ResourceManager(models.Model):
                   "e Ressourcen) zu stornieren.",
     )
 
+    @staticmethod
+    def iter_users(managers: Iterable["ResourceManager"],
+                   ) -> Iterator[tuple[User | None, "ResourceManager"]]:
+        """Iterate over users of all managers.
+
+        Yields a tuple of (User, ResourceManager) for each user or
+        (None, ResourceManager) if the Funktion of a manager has no users.
+        """
+        for manager in managers:
+            users = manager.funktion.user.all()
+            for user in users:
+                yield (user, manager)
+            if not users:
+                yield (None, manager)
+
     def __str__(self):
         return f"{self.resource}: {self.voting_group} {self.funktion}"
 
@@ -457,6 +688,108 @@ class ResourceUsage(models.Model):
             related_usages = related_usages.filter(termin__start__lt=end)
         return related_usages
 
+    @classmethod
+    def find_related_intervals(cls, /, intervals: Iterable[tuple[datetime, datetime]],
+                               resources: Iterable[Resource],
+                               ) -> list[list["ResourceUsage"]]:
+        """Find related usages for many intervals with a single query.
+
+        Returns a list of related usages (with termin and resource fetched)
+        for each interval, in the order of intervals.
+        """
+        intervals = list(intervals)
+        if not intervals:
+            return []
+
+        related_usages = list(cls.find_related(
+            min(start for start, _ in intervals),
+            max(end for _, end in intervals),
+            resources,
+        ).select_related("termin", "resource"))
+
+        return [[usage for usage in related_usages
+                 if usage.termin.end > start and usage.termin.start < end]
+                for start, end in intervals]
+
+    @classmethod
+    def filter_may_vote(cls, /, usages: Iterable["ResourceUsage"], user: User,
+                        ) -> list["ResourceUsage"]:
+        """Filter usages for those the user may (still) vote for.
+
+        Managers and existing votes are fetched once for all usages, only
+        self-regulating resources need to look up their conflicts per usage.
+        """
+        usages = list(usages)
+
+        voted = set(ResourceUsageConfirmation.objects.filter(
+            resource_usage__in=usages,
+            approver=user,
+            revoked_at__isnull=True,
+        ).values_list("resource_usage", flat=True))
+
+        managers = defaultdict(list)
+        for manager in ResourceManager.objects.filter(
+            resource__in={usage.resource_id for usage in usages},
+        ).select_related("funktion").prefetch_related("funktion__user"):
+            managers[manager.resource_id].append(manager)
+
+        may_vote = []
+        for usage in usages:
+            if usage.pk in voted:
+                continue
+
+            voting_groups = VotingGroups.from_managers(managers[usage.resource_id])
+            if voting_groups.is_open():
+                voting_groups = usage.get_voting_groups()
+
+            if voting_groups.may_vote(user):
+                may_vote.append(usage)
+
+        return may_vote
+
+    @classmethod
+    def preview_approvals(cls, /, start: datetime, end: datetime, resources: Iterable[Resource],
+                          user: User, termin_id: int | None = None) -> dict[Resource, dict]:
+        """Evaluate approval of new usages of resources without saving them.
+
+        Applies the rules of request_approvals and update_state with a fixed
+        number of queries. Returns the voting groups, the voting groups
+        still missing after the vote of user, the conflicting usages, if the
+        resource is self-regulating and if the usage would be approved right
+        away for each resource. Usages of termin_id are no conflicts.
+        """
+        resources = list(resources)
+        tree = ResourceTree.fetch()
+
+        managers = defaultdict(list)
+        for manager in ResourceManager.objects.filter(
+            resource__in=resources,
+        ).select_related("funktion").prefetch_related("funktion__user"):
+            managers[manager.resource_id].append(manager)
+
+        related_usages = list(cls.find_related(start, end, resources).exclude(
+            termin_id=termin_id,
+        ).select_related("termin__owner", "resource").order_by("termin__start"))
+
+        preview = {}
+        for resource in resources:
+            related_ids = tree.related_ids(resource.pk)
+            conflicts = [usage for usage in related_usages if usage.resource_id in related_ids]
+
+            voting_groups = VotingGroups.from_managers(managers[resource.pk])
+            self_regulating = voting_groups.is_open()
+            if self_regulating:
+                voting_groups.add_conflicting(usage for usage in conflicts if usage.approved)
+
+            preview[resource] = {
+                "voting_groups": voting_groups,
+                "missing_voting_groups": voting_groups.get_missing([user]),
+                "conflicts": conflicts,
+                "self_regulating": self_regulating,
+                "approved": voting_groups.approves([user], has_conflicts=bool(conflicts)),
+            }
+        return preview
+
     def get_voting_groups(self) -> VotingGroups:
         """Get voting groups eligble for this Usage.
 
@@ -469,22 +802,11 @@ class ResourceUsage(models.Model):
         # usages already approved. If we are approved, only use usages approved
         # until our own approval time.
         if voting_groups.is_open():
-            related_usages = ResourceUsage.find_related(
-                self.termin.start,
-                self.termin.end,
-                [self.resource],
+            voting_groups.add_conflicting(ResourceUsage.objects.filter(
+                conflict_pairs__conflicting=self,
             ).filter(**({"approved_at__isnull": False}
                         if self.approved_at is None else
-                        {"approved_at__lt": self.approved_at}))
-
-            for related_usage in related_usages:
-                related_owner = related_usage.termin.owner
-                if related_owner:
-                    voting_group = f"Buchung #{related_usage.id}"
-                    voting_groups.setdefault(voting_group, [])
-                    voting_groups[voting_group].append(
-                        (f"Terminersteller {related_usage.termin.label}", related_owner),
-                    )
+                        {"approved_at__lt": self.approved_at})).select_related("termin__owner"))
 
         return voting_groups
 
@@ -496,44 +818,41 @@ class ResourceUsage(models.Model):
         consists of three-tuples with the conflicting ResourceUsage and two
         timestamps, representing the start and end of overlap in usage.
         """
-        related_usages = list(ResourceUsage.find_related(
-            self.termin.start,
-            self.termin.end,
-            [self.resource],
-        ).exclude(termin=self.termin))
-
         conflict_confirmed = False
         conflicts = []
-        for usage in related_usages:
-            conflict_start, conflict_end = self.termin.get_overlap(usage.termin)
-            conflicts.append((usage, conflict_start, conflict_end))
-            if usage.state == "approved":
+        for conflict in self.conflict_pairs.select_related(
+            "conflicting__termin__owner", "conflicting__resource",
+        ).order_by("conflicting__termin__start"):
+            conflicts.append((conflict.conflicting, conflict.start, conflict.end))
+            if conflict.conflicting_approved:
                 conflict_confirmed = True
 
         return conflicts, conflict_confirmed
 
     def log(self, kind, user, message):
-        ResourceUsageLogMessage.objects.create(
+        log_message = ResourceUsageLogMessage(
             usage=self,
             kind=kind,
             user=user,
             message=message,
         )
 
-    def request_approvals(self, user):
-        missing_voting_groups = set()
-        voting_groups = defaultdict(list)
-        for voting_group, manager_users in self.get_voting_groups().items():
-            if voting_group:
-                missing_voting_groups.add(voting_group)
+        buffer = _log_buffer.get()
+        if buffer is None:
+            log_message.save()
+        else:
+            buffer.append(log_message)
 
-            voting_groups[voting_group].extend(manager_user for _, manager_user in manager_users)
+    def request_approvals(self, user, notifications: UsageNotifications | None = None):
+        voting_groups = self.get_voting_groups()
+        # the requesting user votes for all own voting groups
+        missing_voting_groups = voting_groups.get_missing([user])
 
-        inform_users = set(voting_groups.pop("", []))
+        inform_users = {manager_user for _, manager_user in voting_groups.pop("", [])}
         vote_users = set()
 
         for voting_group, manager_users in voting_groups.items():
-            if user in manager_users:
+            if voting_group not in missing_voting_groups:
                 ResourceUsageConfirmation.objects.update_or_create(
                     resource_usage=self,
                     approver=user,
@@ -541,48 +860,33 @@ class ResourceUsage(models.Model):
                 )
                 self.log(ResourceUsageLogMessage.VOTES, user,
                          "Zustimmung bei Erstellung der Anfrage.")
-                missing_voting_groups.discard(voting_group)
-                inform_users.update(manager_users)
+                inform_users.update(manager_user for _, manager_user in manager_users)
             else:
-                vote_users.update(manager_users)
+                vote_users.update(manager_user for _, manager_user in manager_users)
 
         if missing_voting_groups:
-            self.send_inform(inform_users - vote_users)
-            self.send_vote(vote_users)
+            if notifications is None:
+                self.send_inform(inform_users - vote_users)
+                self.send_vote(vote_users)
+            else:
+                notifications.add(SUMMARY_INFORM, inform_users - vote_users, self)
+                notifications.add(SUMMARY_VOTE, vote_users, self)
         else:
             # update_state will inform users
-            self.update_state()
-
-    def update_state(self):
-        all_voting_groups = set()
-        approved_voting_groups = set()
-        matching_voting_groups = defaultdict(set)
-
-        for voting_group, manager_users in self.get_voting_groups().items():
-            if not voting_group:
-                continue
+            self.update_state(notifications)
 
-            all_voting_groups.add(voting_group)
-            for _, manager_user in manager_users:
-                matching_voting_groups[manager_user].add(voting_group)
+    def update_state(self, notifications: UsageNotifications | None = None) -> bool:
+        """Re-evaluate approval of this usage.
 
-        for vote in self.confirmations.filter(revoked_at__isnull=True):
-            approved_voting_groups.update(matching_voting_groups[vote.approver])
-
-        # approve once no voting group is left without approval
-        should_approved = not (all_voting_groups - approved_voting_groups)
-
-        # special case for self regulating resources: only approve if no
-        # conflict exists
-        if not all_voting_groups:
-            conflicts = ResourceUsage.find_related(
-                self.termin.start, self.termin.end, [self.resource],
-            ).exclude(termin=self.termin)
-
-            if conflicts.exists():
-                should_approved = False
+        Returns if the state has changed. Messages are collected in
+        notifications if given, otherwise they are sent immediately.
+        """
+        voting_groups = self.get_voting_groups()
+        approvers = [vote.approver for vote in self.confirmations.filter(revoked_at__isnull=True).select_related("approver")]
+        # conflicts only matter for self-regulating resources
+        should_approved = voting_groups.approves(
+            approvers, has_conflicts=voting_groups.is_open() and self.conflict_pairs.exists())
 
-        # approved_at should be None iff missing_voting_groups is not empty
         if should_approved != (self.approved_at is not None):
             self.approved_at = timezone.now() if should_approved else None
             self.save(update_fields=["approved_at"])
@@ -590,11 +894,25 @@ class ResourceUsage(models.Model):
             if self.approved_at is not None:
                 self.log(ResourceUsageLogMessage.STATE, None,
                          "Buchung bestätigt.")
-                self.send_confirm()
+                if notifications is None:
+                    self.send_confirm()
+                else:
+                    notifications.add(SUMMARY_CONFIRM_COMMENT
+                                      if self.confirmations.exclude(comment="").exists() else
+                                      SUMMARY_CONFIRM,
+                                      self.get_audience(), self)
+                    self.send_depending_votes(notifications)
             else:
                 self.log(ResourceUsageLogMessage.STATE, None,
                          "Bestätigung der Buchung entfällt.")
-                self.send_unconfirm()
+                if notifications is None:
+                    self.send_unconfirm()
+                else:
+                    notifications.add(SUMMARY_UNCONFIRM, self.get_audience(), self)
+
+            return True
+
+        return False
 
     def get_absolute_url(self):
         return reverse("reservierung:resourceusage_detail",
@@ -647,10 +965,12 @@ class ResourceUsage(models.Model):
         ]
 
     def send_inform(self, users):
+        users = PendingNotification.defer(PendingNotification.INFORM, users, self)
         User.send_multiple(users, MESSAGE_INFORM,
                            **self._message_kwargs())
 
     def send_vote(self, users):
+        users = PendingNotification.defer(PendingNotification.VOTE, users, self)
         User.send_multiple(users, MESSAGE_VOTE,
                            **self._message_kwargs())
 
@@ -680,15 +1000,20 @@ class ResourceUsage(models.Model):
                            MESSAGE_CONFIRM,
                            **self._message_kwargs())
 
+        self.send_depending_votes()
+
+    def send_depending_votes(self, notifications: UsageNotifications | None = None):
         # check if this owner should now vote on other usages
-        if self.resource.get_voting_groups().is_open():
-            depending_usages = ResourceUsage.find_related(
-                self.termin.start,
-                self.termin.end,
-                [self.resource],
-            ).filter(approved_at__isnull=True)
+        if self.termin.owner and self.resource.get_voting_groups().is_open():
+            depending_usages = ResourceUsage.objects.filter(
+                conflict_pairs__conflicting=self,
+                approved_at__isnull=True,
+            )
             for usage in depending_usages:
-                usage.send_vote([self.owner])
+                if notifications is None:
+                    usage.send_vote([self.termin.owner])
+                else:
+                    notifications.add(SUMMARY_VOTE, [self.termin.owner], usage)
 
     def send_unconfirm(self):
         User.send_multiple(self.get_audience(), MESSAGE_UNCONFIRM,
@@ -706,6 +1031,14 @@ class ResourceUsage(models.Model):
         User.send_multiple(self.get_audience(), MESSAGE_DELETED,
                            **self._message_kwargs())
 
+    @classmethod
+    def send_summary(cls, usages: Iterable["ResourceUsage"], message: str) -> None:
+        """Send one message per user listing all usages the user is audience of."""
+        notifications = UsageNotifications()
+        for usage in usages:
+            notifications.add(message, usage.get_audience(), usage)
+        notifications.send()
+
     def _message_kwargs(self):
         return {"termin_owner": str(self.termin.owner),
                 "termin_label": self.termin.label,
@@ -714,6 +1047,127 @@ class ResourceUsage(models.Model):
                 "usage_link": find_login_url(self.get_absolute_url())}
 
 
+class PendingNotification(models.Model):
+    """New usage a user asked to be notified about in a digest.
+
+    Created instead of sending the message for users with a digest setting,
+    send_digests groups them into one message per user.
+    """
+
+    INFORM = "inform"
+    VOTE = "vote"
+    # summaries which may be deferred
+    SUMMARIES = {
+        SUMMARY_INFORM: INFORM,
+        SUMMARY_VOTE: VOTE,
+    }
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="pending_notifications",
+    )
+    usage = models.ForeignKey(
+        ResourceUsage,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    kind = models.CharField(
+        max_length=10,
+        choices=[(INFORM, "Information"), (VOTE, "Zustimmung")],
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(name="pendingnotification_unique",
+                                    fields=("user", "usage", "kind")),
+        ]
+
+    @classmethod
+    def defer(cls, kind: str, users: Iterable[User], usage: ResourceUsage) -> list[User]:
+        """Store notifications for users with a digest, return all other users."""
+        immediate_users = []
+        pending = []
+        for user in users:
+            if user.digest == User.DIGEST_IMMEDIATE:
+                immediate_users.append(user)
+            else:
+                pending.append(cls(user=user, usage=usage, kind=kind))
+
+        if pending:
+            cls.objects.bulk_create(pending, ignore_conflicts=True)
+        return immediate_users
+
+
+class ResourceUsageConflict(models.Model):
+    """Materialised pair of overlapping ResourceUsages of different Termine.
+
+    Every pair is stored in both directions, so all conflicts of a usage are
+    found by an indexed lookup. Rejected usages have no pairs. Kept up to date
+    by reservierung.signals, use update_for after bulk updates.
+    """
+
+    usage = models.ForeignKey(
+        ResourceUsage,
+        on_delete=models.CASCADE,
+        related_name="conflict_pairs",
+    )
+    conflicting = models.ForeignKey(
+        ResourceUsage,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    conflicting_approved = models.BooleanField(default=False)
+
+    @classmethod
+    def update_for(cls, /, usages: Iterable[ResourceUsage]) -> None:
+        """Recalculate all conflict pairs involving one of usages."""
+        usages = list(usages)
+        cls.objects.filter(models.Q(usage__in=usages) | models.Q(conflicting__in=usages)).delete()
+
+        # query once per resource, as series bring many usages of few resources
+        resource_usages = defaultdict(list)
+        for usage in usages:
+            if usage.rejected_at is None:
+                resource_usages[usage.resource].append(usage)
+
+        related = []
+        for resource, usages_of_resource in resource_usages.items():
+            related.extend(zip(usages_of_resource, ResourceUsage.find_related_intervals(
+                [(usage.termin.start, usage.termin.end) for usage in usages_of_resource],
+                [resource],
+            )))
+
+        pairs = {}
+        for usage, related_usages in related:
+            for other in related_usages:
+                if other.termin_id == usage.termin_id:
+                    continue
+
+                start, end = usage.termin.get_overlap(other.termin)
+                pairs[(usage.pk, other.pk)] = cls(usage=usage, conflicting=other,
+                                                  start=start, end=end,
+                                                  conflicting_approved=other.approved)
+                pairs[(other.pk, usage.pk)] = cls(usage=other, conflicting=usage,
+                                                  start=start, end=end,
+                                                  conflicting_approved=usage.approved)
+
+        cls.objects.bulk_create(pairs.values())
+
+    class Meta:
+        verbose_name = "Buchungskonflikt"
+        verbose_name_plural = "Buchungskonflikte"
+        constraints = [
+            models.UniqueConstraint(name="usage_conflicting",
+                                    fields=("usage", "conflicting")),
+        ]
+
+
 class ResourceUsageLogMessage(models.Model):
     META = "meta"
     VOTES = "votes"
@@ -734,7 +1188,8 @@ class ResourceUsageLogMessage(models.Model):
         on_delete=models.CASCADE,
         related_name="log_messages",
     )
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # not auto_now_add, buffered messages keep the time they were logged at
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     user = models.ForeignKey(
         User,
         blank=True,
@@ -749,10 +1204,42 @@ class ResourceUsageLogMessage(models.Model):
     )
     message = models.TextField()
 
+    @classmethod
+    @contextmanager
+    def buffered(cls):
+        """Collect messages of ResourceUsage.log and create them at once.
+
+        Messages are created when leaving the block, use it inside of
+        transaction.atomic to commit them together with the logged changes.
+        Messages are discarded if the block raises.
+        """
+        if _log_buffer.get() is not None:
+            # already buffered by an outer block
+            yield
+            return
+
+        buffer = []
+        token = _log_buffer.set(buffer)
+        try:
+            yield
+        finally:
+            _log_buffer.reset(token)
+
+        # usages may have been deleted meanwhile, which would have deleted
+        # their messages as well
+        existing_usage_ids = set(ResourceUsage.objects.filter(
+            pk__in={log_message.usage_id for log_message in buffer},
+        ).values_list("pk", flat=True))
+        cls.objects.bulk_create(log_message for log_message in buffer
+                                if log_message.usage_id in existing_usage_ids)
+
     class Meta:
         verbose_name = "Lognachricht"
         verbose_name_plural = "Lognachrichten"
         ordering = ("timestamp",)
+        indexes = [
+            models.Index(fields=("usage", "timestamp")),
+        ]
 
 
 class ResourceUsageConfirmation(models.Model):
@@ -800,3 +1287,342 @@ class ResourceUsageConfirmation(models.Model):
         indexes = [
             models.Index(fields=("resource_usage", "approver")),
         ]
+
+
+class ArchivedResourceUsage(models.Model):
+    """Compact copy of a ResourceUsage of a past Termin.
+
+    Confirmations and log messages are stored as JSON lists in the same row.
+    Created by the archive_usages management command, which removes the
+    original ResourceUsage with its confirmations and log messages.
+    """
+
+    termin = models.ForeignKey(
+        Termin,
+        on_delete=models.CASCADE,
+        related_name="archived_usages",
+    )
+    resource = models.ForeignKey(
+        Resource,
+        on_delete=models.CASCADE,
+        related_name="archived_usages",
+    )
+    created_at = models.DateTimeField()
+    approved_at = models.DateTimeField(blank=True, null=True)
+    rejected_at = models.DateTimeField(blank=True, null=True)
+    rejected_by = models.ForeignKey(
+        User,
+        blank=True,
+        null=True,
+        related_name="+",
+        on_delete=models.SET_NULL,
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # list of dicts with approver, comment, created_at and revoked_at
+    confirmations = models.JSONField(default=list)
+    # list of dicts with timestamp, user, kind and message
+    log_messages = models.JSONField(default=list)
+
+    @property
+    def state(self):
+        if self.rejected_at is not None:
+            return "rejected"
+
+        if self.approved_at is not None:
+            return "approved"
+
+        return "requested"
+
+    @classmethod
+    def from_usage(cls, /, usage: ResourceUsage) -> "ArchivedResourceUsage":
+        """Build (unsaved) archive entry, confirmations and log messages
+        should be prefetched."""
+        return cls(
+            termin_id=usage.termin_id,
+            resource_id=usage.resource_id,
+            created_at=usage.created_at,
+            approved_at=usage.approved_at,
+            rejected_at=usage.rejected_at,
+            rejected_by_id=usage.rejected_by_id,
+            confirmations=[{
+                "approver": str(confirmation.approver),
+                "comment": confirmation.comment,
+                "created_at": confirmation.created_at.isoformat(),
+                "revoked_at": confirmation.revoked_at and confirmation.revoked_at.isoformat(),
+            } for confirmation in usage.confirmations.all()],
+            log_messages=[{
+                "timestamp": log_message.timestamp.isoformat(),
+                "user": log_message.user and str(log_message.user),
+                "kind": log_message.kind,
+                "message": log_message.message,
+            } for log_message in usage.log_messages.all()],
+        )
+
+    def __str__(self):
+        return f"{self.resource} für {self.termin}"
+
+    class Meta:
+        verbose_name = "Archivierte Buchung"
+        verbose_name_plural = "Archivierte Buchungen"
+        ordering = ("termin", "resource")
+
+
+def split_days(start: datetime, end: datetime) -> Iterator[tuple[date, float]]:
+    """Split time range into local days.
+
+    Yields tuples of the date and the seconds of the range on this date.
+    """
+    day = timezone.localtime(start).date()
+    while True:
+        day_start = timezone.make_aware(datetime.combine(day, time()))
+        if day_start >= end:
+            break
+        day_end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time()))
+        yield day, (min(end, day_end) - max(start, day_start)).total_seconds()
+        day += timedelta(days=1)
+
+
+class ResourceDailyUsage(models.Model):
+    """Utilisation of a Resource per local day.
+
+    Only counts usages of the Resource itself (not of related ones), but
+    includes archived usages. Days are recalculated by reservierung.signals,
+    use update_for_usages after bulk updates.
+    """
+
+    resource = models.ForeignKey(
+        Resource,
+        on_delete=models.CASCADE,
+        related_name="daily_usages",
+    )
+    date = models.DateField()
+    booked_seconds = models.PositiveIntegerField(
+        default=0,
+        help_text="Gebuchte Zeit aller nicht abgelehnten Buchungen an diesem Tag.",
+    )
+    approved_seconds = models.PositiveIntegerField(
+        default=0,
+        help_text="Gebuchte Zeit aller bestätigten Buchungen an diesem Tag.",
+    )
+    termin_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Anzahl der Termine mit nicht abgelehnten Buchungen an diesem Tag.",
+    )
+
+    @classmethod
+    def update_for_usages(cls, /, usages: Iterable[ResourceUsage]) -> None:
+        """Recalculate all days touched by one of usages."""
+        cls.update_for({(usage.resource_id, day)
+                        for usage in usages
+                        for day, _ in split_days(usage.termin.start, usage.termin.end)})
+
+    @classmethod
+    def update_for(cls, /, days: Iterable[tuple[int, date]]) -> None:
+        """Recalculate days, given as tuples of Resource id and date."""
+        resource_days = defaultdict(set)
+        for resource_id, day in days:
+            resource_days[resource_id].add(day)
+
+        for resource_id, dates in resource_days.items():
+            start = timezone.make_aware(datetime.combine(min(dates), time()))
+            end = timezone.make_aware(datetime.combine(max(dates) + timedelta(days=1), time()))
+
+            # (booked seconds, approved seconds, set of Termin ids) per date
+            stats = {day: [0, 0, set()] for day in dates}
+            for usage_model in (ResourceUsage, ArchivedResourceUsage):
+                usages = usage_model.objects.filter(
+                    resource_id=resource_id,
+                    rejected_at__isnull=True,
+                    termin__start__lt=end,
+                    termin__end__gt=start,
+                ).select_related("termin")
+                for usage in usages:
+                    for day, seconds in split_days(usage.termin.start, usage.termin.end):
+                        if day not in stats:
+                            continue
+                        stats[day][0] += seconds
+                        if usage.approved_at is not None:
+                            stats[day][1] += seconds
+                        stats[day][2].add(usage.termin_id)
+
+            cls.objects.filter(resource_id=resource_id, date__in=dates).delete()
+            cls.objects.bulk_create(
+                cls(resource_id=resource_id, date=day, booked_seconds=booked,
+                    approved_seconds=approved, termin_count=len(termin_ids))
+                for day, (booked, approved, termin_ids) in stats.items()
+                if termin_ids)
+
+    class Meta:
+        verbose_name = "Tagesauslastung"
+        verbose_name_plural = "Tagesauslastungen"
+        ordering = ("resource", "date")
+        constraints = [
+            models.UniqueConstraint(name="resource_date",
+                                    fields=("resource", "date")),
+        ]
+
+
+class SteinBlock(models.Model):
+    """Termin blocking a Resource while its Stein.app asset is unavailable.
+
+    The block is open while its Termin has not ended, see reservierung.stein.
+    """
+
+    resource = models.ForeignKey(
+        Resource,
+        on_delete=models.CASCADE,
+        related_name="stein_blocks",
+    )
+    termin = models.OneToOneField(
+        Termin,
+        on_delete=models.CASCADE,
+        related_name="stein_block",
+    )
+    status = models.CharField(
+        max_length=20,
+        verbose_name="Stein-Status",
+    )
+
+    def __str__(self):
+        return f"{self.resource} ({self.status})"
+
+    class Meta:
+        verbose_name = "Stein-Sperrung"
+        verbose_name_plural = "Stein-Sperrungen"
+
+
+class CalendarEntry(models.Model):
+    """ResourceUsage published to the CalDAV calendar of its Resource.
+
+    Kept after the usage was deleted until the event is removed from the
+    calendar, see reservierung.caldav_sync.
+    """
+
+    resource = models.ForeignKey(
+        Resource,
+        on_delete=models.CASCADE,
+        related_name="calendar_entries",
+    )
+    usage = models.OneToOneField(
+        ResourceUsage,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="calendar_entry",
+    )
+    calendar = models.CharField(
+        max_length=100,
+        verbose_name="Kalender",
+        help_text="CalDAV-Kalender der Ressource beim Übertragen.",
+    )
+    name = models.CharField(
+        max_length=100,
+        verbose_name="Dateiname",
+    )
+    # sha256 of the uploaded iCalendar data
+    version = models.CharField(
+        max_length=64,
+    )
+    end = models.DateTimeField(
+        verbose_name="Ende",
+    )
+    synced_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Übertragen",
+    )
+
+    def __str__(self):
+        return f"{self.resource}: {self.name}"
+
+    class Meta:
+        verbose_name = "Kalendereintrag"
+        verbose_name_plural = "Kalendereinträge"
+        constraints = [
+            models.UniqueConstraint(name="calendarentry_resource_name",
+                                    fields=("resource", "name")),
+        ]
+
+
+class TerminLabel(models.Model):
+    """Previously used label of Termine for autocompletion in TerminForm.
+
+    Precomputed by update_termin_labels, search_label is matched by prefix.
+    """
+
+    label = models.CharField(
+        max_length=150,
+        unique=True,
+        verbose_name="Bezeichner",
+    )
+    search_label = models.CharField(
+        max_length=150,
+    )
+    count = models.PositiveIntegerField(
+        verbose_name="Anzahl",
+    )
+    last_used = models.DateTimeField(
+        verbose_name="Zuletzt verwendet",
+    )
+    # most common duration and set of resource ids of Termine with this label
+    duration = models.DurationField()
+    resource_ids = models.JSONField(default=list)
+
+    @staticmethod
+    def normalize(label: str) -> str:
+        return label.strip().lower()
+
+    @classmethod
+    def search(cls, prefix: str, *, limit: int = 10) -> models.QuerySet["TerminLabel"]:
+        return cls.objects.filter(
+            search_label__startswith=cls.normalize(prefix),
+        ).order_by("-count", "label")[:limit]
+
+    @classmethod
+    def rebuild(cls, since: datetime) -> int:
+        """Replace all labels by those of Termine starting after since."""
+        termine = {pk: (label, start, end) for pk, label, start, end in Termin.objects.filter(
+            start__gte=since,
+            stein_block__isnull=True,
+        ).values_list("pk", "label", "start", "end").iterator()}
+
+        resource_sets = defaultdict(set)
+        for termin_id, resource_id in ResourceUsage.objects.filter(
+            termin__in=termine.keys(),
+        ).values_list("termin_id", "resource_id").iterator():
+            resource_sets[termin_id].add(resource_id)
+
+        # label => list of (start, duration, frozenset of resource ids)
+        uses = defaultdict(list)
+        for termin_id, (label, start, end) in termine.items():
+            uses[label.strip()].append((start, end - start, frozenset(resource_sets[termin_id])))
+
+        labels = []
+        for label, label_uses in uses.items():
+            # prefer recent values if equally common
+            label_uses.sort(key=lambda use: use[0], reverse=True)
+            durations = Counter(duration for _, duration, _ in label_uses)
+            resource_ids = Counter(resource_ids for _, _, resource_ids in label_uses)
+            labels.append(cls(
+                label=label,
+                search_label=cls.normalize(label),
+                count=len(label_uses),
+                last_used=label_uses[0][0],
+                duration=durations.most_common(1)[0][0],
+                resource_ids=sorted(resource_ids.most_common(1)[0][0]),
+            ))
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create(labels)
+        return len(labels)
+
+    def __str__(self):
+        return f"{self.label}"
+
+    class Meta:
+        verbose_name = "Terminbezeichner"
+        verbose_name_plural = "Terminbezeichner"
+        ordering = ("-count", "label")
+        indexes = [
+            # allows LIKE 'prefix%' lookups on PostgreSQL, ignored by others
+            models.Index(fields=("search_label",), name="terminlabel_search_label",
+                         opclasses=("varchar_pattern_ops",)),
+        ]
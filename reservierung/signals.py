@@ -0,0 +1,94 @@
+from typing import Any
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import models
+
+
+@receiver(pre_save, sender=models.Termin)
+def remember_termin_range(instance: models.Termin, **_kwargs: Any) -> None:
+    # daily usages of the previous range need to be recalculated as well
+    instance._previous_range = None
+    if instance.pk is not None:
+        instance._previous_range = models.Termin.objects.filter(
+            pk=instance.pk).values_list("start", "end").first()
+
+
+@receiver(post_save, sender=models.Termin)
+def update_termin_conflicts(instance: models.Termin, created: bool,
+                            update_fields: frozenset[str] | None,
+                            **_kwargs: Any) -> None:
+    # new Termine do not have any usages yet
+    if created:
+        return
+
+    # conflicts and daily usages only depend on the range
+    if update_fields is not None and not update_fields & {"start", "end"}:
+        return
+    if getattr(instance, "_previous_range", None) == (instance.start, instance.end):
+        return
+
+    usages = list(instance.usages.select_related("termin", "resource"))
+    models.ResourceUsageConflict.update_for(usages)
+
+    days = {(usage.resource_id, day)
+            for usage in usages
+            for day, _ in models.split_days(instance.start, instance.end)}
+    if getattr(instance, "_previous_range", None):
+        days.update((usage.resource_id, day)
+                    for usage in usages
+                    for day, _ in models.split_days(*instance._previous_range))
+    models.ResourceDailyUsage.update_for(days)
+
+
+@receiver(post_save, sender=models.ResourceUsage)
+def update_usage_conflicts(instance: models.ResourceUsage,
+                           update_fields: frozenset[str] | None,
+                           **_kwargs: Any) -> None:
+    models.ResourceDailyUsage.update_for_usages([instance])
+
+    # changed approval does not change conflicts, only their state
+    if update_fields is not None and update_fields <= {"approved_at"}:
+        models.ResourceUsageConflict.objects.filter(conflicting=instance).update(
+            conflicting_approved=instance.approved)
+        return
+
+    models.ResourceUsageConflict.update_for([instance])
+
+
+@receiver(post_delete, sender=models.ResourceUsage)
+@receiver(post_delete, sender=models.ArchivedResourceUsage)
+def update_deleted_usage_daily_usages(instance: models.ResourceUsage | models.ArchivedResourceUsage,
+                                      **_kwargs: Any) -> None:
+    models.ResourceDailyUsage.update_for_usages([instance])
+
+
+@receiver(pre_save, sender=models.Resource)
+def remember_resource_part_of(instance: models.Resource, **_kwargs: Any) -> None:
+    instance._previous_part_of_id = None
+    if instance.pk is not None:
+        instance._previous_part_of_id = models.Resource.objects.filter(
+            pk=instance.pk).values_list("part_of", flat=True).first()
+
+
+@receiver(post_save, sender=models.Resource)
+def update_resource_conflicts(instance: models.Resource, created: bool,
+                              update_fields: frozenset[str] | None,
+                              **_kwargs: Any) -> None:
+    # only a changed hierarchy changes conflicts, all changed pairs involve a
+    # usage of this Resource or one of its parts
+    if created:
+        return
+    if update_fields is not None and "part_of" not in update_fields:
+        return
+    if getattr(instance, "_previous_part_of_id", None) == instance.part_of_id:
+        return
+
+    # past usages keep the conflicts they had when they took place
+    models.ResourceUsageConflict.update_for(
+        models.ResourceUsage.objects.filter(
+            resource__in=set(instance.traverse_down()),
+            termin__end__gte=timezone.now(),
+        ).select_related("termin", "resource"))
@@ -3,8 +3,69 @@ class ResourceAvailabilityUpdater {
 		options = options || {};
 
 		this.usages_json = options.usages_json;
+		this.approval_preview_json = options.approval_preview_json;
 		this.csrfmiddlewaretoken = options.csrfmiddlewaretoken;
 		this.active_termin = null;
+		this.tags = [];
+	}
+
+	setTags(tags) {
+		this.tags = tags;
+		// hide resources without all tags, but keep selected ones visible
+		$("#resources tr[data-tags]").each(function () {
+			var resource_tags = $(this).attr("data-tags").split(" ");
+			var visible = tags.every((tag) => resource_tags.includes(tag)) || $(this).find("input:checked").length > 0;
+			$(this).toggleClass("d-none", !visible);
+		});
+	}
+
+	_renderFree(data) {
+		var container = $("#free_resources");
+		container.empty();
+		if (this.tags.length == 0) {
+			return;
+		}
+
+		var labels = data.free_resources.map((resource_id) => $("#resourceLabel_" + resource_id).text());
+		if (labels.length > 0) {
+			container.text("Frei: " + labels.join(", "));
+		} else {
+			container.text("Keine passende Ressource frei.");
+		}
+	}
+
+	_renderPreview(data) {
+		var container = $("#approval_preview");
+		container.empty();
+		for (const preview of Object.values(data.resources || {})) {
+			var item = $("<li>").addClass("list-group-item");
+			item.append($("<strong>").text(preview.label + ": "));
+			if (preview.auto_approve) {
+				item.append($("<span>").addClass("badge bg-success").text("Wird automatisch bestätigt"));
+			} else {
+				item.append($("<span>").addClass("badge bg-info").text("Benötigt Zustimmung"));
+			}
+
+			var details = $("<ul>").addClass("mb-0");
+			for (const voting_group of preview.voting_groups) {
+				var text = (preview.self_regulating ? voting_group.label : "Gruppe " + voting_group.label) + ": " + voting_group.users.join(", ");
+				if (voting_group.own_vote) {
+					text = text + " (deine Zustimmung wird eingetragen)";
+				}
+				details.append($("<li>").text(text));
+			}
+			if (preview.informed.length > 0) {
+				details.append($("<li>").text("Informiert: " + preview.informed.join(", ")));
+			}
+			for (const conflict of preview.conflicts) {
+				details.append($("<li>").addClass("text-danger").text(
+					"Konflikt mit " + conflict.termin_label + " (" + conflict.resource_label +
+					(conflict.owner ? ", " + conflict.owner : "") +
+					(conflict.approved ? "" : ", noch nicht bestätigt") + ")"));
+			}
+			item.append(details);
+			container.append(item);
+		}
 	}
 
 	_render(data) {
@@ -48,22 +109,55 @@ class ResourceAvailabilityUpdater {
 			}
 			bar.removeClass("d-none");
 		}
+
+		this._renderFree(data);
+	}
+
+	_validRange(start, end) {
+		const timestamp_regex = /\d{4}-(0\d|1[0-2])-([0-2]\d|3[01])T([01]\d|2[0-3]):[0-5]\d$/;
+		return timestamp_regex.test(start) && timestamp_regex.test(end);
 	}
 
 	update(start, end) {
 		$(".usage_bar").toggleClass("d-none", true).empty();
 
-		const timestamp_regex = /\d{4}-(0\d|1[0-2])-([0-2]\d|3[01])T([01]\d|2[0-3]):[0-5]\d$/;
-		if (!timestamp_regex.test(start) || !timestamp_regex.test(end)) {
+		if (!this._validRange(start, end)) {
+			$("#approval_preview").empty();
+			$("#free_resources").empty();
+			return;
+		}
+
+		$.ajax({
+			url: this.usages_json,
+			method: "POST",
+			traditional: true,
+			data: {"csrfmiddlewaretoken": this.csrfmiddlewaretoken,
+			       "start": start,
+			       "end": end,
+			       "tags": this.tags},
+			success: this._render.bind(this),
+		});
+
+		this.updatePreview(start, end);
+	}
+
+	updatePreview(start, end) {
+		if (!this.approval_preview_json || !this._validRange(start, end)) {
 			return;
 		}
 
-		$.post(
-			this.usages_json,
-			{"csrfmiddlewaretoken": this.csrfmiddlewaretoken,
-			 "start": start,
-			 "end": end},
-			this._render.bind(this),
-		);
+		var resources = $("input[name=resources]:checked").map(function () { return $(this).val(); }).get();
+		$.ajax({
+			url: this.approval_preview_json,
+			method: "POST",
+			// send resources as repeated parameter instead of resources[]
+			traditional: true,
+			data: {"csrfmiddlewaretoken": this.csrfmiddlewaretoken,
+			       "start": start,
+			       "end": end,
+			       "resources": resources,
+			       "termin": this.active_termin || ""},
+			success: this._renderPreview.bind(this),
+		});
 	}
 }
@@ -0,0 +1,122 @@
+from datetime import timedelta
+from typing import Any
+
+from django.db import transaction
+from django.utils import timezone
+
+from monitor.stein_app import STEIN_STATES, query_stein_assets
+from . import models
+
+# Stein.app states in which an asset may not be booked
+BLOCKING_STATES = ("maint", "notready", "inuse")
+
+# Stein.app does not know when an asset becomes available again, so blocks
+# last until the asset changes its state or this duration passed
+BLOCK_DURATION = timedelta(days=365)
+
+
+def _blocking_status(asset: dict | None) -> str | None:
+    if asset is None or asset["status"] not in BLOCKING_STATES:
+        return None
+    return asset["status"]
+
+
+@query_stein_assets.on_update
+def update_stein_blocks(args: Any, kwargs: Any, old_data: list | None, new_data: list) -> None:
+    old_assets = {asset["id"]: asset for asset in old_data or []}
+    new_assets = {asset["id"]: asset for asset in new_data or []}
+
+    # only assets which changed their blocking state touch the database,
+    # without previous data all assets are checked
+    changed_assets = {
+        asset_id: new_assets.get(asset_id)
+        for asset_id in set().union(old_assets, new_assets)
+        if old_data is None or
+        _blocking_status(old_assets.get(asset_id)) != _blocking_status(new_assets.get(asset_id))
+    }
+
+    apply_stein_assets(changed_assets)
+
+
+def apply_stein_assets(assets: dict[int, dict | None]) -> None:
+    """Open or close blocks of Resources for changed Stein.app assets.
+
+    assets maps asset ids to the current asset data (None if deleted).
+    Affected bookings are re-evaluated once and informed with one message
+    per user.
+    """
+    resources = list(models.Resource.objects.filter(stein_asset_id__in=assets))
+    if not resources:
+        return
+
+    now = timezone.now()
+    notifications = models.UsageNotifications()
+
+    with transaction.atomic(), models.ResourceUsageLogMessage.buffered():
+        models.Resource.lock(resources)
+
+        open_blocks = {block.resource_id: block for block in models.SteinBlock.objects.filter(
+            resource__in=resources,
+            termin__end__gt=now,
+        ).select_related("termin")}
+
+        # ids of usages to re-evaluate after all blocks have been changed
+        affected_usages = set()
+
+        for resource in resources:
+            asset = assets[resource.stein_asset_id]
+            status = _blocking_status(asset)
+            block = open_blocks.get(resource.pk)
+
+            if block is not None and block.status != status:
+                # close block, conflicting usages may now be approved
+                affected_usages.update(models.ResourceUsage.objects.filter(
+                    conflict_pairs__conflicting__termin=block.termin,
+                ).values_list("pk", flat=True))
+
+                if block.termin.start < now:
+                    block.termin.end = now
+                    block.termin.save()
+                    for usage in block.termin.usages.all():
+                        usage.log(models.ResourceUsageLogMessage.META, None,
+                                  f"Sperrung aufgehoben, Asset in Stein.app ist {_status_label(asset)}.")
+                else:
+                    # block did not start yet
+                    block.termin.delete()
+
+            if status is not None and (block is None or block.status != status):
+                termin = models.Termin.objects.create(
+                    label=f"{resource.label}: {STEIN_STATES[status]} (Stein.app)",
+                    description=asset.get("comment") or "",
+                    start=now,
+                    end=now + BLOCK_DURATION,
+                )
+                models.SteinBlock.objects.create(resource=resource, termin=termin, status=status)
+                usage = models.ResourceUsage.objects.create(termin=termin, resource=resource,
+                                                            approved_at=now)
+                usage.log(models.ResourceUsageLogMessage.META, None,
+                          f"Automatisch gesperrt, Asset in Stein.app ist {STEIN_STATES[status]}.")
+
+                for conflicting_usage in models.ResourceUsage.objects.filter(
+                    conflict_pairs__conflicting=usage,
+                    termin__stein_block__isnull=True,
+                ).select_related("termin", "resource"):
+                    affected_usages.add(conflicting_usage.pk)
+                    notifications.add(models.SUMMARY_STEIN_BLOCKED, conflicting_usage.get_audience(),
+                                      conflicting_usage)
+
+        # blocks are approved on creation and never re-evaluated
+        for usage in models.ResourceUsage.objects.filter(
+            pk__in=affected_usages,
+            termin__stein_block__isnull=True,
+        ):
+            usage.update_state(notifications)
+
+    # only inform about committed changes
+    notifications.send()
+
+
+def _status_label(asset: dict | None) -> str:
+    if asset is None:
+        return "gelöscht"
+    return STEIN_STATES.get(asset["status"], asset["status"])
@@ -1,5 +1,8 @@
+from functools import lru_cache
+import re
+
 from django import template
-from django.utils.html import conditional_escape, format_html
+from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
 
 
@@ -10,24 +13,18 @@ register = template.Library()
 def highlighter_filter(value, words):
     value = str(value)
 
-    matches = []
-    haystack = _normalize(value)
-    for word in words:
-        needle = _normalize(word)
-        try:
-            match = -1
-            while True:
-                match = haystack.index(needle, match + 1)
-                matches.append((match, match + len(needle)))
-        except ValueError:
-            pass
-
-    # Find overlapping highlights
-    matches.sort()
+    matcher = _compile(tuple(words))
+    if matcher is None:
+        return conditional_escape(value)
+
+    # Find overlapping highlights. The matcher yields the longest match per
+    # position, shorter matches at the same position are covered by it.
     new_matches = []
     current_start = -1
     current_end = 0
-    for start, end in matches:
+    for match in matcher.finditer(_normalize(value)):
+        start = match.start()
+        end = start + len(match.group(1))
         # Iff we are in the same zone, extend selection
         if start < current_end:
             current_end = max(current_end, end)
@@ -40,14 +37,27 @@ def highlighter_filter(value, words):
         new_matches.append((current_start, current_end))
 
     pos = 0
-    result = mark_safe("")
+    result = []
     for start, end in new_matches:
-        result += format_html("{}<mark>{}</mark>", value[pos:start], value[start:end])
+        result.extend((conditional_escape(value[pos:start]), "<mark>",
+                       conditional_escape(value[start:end]), "</mark>"))
         pos = end
 
-    result += conditional_escape(value[pos:])
+    result.append(conditional_escape(value[pos:]))
+
+    return mark_safe("".join(result))
+
 
-    return result
+@lru_cache(maxsize=32)
+def _compile(words: tuple[str, ...]) -> re.Pattern | None:
+    # Compiled once per set of search words and reused for every cell of the
+    # result list. Use a lookahead to find matches at every position (as they
+    # may overlap) and prefer longer needles for the same position.
+    needles = sorted({_normalize(word) for word in words if word},
+                     key=len, reverse=True)
+    if not needles:
+        return None
+    return re.compile(f"(?=({'|'.join(re.escape(needle) for needle in needles)}))")
 
 
 def _normalize(value):
@@ -1,6 +1,9 @@
 from collections import defaultdict
+from collections.abc import Iterable
+import hashlib
 
 from django import template
+from django.core.cache import cache
 from django.utils.safestring import SafeText, mark_safe
 from django.template import loader
 
@@ -8,32 +11,131 @@ from reservierung import models
 
 register = template.Library()
 
+# Rendered schemes of Resources only change if the manager configuration
+# changes, which is part of the cache key
+SCHEME_CACHE_TIMEOUT = 60 * 60
+
 
 @register.filter("resource_approval_scheme")
 def resource_approval_scheme(resource_or_usage: models.Resource | models.ResourceUsage,
                              raw_voting_groups: models.VotingGroups | None = None,
                              ) -> SafeText:
-    if isinstance(resource_or_usage, models.Resource):
-        resource = resource_or_usage
-        usage = None
-    elif isinstance(resource_or_usage, models.ResourceUsage):
-        resource = resource_or_usage.resource
-        usage = resource_or_usage
-    else:
+    if not isinstance(resource_or_usage, (models.Resource, models.ResourceUsage)):
         message = f"{resource_or_usage} ({type(resource_or_usage)} is not supported."
         raise TypeError(message)
 
-    if raw_voting_groups is None:
-        raw_voting_groups = (usage or resource).get_voting_groups()
+    # use result of prefetch_approval_schemes if available
+    if raw_voting_groups is None and hasattr(resource_or_usage, "_approval_scheme"):
+        return resource_or_usage._approval_scheme
+
+    prefetch_approval_schemes(
+        [resource_or_usage],
+        voting_groups=None if raw_voting_groups is None else {resource_or_usage: raw_voting_groups},
+    )
+    return resource_or_usage._approval_scheme
+
+
+def prefetch_approval_schemes(objects: Iterable[models.Resource | models.ResourceUsage], *,
+                              voting_groups: dict | None = None) -> None:
+    """Render approval schemes for many Resources and ResourceUsages at once.
+
+    Managers, their users, admins and votes of all objects are fetched with a
+    handful of queries. The rendered scheme is stored in each object and used
+    by the resource_approval_scheme filter afterwards. voting_groups may map
+    objects to already known VotingGroups.
+    """
+    objects = list(objects)
+    voting_groups = voting_groups or {}
+
+    resource_ids = {obj.pk if isinstance(obj, models.Resource) else obj.resource_id
+                    for obj in objects}
+
+    # fetch the resources and their ancestors, one query per level
+    all_resources = {}
+    missing_ids = resource_ids
+    while missing_ids:
+        fetched_resources = models.Resource.objects.in_bulk(missing_ids)
+        all_resources.update(fetched_resources)
+        missing_ids = {resource.part_of_id for resource in fetched_resources.values()
+                       if resource.part_of_id is not None} - all_resources.keys()
+
+    tree = models.ResourceTree({resource.pk: resource.part_of_id for resource in all_resources.values()})
+    upper_resource_ids = set(all_resources)
+
+    # keep default ordering of managers to match Resource.get_voting_groups
+    # and Resource.get_admins
+    all_managers = list(models.ResourceManager.objects.filter(
+        resource__in=upper_resource_ids,
+    ).select_related("resource", "funktion").prefetch_related("funktion__user"))
+
+    managers = defaultdict(list)
+    for manager in all_managers:
+        managers[manager.resource_id].append(manager)
+
+    votes = defaultdict(dict)
+    usages = [obj for obj in objects if isinstance(obj, models.ResourceUsage)]
+    if usages:
+        for vote in models.ResourceUsageConfirmation.objects.filter(
+            resource_usage__in=usages,
+            revoked_at__isnull=True,
+            approver__isnull=False,
+        ).select_related("approver"):
+            votes[vote.resource_usage_id][vote.approver] = vote
+
+    # approved conflicting usages vote on self-regulating resources, see
+    # ResourceUsage.get_voting_groups
+    conflicting = defaultdict(list)
+    open_usages = [usage for usage in usages if usage not in voting_groups and not any(
+        manager.voting_group for manager in managers[usage.resource_id])]
+    if open_usages:
+        for conflict in models.ResourceUsageConflict.objects.filter(
+            usage__in=open_usages,
+            conflicting__approved_at__isnull=False,
+        ).select_related("conflicting__termin__owner").order_by("conflicting_id"):
+            conflicting[conflict.usage_id].append(conflict.conflicting)
+
+    for obj in objects:
+        usage = obj if isinstance(obj, models.ResourceUsage) else None
+        resource = all_resources[obj.pk if usage is None else obj.resource_id]
+
+        admin_resource_ids = set(tree.traverse_up(resource.pk))
+        admin_managers = [manager for manager in all_managers
+                          if manager.admin and manager.resource_id in admin_resource_ids]
+
+        raw_voting_groups = voting_groups.get(obj)
+        if raw_voting_groups is None:
+            raw_voting_groups = models.VotingGroups.from_managers(managers[resource.pk])
+            if usage and raw_voting_groups.is_open():
+                raw_voting_groups.add_conflicting(
+                    conflicting_usage for conflicting_usage in conflicting[usage.pk]
+                    if usage.approved_at is None or conflicting_usage.approved_at < usage.approved_at)
+
+        cache_key = None
+        if usage is None and obj not in voting_groups:
+            # labels of ancestors are shown for inherited admins
+            version = hashlib.sha256(repr((
+                resource.label, resource.selectable,
+                [(upper_id, all_resources[upper_id].label) for upper_id in tree.traverse_up(resource.pk)],
+                [(manager.pk, manager.resource_id, manager.voting_group, manager.admin,
+                  manager.funktion.funktion_label,
+                  [(user.pk, str(user)) for user in manager.funktion.user.all()])
+                 for manager in managers[resource.pk] + admin_managers],
+            )).encode()).hexdigest()
+            cache_key = f"resource_approval_scheme#{resource.pk}#{version}"
+            cached_scheme = cache.get(cache_key)
+            if cached_scheme is not None:
+                obj._approval_scheme = mark_safe(cached_scheme)
+                continue
+
+        obj._approval_scheme = _render_approval_scheme(
+            resource, raw_voting_groups, votes[obj.pk] if usage else {},
+            models.ResourceManager.iter_users(admin_managers))
+
+        if cache_key is not None:
+            cache.set(cache_key, str(obj._approval_scheme), SCHEME_CACHE_TIMEOUT)
 
-    votes = {}
-    if usage:
-        votes = {vote.approver: vote
-                 for vote in usage.confirmations.filter(
-                     revoked_at__isnull=True,
-                     approver__isnull=False,
-                 )}
 
+def _render_approval_scheme(resource, raw_voting_groups, votes, admins) -> SafeText:
     voting_groups = {voting_group: [(manager_user, votes.get(manager_user), funktion_label)
                                     for funktion_label, manager_user in manager_users]
                      for voting_group, manager_users in raw_voting_groups.items()}
@@ -42,7 +144,7 @@ def resource_approval_scheme(resource_or_usage: models.Resource | models.Resourc
     context["resource"] = resource
     context["informed"] = voting_groups.pop("", [])
     context["voting_groups"] = sorted(voting_groups.items())
-    context["admins"] = list(resource.get_admins())
+    context["admins"] = list(admins)
 
     return mark_safe(loader.render_to_string(
         "reservierung/_resource_approval_scheme.html", context))
@@ -1,3 +1,599 @@
-from django.test import TestCase
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from io import StringIO
+import os
+import re
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User as AuthUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from login_hermine.models import HermineUserMessage
+from reservierung import models, views
+from reservierung.stein import apply_stein_assets
+from reservierung.templatetags.highlighter import _compile, highlighter_filter
+from reservierung.templatetags.resource import resource_approval_scheme
+from reservierung.views import ResourceUsageBulkRejectView, ResourceUsageBulkVoteView, TerminFormView
+
+# templates need the manifest of collectstatic otherwise
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def create_usage(resource, owner, label="Dienstabend", start=None, hours=2):
+    start = start or timezone.now() + timedelta(days=1)
+    termin = models.Termin.objects.create(label=label, owner=owner, start=start,
+                                          end=start + timedelta(hours=hours))
+    return models.ResourceUsage.objects.create(termin=termin, resource=resource)
+
+
+def post_request(data, user):
+    request = RequestFactory().post("/", data)
+    request.session = {"jwt_userdata": {"uid": user.username, "displayName": str(user)}}
+    return request
+
+
+class HighlighterTest(SimpleTestCase):
+    def test_compile_prefers_longer_needles(self):
+        matcher = _compile(("Dienst", "dienstabend", ""))
+        self.assertEqual([match.group(1) for match in matcher.finditer("dienstabend")],
+                         ["dienstabend"])
+
+    def test_compile_without_words(self):
+        self.assertIsNone(_compile(()))
+        self.assertIsNone(_compile(("",)))
+
+    def test_overlapping_needles(self):
+        self.assertEqual(highlighter_filter("Abendessen", ["bend", "endes"]),
+                         "A<mark>bendes</mark>sen")
+
+    def test_prefix_needles(self):
+        self.assertEqual(highlighter_filter("Dienstabend", ["dienst", "Dienstab"]),
+                         "<mark>Dienstab</mark>end")
+
+    def test_adjacent_matches_are_separate(self):
+        self.assertEqual(highlighter_filter("abab", ["ab"]),
+                         "<mark>ab</mark><mark>ab</mark>")
+
+    def test_umlauts_and_escaping(self):
+        self.assertEqual(highlighter_filter("Übung <Halle>", ["ubung", "halle"]),
+                         "<mark>Übung</mark> &lt;<mark>Halle</mark>&gt;")
+
+    def test_many_rows(self):
+        words = ["dienst", "abend", "halle", "übung", "fahrzeug"]
+        rows = [f"Dienstabend {i}: Übung in der Halle mit Fahrzeug {i % 7} und Dienstplan"
+                for i in range(500)]
+
+        # the matcher of the words is compiled once for all rows
+        with mock.patch("reservierung.templatetags.highlighter.re.compile", wraps=re.compile) as compile_:
+            _compile.cache_clear()
+            results = [highlighter_filter(row, words) for row in rows]
+
+        self.assertEqual(compile_.call_count, 1)
+        self.assertEqual({result.count("<mark>") for result in results}, {6})
+
+
+class ApprovalSchemeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.halle = models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        self.raum = models.Resource.objects.create(label="Raum", slug="raum", part_of=self.halle,
+                                                   selectable=True)
+        models.Resource.objects.create(label="Auto", slug="auto", selectable=True)
+
+        funktion = models.Funktion.objects.create(funktion_label="Admin")
+        funktion.user.add(models.User.objects.create(username="carol", firstname="Carol", surname="C"))
+        models.ResourceManager.objects.create(resource=self.halle, funktion=funktion, voting_group="",
+                                              admin=True)
+
+    def test_fetches_only_ancestors(self):
+        with CaptureQueriesContext(connection) as queries:
+            scheme = resource_approval_scheme(models.Resource.objects.get(pk=self.raum.pk))
+
+        self.assertIn("vererbt von Halle", scheme)
+        resource_queries = [query["sql"] for query in queries.captured_queries
+                            if query["sql"].startswith('SELECT "reservierung_resource"')]
+        self.assertTrue(resource_queries)
+        self.assertTrue(all(" WHERE " in sql for sql in resource_queries), resource_queries)
+
+    def test_renamed_ancestor(self):
+        resource_approval_scheme(models.Resource.objects.get(pk=self.raum.pk))
+        self.halle.label = "Große Halle"
+        self.halle.save()
+
+        self.assertIn("vererbt von Große Halle",
+                      resource_approval_scheme(models.Resource.objects.get(pk=self.raum.pk)))
+
+    @override_settings(STORAGES=STORAGES)
+    def test_termin_detail_prefetches(self):
+        alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+        termin = create_usage(self.halle, alice).termin
+        for resource in models.Resource.objects.exclude(pk=self.halle.pk):
+            models.ResourceUsage.objects.create(termin=termin, resource=resource)
+        # approved conflicting usages vote on self-regulating resources
+        bob = models.User.objects.create(username="bob", firstname="Bob", surname="B")
+        models.ResourceUsage.objects.filter(pk=create_usage(
+            models.Resource.objects.get(slug="auto"), bob, label="Fahrt", start=termin.start).pk,
+        ).update(approved_at=timezone.now())
+        session = self.client.session
+        session["jwt_userdata"] = {"uid": "alice", "displayName": "Alice A"}
+        session.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(termin.get_absolute_url())
+
+        self.assertContains(response, "vererbt von Halle")
+        self.assertContains(response, "Terminersteller Fahrt")
+        manager_queries = [query["sql"] for query in queries.captured_queries
+                           if query["sql"].startswith('SELECT "reservierung_resourcemanager"')]
+        self.assertEqual(len(manager_queries), 1, manager_queries)
+
+
+class ApprovalPreviewTest(TestCase):
+    def setUp(self):
+        self.halle = models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        self.auto = models.Resource.objects.create(label="Auto", slug="auto", selectable=True)
+        self.alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+        self.bob = models.User.objects.create(username="bob", firstname="Bob", surname="B")
+        funktion = models.Funktion.objects.create(funktion_label="Hallenwart")
+        funktion.user.add(self.bob)
+        models.ResourceManager.objects.create(resource=self.halle, funktion=funktion, voting_group="Halle",
+                                              admin=False)
+        self.start = timezone.now() + timedelta(days=1)
+
+    def assert_preview_matches(self, resource, user, **expected):
+        preview = models.ResourceUsage.preview_approvals(
+            self.start, self.start + timedelta(hours=2), [resource], user)[resource]
+        for key, value in expected.items():
+            self.assertEqual(preview[key], value, key)
+
+        usage = create_usage(resource, user, start=self.start)
+        usage.request_approvals(user)
+        usage.refresh_from_db()
+        self.assertEqual(preview["approved"], usage.approved)
+        return usage
+
+    def test_voting_group(self):
+        self.assert_preview_matches(self.halle, self.alice, approved=False, self_regulating=False,
+                                    missing_voting_groups={"Halle"})
+        self.assert_preview_matches(self.halle, self.bob, approved=True, missing_voting_groups=set())
+
+    def test_self_regulating(self):
+        first = self.assert_preview_matches(self.auto, self.alice, approved=True, self_regulating=True,
+                                            conflicts=[])
+        self.assert_preview_matches(self.auto, self.bob, approved=False, conflicts=[first],
+                                    missing_voting_groups={f"Buchung #{first.pk}"})
+
+
+class ResourceUsageBulkTest(TestCase):
+    def setUp(self):
+        self.halle = models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        self.alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+
+    def test_lock_skips_concurrently_changed_usages(self):
+        approved, rejected, open_usage = [create_usage(self.halle, self.alice, label=label)
+                                          for label in ("A", "B", "C")]
+        models.ResourceUsage.objects.filter(pk=approved.pk).update(approved_at=timezone.now())
+        models.ResourceUsage.objects.filter(pk=rejected.pk).update(rejected_at=timezone.now())
+
+        self.assertEqual(ResourceUsageBulkVoteView().lock_usages([approved, rejected, open_usage]),
+                         [open_usage])
+        self.assertEqual(ResourceUsageBulkRejectView().lock_usages([approved, rejected, open_usage]),
+                         [approved, open_usage])
+
+    def test_vote_with_comment(self):
+        bob = models.User.objects.create(username="bob", firstname="Bob", surname="B")
+        funktion = models.Funktion.objects.create(funktion_label="Hallenwart")
+        funktion.user.add(bob)
+        models.ResourceManager.objects.create(resource=self.halle, funktion=funktion, voting_group="Halle",
+                                              admin=False)
+        usages = [create_usage(self.halle, self.alice, start=timezone.now() + timedelta(days=days))
+                  for days in (1, 8)]
+
+        response = ResourceUsageBulkVoteView.as_view()(post_request({
+            "usages": [usage.pk for usage in usages], "comment": "Schlüssel beim Hallenwart",
+        }, bob))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(models.ResourceUsageConfirmation.objects.filter(
+            comment="Schlüssel beim Hallenwart").count(), 2)
+        messages = HermineUserMessage.objects.filter(user="Alice A (OV Darmstadt)")
+        self.assertEqual([message.message.splitlines()[0] for message in messages],
+                         ["Hallo Alice, die folgenden Buchungen wurden mit einem Kommentar bestätigt:"])
+
+
+class SendDigestsTest(TestCase):
+    def test_quiet_period_keeps_interval(self):
+        halle = models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+        bob = models.User.objects.create(username="bob", firstname="Bob", surname="B",
+                                         digest=models.User.DIGEST_HOURLY,
+                                         digest_sent_at=timezone.now() - timedelta(days=3))
+
+        call_command("send_digests", stdout=StringIO())
+        bob.refresh_from_db()
+        self.assertGreater(bob.digest_sent_at, timezone.now() - timedelta(minutes=1))
+
+        models.PendingNotification.defer(models.PendingNotification.INFORM, [bob], create_usage(halle, alice))
+        call_command("send_digests", stdout=StringIO())
+        self.assertFalse(HermineUserMessage.objects.exists())
+
+        models.User.objects.filter(pk=bob.pk).update(digest_sent_at=timezone.now() - timedelta(hours=1))
+        call_command("send_digests", stdout=StringIO())
+        self.assertEqual(HermineUserMessage.objects.get().user, "Bob B (OV Darmstadt)")
+        self.assertFalse(models.PendingNotification.objects.exists())
+
+
+class ArchiveUsagesTest(TestCase):
+    def test_archive_keeps_state_and_daily_usages(self):
+        halle = models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        raum = models.Resource.objects.create(label="Raum", slug="raum", selectable=True)
+        alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+        usage = create_usage(halle, alice, start=timezone.now() - timedelta(days=3 * 365))
+        models.ResourceUsage.objects.create(termin=usage.termin, resource=raum, rejected_at=timezone.now())
+        daily_usages = list(models.ResourceDailyUsage.objects.values_list(
+            "resource", "date", "booked_seconds", "termin_count"))
+        self.assertEqual(usage.termin.state, "rejected")
+
+        with mock.patch.object(models.ResourceDailyUsage, "update_for") as update_for:
+            call_command("archive_usages", "--batch-size=1", stdout=StringIO())
+
+        update_for.assert_not_called()
+        self.assertFalse(models.ResourceUsage.objects.exists())
+        self.assertEqual(models.ArchivedResourceUsage.objects.count(), 2)
+        self.assertEqual(models.Termin.objects.get().state, "rejected")
+        self.assertEqual(list(models.ResourceDailyUsage.objects.values_list(
+            "resource", "date", "booked_seconds", "termin_count")), daily_usages)
+        self.assertTrue(daily_usages)
+
+
+class ConflictSignalTest(TestCase):
+    def setUp(self):
+        self.halle = models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        self.raum = models.Resource.objects.create(label="Raum", slug="raum", selectable=True)
+        self.alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+
+    def conflicts(self):
+        return set(models.ResourceUsageConflict.objects.values_list("usage", "conflicting"))
+
+    def test_label_changes_keep_conflicts(self):
+        usage = create_usage(self.halle, self.alice)
+        with CaptureQueriesContext(connection) as queries:
+            usage.termin.label = "Übung"
+            usage.termin.save()
+            self.halle.label = "Große Halle"
+            self.halle.save()
+            self.raum.save(update_fields=["label"])
+
+        self.assertFalse([query["sql"] for query in queries.captured_queries
+                          if "reservierung_resourceusageconflict" in query["sql"]])
+
+    def test_part_of_updates_only_current_usages(self):
+        past = timezone.now() - timedelta(days=7)
+        old_halle = create_usage(self.halle, self.alice, start=past)
+        old_raum = create_usage(self.raum, self.alice, start=past)
+        new_halle = create_usage(self.halle, self.alice)
+        new_raum = create_usage(self.raum, self.alice)
+        self.assertEqual(self.conflicts(), set())
+
+        self.raum.part_of = self.halle
+        self.raum.save()
+
+        self.assertEqual(self.conflicts(), {(new_halle.pk, new_raum.pk), (new_raum.pk, new_halle.pk)})
+        self.assertFalse({old_halle.pk, old_raum.pk} & {pk for pair in self.conflicts() for pk in pair})
+
+    def test_fill_conflicts_migration(self):
+        self.raum.part_of = self.halle
+        self.raum.save()
+        start = timezone.now() + timedelta(days=1)
+        usages = [create_usage(self.halle, self.alice, start=start),
+                  create_usage(self.raum, self.alice, start=start + timedelta(hours=1)),
+                  create_usage(self.raum, self.alice, start=start + timedelta(hours=2)),
+                  create_usage(self.raum, self.alice, start=start + timedelta(hours=4))]
+        models.ResourceUsage.objects.filter(pk=usages[1].pk).update(approved_at=timezone.now())
+        models.ResourceUsageConflict.update_for(models.ResourceUsage.objects.select_related("termin", "resource"))
+        expected = set(models.ResourceUsageConflict.objects.values_list(
+            "usage", "conflicting", "start", "end", "conflicting_approved"))
+
+        models.ResourceUsageConflict.objects.all().delete()
+        with self.assertNumQueries(3):
+            import_module("reservierung.migrations.0005_resourceusageconflict").fill_conflicts(apps, None)
+
+        self.assertEqual(set(models.ResourceUsageConflict.objects.values_list(
+            "usage", "conflicting", "start", "end", "conflicting_approved")), expected)
+        self.assertEqual(len(expected), 4)
+
+
+class TerminFormTest(TestCase):
+    def setUp(self):
+        self.halle = models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        self.raum = models.Resource.objects.create(label="Raum", slug="raum", part_of=self.halle,
+                                                   selectable=True)
+        self.alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+        self.start = timezone.now().replace(second=0, microsecond=0) + timedelta(days=1)
+
+    def test_booking_saved_after_validation(self):
+        for confirm_warnings in ("", "on"):
+            with self.subTest(confirm_warnings=confirm_warnings):
+                form = views.TerminForm({
+                    "label": "Übung", "description": "", "confirm_warnings": confirm_warnings,
+                    "start": f"{timezone.localtime(self.start):%Y-%m-%dT%H:%M}",
+                    "end": f"{timezone.localtime(self.start + timedelta(hours=2)):%Y-%m-%dT%H:%M}",
+                    "resources": [self.raum.pk],
+                })
+                self.assertTrue(form.is_valid(), form.errors)
+                usage = create_usage(self.halle, self.alice, start=self.start)
+
+                self.assertFalse(form.recheck_warnings())
+                self.assertIn("Die Ressource Raum ist in dem Zeitraum bereits blockiert.", form.errors["resources"])
+                self.assertFalse(form.cleaned_data.get("confirm_warnings"))
+                usage.termin.delete()
+
+
+@override_settings(STORAGES=STORAGES)
+class ResourceDetailTest(TestCase):
+    def setUp(self):
+        models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        session = self.client.session
+        session["jwt_userdata"] = {"uid": "alice", "displayName": "Alice A"}
+        session.save()
+
+    def test_heatmap_years(self):
+        url = reverse("reservierung:resource_detail", kwargs={"slug": "halle"})
+        year = timezone.localdate().year
+
+        self.assertEqual(self.client.get(url).context["heatmap_year"], year)
+        response = self.client.get(url, {"year": year - 10})
+        self.assertEqual(response.context["heatmap_year"], year - 10)
+        self.assertIsNone(response.context["heatmap_previous_year"])
+        self.assertEqual(response.context["heatmap_next_year"], year - 9)
+
+        for invalid_year in ("0", "1", "10000", str(year + 11), "abc"):
+            with self.subTest(year=invalid_year):
+                self.assertEqual(self.client.get(url, {"year": invalid_year}).status_code, 404)
+
+
+@override_settings(STORAGES=STORAGES)
+class ImportTermineTest(TestCase):
+    def setUp(self):
+        self.halle = models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        self.raum = models.Resource.objects.create(label="Raum", slug="raum", part_of=self.halle,
+                                                   selectable=True)
+        self.alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+        self.client.force_login(AuthUser.objects.create_superuser("admin"))
+        self.day = timezone.localtime(timezone.now() + timedelta(days=2))
+
+    def upload(self, name, content, **data):
+        return self.client.post(reverse("admin:reservierung_termin_import"), {
+            "file": SimpleUploadedFile(name, content.encode()), "owner": self.alice.pk, **data,
+        })
+
+    def test_overlapping_lines(self):
+        content = "Bezeichner;Start;Ende;Ressourcen\n" + "".join(
+            f"{label};{self.day:%d.%m.%Y} {start};{self.day:%d.%m.%Y} {end};{slug}\n"
+            for label, start, end, slug in [("A", "10:00", "12:00", "halle"),
+                                            ("B", "11:00", "13:00", "raum"),
+                                            ("C", "12:00", "14:00", "halle")])
+
+        response = self.upload("termine.csv", content)
+        self.assertEqual(response.context["form"].errors["file"], [
+            "Zeile 2: Die Ressource Halle ist in dem Zeitraum bereits durch Zeile 3 blockiert.",
+            "Zeile 3: Die Ressource Raum ist in dem Zeitraum bereits durch Zeile 2, 4 blockiert.",
+            "Zeile 4: Die Ressource Halle ist in dem Zeitraum bereits durch Zeile 3 blockiert.",
+        ])
+        self.assertFalse(models.Termin.objects.exists())
+
+        response = self.upload("termine.csv", content, confirm_warnings="on")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(models.ResourceUsage.objects.count(), 3)
+
+    def test_recurring_events(self):
+        content = (f"BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nSUMMARY:Dienstabend\r\n"
+                   f"DTSTART:{self.day:%Y%m%d}T180000\r\nDTEND:{self.day:%Y%m%d}T200000\r\n"
+                   f"RRULE:FREQ=WEEKLY;COUNT=4\r\nCATEGORIES:halle\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n")
+
+        response = self.upload("termine.ics", content)
+        self.assertIn("Zeile 2: Wiederkehrende Termine werden nicht unterstützt",
+                      response.context["form"].errors["file"][0])
+        self.assertFalse(models.Termin.objects.exists())
+
+    def test_missing_fields(self):
+        response = self.upload("termine.csv", "Bezeichner;Start;Ende;Ressourcen\n"
+                                              "Übung;01.01.2027 10:00;01.01.2027 12:00\n")
+        self.assertEqual(response.context["form"].errors["file"],
+                         ["Zeile 2: Fehlende Werte für Ressourcen."])
+        self.assertFalse(models.Termin.objects.exists())
+
+    def test_add_permission(self):
+        self.client.force_login(AuthUser.objects.create_user("staff", is_staff=True))
+        self.assertEqual(self.client.get(reverse("admin:reservierung_termin_import")).status_code, 403)
+
+
+class SteinBlockTest(TestCase):
+    def setUp(self):
+        self.auto = models.Resource.objects.create(label="Auto", slug="auto", selectable=True,
+                                                   stein_asset_id=7)
+        self.anhaenger = models.Resource.objects.create(label="Anhänger", slug="anhaenger",
+                                                        selectable=True, stein_asset_id=8)
+        self.alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+
+    def test_block_opens_on_maint(self):
+        apply_stein_assets({7: {"id": 7, "status": "maint", "comment": "Reifenwechsel"}})
+
+        block = models.SteinBlock.objects.select_related("termin").get()
+        self.assertEqual((block.resource, block.status), (self.auto, "maint"))
+        self.assertEqual(block.termin.description, "Reifenwechsel")
+        self.assertLessEqual(block.termin.start, timezone.now())
+        self.assertEqual(block.termin.usages.get().state, "approved")
+
+        # unchanged state keeps the block
+        apply_stein_assets({7: {"id": 7, "status": "maint"}})
+        self.assertEqual(models.SteinBlock.objects.get(), block)
+
+    def test_block_closes_on_ready(self):
+        apply_stein_assets({7: {"id": 7, "status": "maint"}})
+        termin = models.SteinBlock.objects.get().termin
+
+        apply_stein_assets({7: {"id": 7, "status": "ready"}})
+
+        termin.refresh_from_db()
+        self.assertLessEqual(termin.end, timezone.now())
+        self.assertIn("Sperrung aufgehoben, Asset in Stein.app ist",
+                      models.ResourceUsageLogMessage.objects.filter(usage__termin=termin).last().message)
+        self.assertFalse(models.SteinBlock.objects.filter(termin__end__gt=timezone.now()).exists())
+
+    def test_block_closes_before_start(self):
+        start = timezone.now() + timedelta(hours=1)
+        termin = models.Termin.objects.create(label="Auto: Wartung", start=start, end=start + timedelta(days=1))
+        models.SteinBlock.objects.create(resource=self.auto, termin=termin, status="maint")
+
+        apply_stein_assets({7: {"id": 7, "status": "ready"}})
+
+        self.assertFalse(models.Termin.objects.exists())
+        self.assertFalse(models.SteinBlock.objects.exists())
+
+    def test_conflicting_usages(self):
+        usages = [create_usage(resource, self.alice) for resource in (self.auto, self.anhaenger)]
+        models.ResourceUsage.objects.filter(pk__in=[usage.pk for usage in usages]).update(
+            approved_at=timezone.now())
+
+        apply_stein_assets({7: {"id": 7, "status": "maint"}, 8: {"id": 8, "status": "notready"}})
+
+        self.assertEqual(models.ResourceUsage.objects.filter(termin__stein_block__isnull=True,
+                                                             approved_at__isnull=True).count(), 2)
+        # one message per summary for both usages
+        messages = list(HermineUserMessage.objects.values_list("message", flat=True))
+        blocked_messages = [message for message in messages if "Sperrung aus Stein.app" in message]
+        self.assertEqual(len(blocked_messages), 1, messages)
+        self.assertEqual(len(messages), len(set(message.split("\n")[0] for message in messages)), messages)
+        for resource in ("Auto", "Anhänger"):
+            self.assertIn(f"- {resource} für Dienstabend", blocked_messages[0])
+
+    def test_failed_notification_keeps_blocks(self):
+        usage = create_usage(self.auto, self.alice)
+        models.ResourceUsage.objects.filter(pk=usage.pk).update(approved_at=timezone.now())
+
+        with mock.patch.object(models.User, "send_multiple", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                apply_stein_assets({7: {"id": 7, "status": "maint"}})
+
+        self.assertTrue(models.SteinBlock.objects.exists())
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    def book(self, resource, start, barrier, results):
+        request = post_request({
+            "label": "Dienstabend", "description": "",
+            "start": f"{timezone.localtime(start):%Y-%m-%dT%H:%M}",
+            "end": f"{timezone.localtime(start + timedelta(hours=2)):%Y-%m-%dT%H:%M}",
+            "resources": [resource.pk],
+        }, self.alice)
+        try:
+            barrier.wait()
+            results.append(TerminFormView.as_view()(request).status_code)
+        finally:
+            connection.close()
+
+    def test_overlapping_bookings_of_related_resources(self):
+        halle = models.Resource.objects.create(label="Halle", slug="halle", selectable=True)
+        raum = models.Resource.objects.create(label="Raum", slug="raum", part_of=halle, selectable=True)
+        self.alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+        start = timezone.now().replace(second=0, microsecond=0) + timedelta(days=1)
+
+        results = []
+        resources = [halle, raum] * 3
+        barrier = threading.Barrier(len(resources))
+        threads = [threading.Thread(target=self.book, args=(resource, start, barrier, results))
+                   for resource in resources]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # all others get the conflict as warning to confirm
+        self.assertEqual(sorted(results), [200] * 5 + [302])
+        self.assertEqual(models.ResourceUsage.objects.count(), 1)
+
+
+class CalDAVStandIn(BaseHTTPRequestHandler):
+    """Stores events of PUT requests in server.events by path."""
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status):
+        self.server.requests.append((self.command, self.path))
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_PUT(self):
+        self.server.events[self.path] = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        self._respond(201)
+
+    def do_DELETE(self):
+        self._respond(204 if self.server.events.pop(self.path, None) is not None else 404)
+
+
+class SyncCalDAVTest(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CalDAVStandIn)
+        self.server.events = {}
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.auto = models.Resource.objects.create(label="Auto", slug="auto", selectable=True,
+                                                   caldav_calendar="auto")
+        alice = models.User.objects.create(username="alice", firstname="Alice", surname="A")
+        self.usage = create_usage(self.auto, alice)
+        models.ResourceUsage.objects.filter(pk=self.usage.pk).update(approved_at=timezone.now())
+
+    def sync(self):
+        self.server.requests.clear()
+        url = f"http://127.0.0.1:{self.server.server_port}/dav/"
+        with mock.patch.dict(os.environ, {"RESERVIERUNG_CALDAV_URL": url}):
+            call_command("sync_caldav", stdout=StringIO(), stderr=StringIO())
+        return sorted(self.server.requests)
+
+    def test_sync(self):
+        name = f"reservierung-{self.usage.pk}.ics"
+        self.assertEqual(self.sync(), [("PUT", f"/dav/auto/{name}")])
+        self.assertEqual(self.sync(), [])
+
+        self.usage.termin.label = "Einkauf"
+        self.usage.termin.save()
+        self.assertEqual(self.sync(), [("PUT", f"/dav/auto/{name}")])
+        self.assertIn("SUMMARY:Einkauf", self.server.events[f"/dav/auto/{name}"])
+
+        self.auto.caldav_calendar = "fahrzeuge"
+        self.auto.save()
+        self.assertEqual(self.sync(), [("DELETE", f"/dav/auto/{name}"), ("PUT", f"/dav/fahrzeuge/{name}")])
+        self.assertEqual(models.CalendarEntry.objects.get().calendar, "fahrzeuge")
+
+        self.auto.caldav_calendar = ""
+        self.auto.save()
+        self.assertEqual(self.sync(), [("DELETE", f"/dav/fahrzeuge/{name}")])
+        self.assertEqual(self.server.events, {})
+        self.assertFalse(models.CalendarEntry.objects.exists())
+        self.assertEqual(self.sync(), [])
+
+    def test_rejected_usage(self):
+        self.sync()
+        models.ResourceUsage.objects.filter(pk=self.usage.pk).update(rejected_at=timezone.now())
+
+        self.assertEqual(self.sync(), [("DELETE", f"/dav/auto/reservierung-{self.usage.pk}.ics")])
+        self.assertFalse(models.CalendarEntry.objects.exists())
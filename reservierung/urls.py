@@ -11,6 +11,16 @@ urlpatterns = [
     path("usages.json",
          views.fetch_usages,
          name="usages_json"),
+    path("approval_preview.json",
+         views.fetch_approval_preview,
+         name="approval_preview_json"),
+    path("labels.json",
+         views.fetch_termin_labels,
+         name="termin_labels_json"),
+
+    path("settings",
+         views.UserSettingsView.as_view(),
+         name="user_settings"),
 
     path("resource",
          views.ResourceListView.as_view(),
@@ -31,6 +41,13 @@ urlpatterns = [
          views.AllTerminListView.as_view(),
          name="termin_list"),
 
+    path("bulk/vote",
+         views.ResourceUsageBulkVoteView.as_view(),
+         name="resourceusage_bulk_vote"),
+    path("bulk/reject",
+         views.ResourceUsageBulkRejectView.as_view(),
+         name="resourceusage_bulk_reject"),
+
     path("termin/<int:pk>_<str:date>_<str:slug>",
          views.TerminDetailView.as_view(),
          name="termin_detail"),
@@ -1,9 +1,10 @@
 from collections import defaultdict
 from contextlib import suppress
-from datetime import datetime, time, timedelta
-from functools import lru_cache
+from datetime import date, datetime, time, timedelta
+import uuid
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import Q
 from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
@@ -11,11 +12,12 @@ from django.template.defaultfilters import slugify
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.decorators import method_decorator
-from django.views.decorators.http import require_POST
-from django.views.generic import FormView, TemplateView, ListView, DetailView, DeleteView
+from django.views.decorators.http import require_GET, require_POST
+from django.views.generic import FormView, TemplateView, ListView, DetailView, DeleteView, UpdateView
 
 from kantine.decorators import require_jwt_login
 from . import models
+from .templatetags.resource import prefetch_approval_schemes
 from .templatetags.timerange import timerange_filter
 
 @require_POST
@@ -27,22 +29,25 @@ def fetch_usages(request):
     except (KeyError, ValueError):
         return JsonResponse({"error": "unexpected arguments"})
 
-    parents = {resource.pk: None if resource.part_of is None else resource.part_of.pk
-               for resource in models.Resource.objects.all()}
+    tree = models.ResourceTree.fetch()
 
-    @lru_cache(maxsize=None)
-    def _get_upper_resources(resource_id):
-        if parents[resource_id] is None:
-            return []
-        return _get_upper_resources(parents[resource_id]) + [parents[resource_id]]
+    termin_usages = models.ResourceUsage.objects.filter(
+        termin__end__gte=start,
+        termin__start__lte=end,
+        rejected_at__isnull=True,
+    )
 
-    @lru_cache(maxsize=None)
-    def _get_lower_resources(resource):
-        resources = []
-        for child in resource.consists_of.all():
-            resources.append(child.pk)
-            resources.extend(_get_lower_resources(child))
-        return resources
+    # only build bars for resources with all given tags and only fetch
+    # usages which may show up on them
+    resource_ids = list(tree.parents.keys())
+    tags = request.POST.getlist("tags")
+    if tags:
+        resource_ids = sorted(models.ResourceTag.get_resource_ids(tags))
+        termin_usages = termin_usages.filter(resource__in={
+            related_id
+            for resource_id in resource_ids
+            for related_id in tree.related_ids(resource_id)
+        })
 
     # resource pk => list of tuples (timestamp, "start" / "end", kind)
     # note that "end" < "start" is crucial for sorting here
@@ -50,21 +55,22 @@ def fetch_usages(request):
     usages = defaultdict(list)
     all_usages = {}
 
-    for usage in models.ResourceUsage.objects.filter(termin__end__gte=start, termin__start__lte=end, rejected_at__isnull=True).order_by("termin__start"):
+    for usage in termin_usages.select_related("termin").order_by("termin__start"):
         all_usages[usage.pk] = {
             "termin_id": usage.termin.id,
-            "resource_id": usage.resource.pk,
+            "resource_id": usage.resource_id,
             "termin_label": usage.termin.label,
             "approved": usage.approved,
         }
 
-        usages[usage.resource.pk].append((usage.termin.start, "start", "3-direct", usage.pk))
-        usages[usage.resource.pk].append((usage.termin.end, "end", "3-direct", usage.pk))
-        for upper in _get_upper_resources(usage.resource.pk):
+        usages[usage.resource_id].append((usage.termin.start, "start", "3-direct", usage.pk))
+        usages[usage.resource_id].append((usage.termin.end, "end", "3-direct", usage.pk))
+        # without the resource of the usage itself
+        for upper in list(tree.traverse_up(usage.resource_id))[1:]:
             usages[upper].append((usage.termin.start, "start", "1-part", usage.pk))
             usages[upper].append((usage.termin.end, "end", "1-part", usage.pk))
 
-        for lower in _get_lower_resources(usage.resource):
+        for lower in list(tree.traverse_down(usage.resource_id))[1:]:
             usages[lower].append((usage.termin.start, "start", "2-super", usage.pk))
             usages[lower].append((usage.termin.end, "end", "2-super", usage.pk))
 
@@ -72,7 +78,7 @@ def fetch_usages(request):
     # resource pk => list of (continous) tuples (duration, kind, ResourceUsage)
     usage_bars = {}
 
-    for resource_id in parents.keys():
+    for resource_id in resource_ids:
         pos = start
         resource_usages = usages[resource_id]
         # make sure usage bars always stretch till end
@@ -105,9 +111,72 @@ def fetch_usages(request):
         "total": (end - start).total_seconds(),
         "usages": all_usages,
         "usage_bars": usage_bars,
+        "free_resources": [resource_id for resource_id, usage_bar in usage_bars.items()
+                           if all(kind == "free" for _, kind, _ in usage_bar)],
     })
 
 
+@require_POST
+@require_jwt_login
+def fetch_approval_preview(request):
+    """Evaluate approval of an unsaved Termin without writing anything.
+
+    See ResourceUsage.preview_approvals.
+    """
+    try:
+        start = timezone.make_aware(datetime.strptime(request.POST["start"], "%Y-%m-%dT%H:%M"), None)
+        end = timezone.make_aware(datetime.strptime(request.POST["end"], "%Y-%m-%dT%H:%M"), None)
+        resource_ids = {int(resource_id) for resource_id in request.POST.getlist("resources")}
+        termin_id = int(request.POST["termin"]) if request.POST.get("termin") else None
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "unexpected arguments"})
+
+    resources = models.Resource.objects.filter(pk__in=resource_ids)
+
+    preview = {}
+    for resource, approval in models.ResourceUsage.preview_approvals(
+            start, end, resources, models.User.get(request), termin_id).items():
+        voting_groups = approval["voting_groups"]
+        informed = voting_groups.pop("", [])
+        preview[resource.pk] = {
+            "label": resource.label,
+            "self_regulating": approval["self_regulating"],
+            "voting_groups": [{
+                "label": voting_group,
+                "users": sorted({str(manager_user) for _, manager_user in manager_users}),
+                "own_vote": voting_group not in approval["missing_voting_groups"],
+            } for voting_group, manager_users in sorted(voting_groups.items())],
+            "informed": sorted({str(manager_user) for _, manager_user in informed}),
+            "conflicts": [{
+                "usage_id": usage.pk,
+                "termin_label": usage.termin.label,
+                "resource_label": usage.resource.label,
+                "owner": str(usage.termin.owner or ""),
+                "approved": usage.approved,
+            } for usage in approval["conflicts"]],
+            "auto_approve": approval["approved"],
+        }
+
+    return JsonResponse({"resources": preview})
+
+
+@require_GET
+@require_jwt_login
+def fetch_termin_labels(request):
+    """Suggest previously used labels starting with q for TerminForm."""
+    prefix = request.GET.get("q", "")
+    if len(prefix.strip()) < 2:
+        return JsonResponse({"labels": []})
+
+    return JsonResponse({"labels": [
+        {"label": termin_label.label,
+         "count": termin_label.count,
+         "duration": termin_label.duration.total_seconds(),
+         "resources": termin_label.resource_ids}
+        for termin_label in models.TerminLabel.search(prefix)
+    ]})
+
+
 @method_decorator(require_jwt_login, name="dispatch")
 class UebersichtView(TemplateView):
     template_name = "reservierung/start.html"
@@ -212,6 +281,17 @@ class UebersichtView(TemplateView):
             yield resource, next_usage, blocked, until
 
 
+@method_decorator(require_jwt_login, name="dispatch")
+class UserSettingsView(UpdateView):
+    model = models.User
+    fields = ("digest",)
+    template_name = "reservierung/user_settings.html"
+    success_url = reverse_lazy("reservierung:start")
+
+    def get_object(self):
+        return models.User.get(self.request)
+
+
 def update_url(request, params):
     get = request.GET.copy()
     for k, v in params.items():
@@ -412,6 +492,12 @@ class CalendarView(TemplateView):
         return context
 
 
+def _shift_local(value, delta):
+    # shift in local wall-clock time, so a series keeps its time of day
+    # across daylight saving time changes
+    return timezone.make_aware(timezone.make_naive(value) + delta)
+
+
 class TerminForm(forms.ModelForm):
     confirm_warnings = forms.BooleanField(
         label="Ich weiß was ich tue und möchte die angezeigten Warnungen ignorieren.",
@@ -423,23 +509,122 @@ class TerminForm(forms.ModelForm):
         choices=lambda: [(resource.pk, resource.label)
                          for resource in models.Resource.objects.all()],
     )
+    repeat = forms.ChoiceField(
+        label="Wiederholung",
+        required=False,
+        choices=[
+            ("", "Keine Wiederholung"),
+            ("weekly", "Wöchentlich"),
+            ("biweekly", "Alle zwei Wochen"),
+            ("dates", "An folgenden Tagen"),
+        ],
+    )
+    repeat_until = forms.DateField(
+        label="Wiederholen bis",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}, format="%Y-%m-%d"),
+    )
+    repeat_dates = forms.CharField(
+        label="Weitere Tage",
+        help_text="Ein Datum pro Zeile im Format TT.MM.JJJJ.",
+        required=False,
+        widget=forms.Textarea(attrs={"rows": 4, "cols": 15}),
+    )
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, update_repeated=False, check_conflicts=True, **kwargs):
         super().__init__(*args, **kwargs)
+        self.update_repeated = update_repeated and self.instance.pk is not None
+        # callers validating many Termine at once may check conflicts batched
+        self.check_conflicts = check_conflicts
+        # list of (field, message), warnings are errors unless confirmed
+        self.warnings = []
 
         self.fields["description"].widget.attrs.update({"rows": 4, "cols": 15})
         for field in ("start", "end"):
             self.fields[field].widget.input_type = "datetime-local"
             self.fields[field].widget.format = "%Y-%m-%dT%H:%M"
 
+        # series can only be created, existing ones get edited together
+        if self.instance.pk:
+            for field in ("repeat", "repeat_until", "repeat_dates"):
+                del self.fields[field]
+
     class Meta:
         model = models.Termin
         fields = ("label", "description", "start", "end")
 
+    def clean_repeat_dates(self):
+        dates = []
+        for line in self.cleaned_data["repeat_dates"].splitlines():
+            if not line.strip():
+                continue
+            try:
+                dates.append(datetime.strptime(line.strip(), "%d.%m.%Y").date())
+            except ValueError:
+                raise ValidationError(f"Ungültiges Datum: {line.strip()}")
+        return dates
+
+    def _build_occurrences(self, start, end):
+        """List (Termin or None, start, end) for all Termine to save."""
+        if self.instance.pk:
+            if not self.update_repeated:
+                return [(self.instance, start, end)]
+
+            # apply changes to all upcoming Termine of the series relative
+            # to their own times
+            start_delta = timezone.make_naive(start) - timezone.make_naive(self.instance.start)
+            end_delta = timezone.make_naive(end) - timezone.make_naive(self.instance.end)
+            series = self.instance.get_series().filter(
+                owner=self.instance.owner,
+                end__gte=timezone.now(),
+            ).exclude(pk=self.instance.pk)
+            return [(self.instance, start, end)] + [
+                (termin, _shift_local(termin.start, start_delta), _shift_local(termin.end, end_delta))
+                for termin in series]
+
+        repeat = self.cleaned_data.get("repeat")
+        if repeat in ("weekly", "biweekly"):
+            repeat_until = self.cleaned_data.get("repeat_until")
+            if repeat_until is None:
+                self.add_error("repeat_until", "Bitte gib an, bis wann der Termin wiederholt werden soll.")
+                return []
+
+            if repeat_until <= timezone.localtime(start).date():
+                self.add_error("repeat_until", "Das Ende der Wiederholung muss nach dem Termin liegen.")
+                return []
+
+            step = timedelta(weeks=1 if repeat == "weekly" else 2)
+            deltas = []
+            delta = timedelta()
+            while (timezone.localtime(start) + delta).date() <= repeat_until:
+                deltas.append(delta)
+                delta += step
+                if len(deltas) > models.SERIES_MAX_TERMINE:
+                    break
+        elif repeat == "dates":
+            start_date = timezone.localtime(start).date()
+            deltas = [timedelta()] + sorted({date - start_date
+                                             for date in self.cleaned_data.get("repeat_dates", [])
+                                             if date != start_date})
+            if len(deltas) == 1:
+                self.add_error("repeat_dates", "Bitte gib mindestens einen weiteren Tag an.")
+                return []
+        else:
+            deltas = [timedelta()]
+
+        if len(deltas) > models.SERIES_MAX_TERMINE:
+            self.add_error("repeat", f"Eine Serie darf höchstens {models.SERIES_MAX_TERMINE} Termine umfassen.")
+            return []
+
+        return [(None, _shift_local(start, delta), _shift_local(end, delta)) for delta in deltas]
+
     def clean(self):
         data = super().clean()
         warnings = []
 
+        if "start" not in data or "end" not in data:
+            return data
+
         if data["start"] > timezone.now() + timedelta(days=60):
             warnings.append(("start", "Der Termin liegt mehr als 60 Tage in der Zukunft."))
 
@@ -447,7 +632,9 @@ class TerminForm(forms.ModelForm):
             warnings.append(("start", "Der Termin liegt in der Vergangenheit."))
 
         if data["end"] <= data["start"]:
+            # removes end from data, so further checks are not possible
             self.add_error("end", "Ende liegt vor angegebener Startzeit.")
+            return data
 
         if data["end"] - data["start"] > timedelta(days=30):
             warnings.append(("end", "Der Termin dauert länger als 30 Tage an."))
@@ -455,19 +642,25 @@ class TerminForm(forms.ModelForm):
         if not data.get("resources"):
             warnings.append(("resources", "Keine Resourcen angegeben"))
 
+        self.occurrences = self._build_occurrences(data["start"], data["end"])
+        own_termine = {termin.pk for termin, _, _ in self.occurrences if termin is not None}
+        intervals = [(start, end) for _, start, end in self.occurrences]
+
         for resource_id in data.get("resources"):
             resource = models.Resource.objects.get(pk=resource_id)
-            usages = models.ResourceUsage.find_related(
-                data["start"],
-                data["end"],
-                [resource],
-            )
-
-            if self.instance.pk:
-                usages = usages.exclude(termin=self.instance)
-
-            if usages.exists():
+            # check all Termine of a series at once
+            blocked = []
+            if self.check_conflicts:
+                blocked = [start
+                           for (start, _), usages in zip(intervals, models.ResourceUsage.find_related_intervals(
+                               intervals, [resource]))
+                           if any(usage.termin_id not in own_termine for usage in usages)]
+
+            if len(intervals) == 1 and blocked:
                 warnings.append(("resources", f"Die Ressource {resource.label} ist in dem Zeitraum bereits blockiert."))
+            elif blocked:
+                blocked_dates = ", ".join(f"{timezone.localtime(start):%d.%m.%Y}" for start in blocked)
+                warnings.append(("resources", f"Die Ressource {resource.label} ist an {len(blocked)} Terminen der Serie bereits blockiert: {blocked_dates}"))
 
             # preference of mtw ov before pkw ov
             if resource_id == "24" and "25" not in data.get("resources"):
@@ -479,6 +672,7 @@ class TerminForm(forms.ModelForm):
                 if not mtw_usages.exists():
                     warnings.append(("resources", "Bitte wähle den PKW OV nur aus, wenn du dieses Fahrzeug zwingend benötigst oder der MTW OV nicht mehr verfügbar ist."))
 
+        self.warnings = warnings
         if warnings and not self.cleaned_data.get("confirm_warnings", False):
             self.fields["confirm_warnings"].widget = forms.CheckboxInput()
             for field, description in warnings:
@@ -486,6 +680,47 @@ class TerminForm(forms.ModelForm):
 
         return data
 
+    def recheck_warnings(self) -> bool:
+        """Validate again, new warnings have to be confirmed as well."""
+        confirmed_warnings = self.warnings
+        self.full_clean()
+        if self.is_valid() and any(warning not in confirmed_warnings for warning in self.warnings):
+            self.data = self.data.copy()
+            self.data.pop("confirm_warnings", None)
+            self.full_clean()
+        return self.is_valid()
+
+
+def create_termine(termine: list[tuple[models.Termin, list[models.Resource]]], user: models.User,
+                   notifications: models.UsageNotifications | None = None) -> list[models.Termin]:
+    """Create many Termine with their usages and request approvals.
+
+    Termine, usages and log messages are created in bulk. Resources must be
+    locked by the caller.
+    """
+    created_termine = models.Termin.objects.bulk_create([termin for termin, _ in termine])
+
+    usages = models.ResourceUsage.objects.bulk_create([
+        models.ResourceUsage(termin=termin, resource=resource)
+        for termin, (_, resources) in zip(created_termine, termine)
+        for resource in resources
+    ])
+    # bulk_create does not send signals
+    models.ResourceUsageConflict.update_for(usages)
+    models.ResourceDailyUsage.update_for_usages(usages)
+
+    models.ResourceUsageLogMessage.objects.bulk_create(
+        models.ResourceUsageLogMessage(
+            usage=usage, kind=models.ResourceUsageLogMessage.META, user=user,
+            message=f"Anfrage für {timerange_filter(usage.termin.start, usage.termin.end)} erstellt.")
+        for usage in usages
+    )
+
+    for usage in usages:
+        usage.request_approvals(user, notifications)
+
+    return created_termine
+
 
 @method_decorator(require_jwt_login, name="dispatch")
 class TerminFormView(FormView):
@@ -506,13 +741,16 @@ class TerminFormView(FormView):
                                  owner=models.User.get(self.request))
 
     def get_form_kwargs(self):
-        return {"instance": self.object, **super().get_form_kwargs()}
+        return {"instance": self.object,
+                "update_repeated": "update_repeated" in self.request.POST,
+                **super().get_form_kwargs()}
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
 
         context["object"] = self.object
         context["resources"] = list(_build_resources(part_of__isnull=True))
+        context["resource_tags"] = models.ResourceTag.objects.all()
 
         context["selected_resources"] = []
         if self.request.POST:
@@ -527,60 +765,102 @@ class TerminFormView(FormView):
 
         return context
 
+    def post(self, *args, **kwargs):
+        # keep locks of form_valid until all changes are committed, create
+        # log messages at once
+        with transaction.atomic(), models.ResourceUsageLogMessage.buffered():
+            return super().post(*args, **kwargs)
+
     def form_valid(self, form):
         user = models.User.get(self.request)
+        target_resource_ids = {int(pk) for pk in form.cleaned_data.get("resources", [])}
 
-        # as form is a ModelForm, its instance attribute already contains changed values
+        # serialise changes with concurrent bookings of related resources
+        resource_ids = set(target_resource_ids)
+        resource_ids.update(models.ResourceUsage.objects.filter(
+            termin__in=[termin for termin, _, _ in form.occurrences if termin is not None],
+        ).values_list("resource", flat=True))
+        models.Resource.lock(models.Resource.objects.filter(pk__in=resource_ids))
+
+        # conflicts were checked before locking, concurrent bookings may have
+        # been saved in the meantime
+        if not form.recheck_warnings():
+            return self.form_invalid(form)
+
+        # inform managers once per series instead of once per Termin
+        notifications = models.UsageNotifications() if len(form.occurrences) > 1 else None
 
         if self.object:
-            # refetch current values for comparision
-            termin = self._get_object()
-
-            # save new values, otherwise get_conflicts can result in errors due to inconsitency
-            # (e.g. setting new time so that a conflict gets resolved => get_conflicts will work
-            # with old data)
-            form.instance.save()
-
-            if termin.start != form.instance.start or termin.end != form.instance.end:
-                for usage in form.instance.usages.all():
-                    if termin.start > form.instance.start or termin.end < form.instance.end:
-                        # range exceeded, revoke confirmations
-                        usage.log(models.ResourceUsageLogMessage.META, user,
-                                  f"Anfragezeitraum auf {timerange_filter(form.instance.start, form.instance.end)} erweitert.")
-                        usage.confirmations.all().delete()
-                        usage.request_approvals(user)
-                    else:
-                        # range must be shortened, check if conflict could be resolved
-                        usage.log(models.ResourceUsageLogMessage.META, user,
-                                  f"Anfragezeitraum auf {timerange_filter(form.instance.start, form.instance.end)} verkürzt.")
-
-                        for conflict, _, _ in usage.get_conflicts()[0]:
-                            conflict.update_state()
-                        usage.update_state()
-
-            # fields have already been updated during form clean
+            for termin, start, end in form.occurrences:
+                self._update_termin(termin, form.cleaned_data, start, end,
+                                    target_resource_ids, user, notifications)
+            self.success_url = self.object.get_absolute_url()
         else:
-            form.instance.owner = user
-            form.instance.save()
+            termine = self._create_termine(form.cleaned_data, form.occurrences,
+                                           target_resource_ids, user, notifications)
+            self.success_url = termine[0].get_absolute_url()
 
-        self.success_url = form.instance.get_absolute_url()
+        if notifications is not None:
+            notifications.send()
 
-        current_resource_ids = {int(usage.resource.pk) for usage in form.instance.usages.all()}
-        target_resource_ids = {int(pk) for pk in form.cleaned_data.get("resources", [])}
+        return super().form_valid(form)
+
+    def _create_termine(self, data, occurrences, resource_ids, user, notifications):
+        repeat_uuid = uuid.uuid4()
+        resources = list(models.Resource.objects.filter(pk__in=resource_ids))
+        return create_termine([
+            (models.Termin(repeat_uuid=repeat_uuid, label=data["label"], description=data["description"],
+                           owner=user, start=start, end=end), resources)
+            for _, start, end in occurrences
+        ], user, notifications)
+
+    def _update_termin(self, termin, data, start, end, target_resource_ids, user, notifications):
+        # refetch current values for comparision, as termin may already
+        # contain changed values of the form
+        previous = models.Termin.objects.get(pk=termin.pk)
+
+        # remember conflicts before saving, as saving new values will
+        # update conflicts (e.g. a conflict gets resolved by shortening)
+        previous_conflicts = {usage.pk: [conflict for conflict, _, _ in usage.get_conflicts()[0]]
+                              for usage in previous.usages.all()}
+
+        termin.label = data["label"]
+        termin.description = data["description"]
+        termin.start = start
+        termin.end = end
+        termin.save()
+
+        if previous.start != termin.start or previous.end != termin.end:
+            for usage in termin.usages.all():
+                if previous.start > termin.start or previous.end < termin.end:
+                    # range exceeded, revoke confirmations
+                    usage.log(models.ResourceUsageLogMessage.META, user,
+                              f"Anfragezeitraum auf {timerange_filter(termin.start, termin.end)} erweitert.")
+                    usage.confirmations.all().delete()
+                    usage.request_approvals(user, notifications)
+                else:
+                    # range must be shortened, check if conflict could be resolved
+                    usage.log(models.ResourceUsageLogMessage.META, user,
+                              f"Anfragezeitraum auf {timerange_filter(termin.start, termin.end)} verkürzt.")
+
+                    for conflict in previous_conflicts.get(usage.pk, []):
+                        conflict.refresh_from_db()
+                        conflict.update_state(notifications)
+                    usage.update_state(notifications)
+
+        current_resource_ids = {int(usage.resource.pk) for usage in termin.usages.all()}
 
         for resource_id in current_resource_ids - target_resource_ids:
             resource = models.Resource.objects.get(pk=resource_id)
-            form.instance.remove_usage(resource, user)
+            termin.remove_usage(resource, user, notifications)
 
         # create new resources
         for resource_id in target_resource_ids - current_resource_ids:
             resource = models.Resource.objects.get(pk=resource_id)
-            usage = models.ResourceUsage.objects.create(termin=form.instance, resource=resource)
+            usage = models.ResourceUsage.objects.create(termin=termin, resource=resource)
             usage.log(models.ResourceUsageLogMessage.META, user,
-                      f"Anfrage für {timerange_filter(form.instance.start, form.instance.end)} erstellt.")
-            usage.request_approvals(user)
-
-        return super().form_valid(form)
+                      f"Anfrage für {timerange_filter(termin.start, termin.end)} erstellt.")
+            usage.request_approvals(user, notifications)
 
 
 @method_decorator(require_jwt_login, name="dispatch")
@@ -591,13 +871,26 @@ class TerminDeleteView(DeleteView):
     def get_queryset(self):
         return super().get_queryset().filter(owner=models.User.get(self.request))
 
+    def post(self, *args, **kwargs):
+        # keep locks of form_valid until all changes are committed, create
+        # log messages at once
+        with transaction.atomic(), models.ResourceUsageLogMessage.buffered():
+            return super().post(*args, **kwargs)
+
     def form_valid(self, form):
+        models.Resource.lock(models.Resource.objects.filter(usages__termin=self.object))
+
+        conflicts = {conflict
+                     for usage in self.object.usages.all()
+                     for conflict, _, _ in usage.get_conflicts()[0]}
+
+        response = super().form_valid(form)
+
         # check if conflicting usages may now be resolved
-        for usage in self.object.usages.all():
-            for conflict, _, _ in usage.get_conflicts()[0]:
-                conflict.update_state()
+        for conflict in conflicts:
+            conflict.update_state()
 
-        return super().form_valid(form)
+        return response
 
 
 @method_decorator(require_jwt_login, name="dispatch")
@@ -611,25 +904,33 @@ class TerminDetailView(DetailView):
         context["usages"] = []
 
         resources = set()
-        for usage in self.object.usages.all():
+        for usage in self.object.usages.select_related("resource"):
             resources.add(usage.resource)
             context["usages"].append(usage)
 
-        related_usages = models.ResourceUsage.find_related(
-            self.object.start, self.object.end, resources
-        ).exclude(termin=self.object)
+        prefetch_approval_schemes(context["usages"])
 
-        context["conflicts"] = []
-        for usage in related_usages:
-            conflict_start, conflict_end = self.object.get_overlap(usage.termin)
-            context["conflicts"].append((usage, conflict_start, conflict_end))
+        conflicts = models.ResourceUsageConflict.objects.filter(
+            usage__termin=self.object,
+        ).select_related(
+            "conflicting__termin__owner", "conflicting__resource",
+        ).order_by("conflicting__termin__start")
+
+        # a usage may conflict with multiple usages of this termin
+        context["conflicts"] = list({
+            conflict.conflicting.pk: (conflict.conflicting, conflict.start, conflict.end)
+            for conflict in conflicts
+        }.values())
 
         context["comments"] = models.ResourceUsageConfirmation.objects.filter(
             Q(resource_usage__termin=self.object) &
             Q(revoked_at__isnull=True) &
             ~Q(comment="")).order_by("created_at")
 
-        context["log_messages"] = models.ResourceUsageLogMessage.objects.filter(usage__termin=self.object).order_by("timestamp")
+        context["log_messages"] = models.ResourceUsageLogMessage.objects.filter(
+            usage__termin=self.object,
+        ).select_related("user", "usage__resource", "usage__termin").order_by("timestamp")
+        context["archived_usages"] = self.object.archived_usages.select_related("resource")
 
         return context
 
@@ -665,7 +966,7 @@ class ResourceUsageDetailView(DetailView):
             Q(revoked_at__isnull=True) & ~Q(comment=""),
         ).order_by("created_at")
 
-        context["log_messages"] = self.object.log_messages.order_by("timestamp")
+        context["log_messages"] = self.object.log_messages.select_related("user").order_by("timestamp")
 
         return context
 
@@ -687,6 +988,14 @@ class ResourceUsageConfirmView(FormView):
         context["object"] = self.object
         return context
 
+    def post(self, *args, **kwargs):
+        # serialise changes with concurrent bookings of related resources,
+        # create log messages at once
+        with transaction.atomic(), models.ResourceUsageLogMessage.buffered():
+            models.Resource.lock([self.object.resource])
+            self.object.refresh_from_db()
+            return super().post(*args, **kwargs)
+
     def get_confirmation_queryset(self, user):
         return self.object.confirmations.filter(
             revoked_at__isnull=True,
@@ -782,22 +1091,24 @@ class ResourceUsageRejectView(ResourceUsageConfirmView):
         if not self.object.resource.is_admin(user):
             raise Http404
 
+        # rejected usages have no conflicts, so fetch them first
+        related_usages = list(models.ResourceUsage.objects.filter(
+            conflict_pairs__conflicting=self.object,
+            approved_at__isnull=True,
+        ))
+
+        self.object.send_reject()
+
         self.object.rejected_at = timezone.now()
         self.object.rejected_by = user
         self.object.save(update_fields=["rejected_at", "rejected_by"])
-        self.object.send_reject()
 
         self.object.log(models.ResourceUsageLogMessage.REJECTS, user,
                         "Abgelehnt.")
 
         # check related usages waiting for confirmation (which could maybe be
         # auto-accepted now)
-        related_usages = models.ResourceUsage.find_related(
-            self.object.termin.start,
-            self.object.termin.end,
-            [self.object.resource],
-        )
-        for related_usage in related_usages.filter(approved_at__isnull=True):
+        for related_usage in related_usages:
             related_usage.update_state()
 
         return super().form_valid(form)
@@ -827,8 +1138,172 @@ class ResourceUsageRevertRejectView(ResourceUsageConfirmView):
         return super().form_valid(form)
 
 
+class ResourceUsageBulkForm(forms.Form):
+    usages = forms.ModelMultipleChoiceField(
+        queryset=models.ResourceUsage.objects.none(),
+        widget=forms.CheckboxSelectMultiple(),
+        label="Buchungen",
+    )
+
+    def __init__(self, *args, usages, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["usages"].queryset = usages
+        self.fields["usages"].label_from_instance = lambda usage: (
+            f"{usage.resource.label} für {usage.termin.label} "
+            f"({timerange_filter(usage.termin.start, usage.termin.end)}) von {usage.termin.owner}")
+
+
+class ResourceUsageBulkVoteForm(ResourceUsageBulkForm, ResourceUsageVoteForm):
+    pass
+
+
+class ResourceUsageBulkMixin:
+    """Change many usages at once.
+
+    Views define queryset (usages in a state allowing the change, checked
+    again after locking) and get_candidates(user) returning the usages the
+    user may change.
+    """
+
+    template_name = "reservierung/resourceusage_bulk.html"
+    form_class = ResourceUsageBulkForm
+    success_url = reverse_lazy("reservierung:start")
+    queryset = None
+    title = None
+    submit_label = None
+    submit_class = None
+
+    def get_changeable(self):
+        return self.queryset.filter(termin__end__gte=timezone.now())
+
+    def post(self, *args, **kwargs):
+        # keep locks of form_valid until all changes are committed, create
+        # log messages at once
+        with transaction.atomic(), models.ResourceUsageLogMessage.buffered():
+            return super().post(*args, **kwargs)
+
+    def lock_usages(self, usages: list[models.ResourceUsage]) -> list[models.ResourceUsage]:
+        # serialise changes with concurrent bookings of related resources,
+        # usages may have been changed meanwhile
+        models.Resource.lock(usage.resource for usage in usages)
+        return list(self.get_changeable().filter(
+            pk__in=[usage.pk for usage in usages],
+        ).select_related("termin", "termin__owner", "resource").order_by("termin__start"))
+
+    def get_form_kwargs(self):
+        # checking permissions once for all usages, a usage missing in the
+        # candidates results in a validation error
+        candidates = self.get_candidates(models.User.get(self.request))
+        usages = models.ResourceUsage.objects.filter(
+            pk__in=[usage.pk for usage in candidates],
+        ).select_related("termin", "termin__owner", "resource").order_by("termin__start")
+        return {"usages": usages, **super().get_form_kwargs()}
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        context["title"] = self.title
+        context["submit_label"] = self.submit_label
+        context["submit_class"] = self.submit_class
+        return context
+
+
+@method_decorator(require_jwt_login, name="dispatch")
+class ResourceUsageBulkVoteView(ResourceUsageBulkMixin, FormView):
+    form_class = ResourceUsageBulkVoteForm
+    queryset = models.ResourceUsage.objects.filter(approved_at__isnull=True, rejected_at__isnull=True)
+    title = "Sammelzustimmung"
+    submit_label = "Zustimmen"
+    submit_class = "btn-success"
+
+    def get_candidates(self, user):
+        return models.ResourceUsage.filter_may_vote(
+            self.get_changeable().select_related("termin", "resource"),
+            user,
+        )
+
+    def form_valid(self, form):
+        user = models.User.get(self.request)
+        usages = list(form.cleaned_data["usages"])
+        comment = form.cleaned_data["comment"]
+
+        # usages may have been voted for concurrently
+        usages = models.ResourceUsage.filter_may_vote(self.lock_usages(usages), user)
+
+        models.ResourceUsageConfirmation.objects.bulk_create(
+            models.ResourceUsageConfirmation(resource_usage=usage, approver=user, comment=comment)
+            for usage in usages
+        )
+
+        comment_note = f'mit Kommentar "{comment}"' if comment else "ohne Kommentar"
+        models.ResourceUsageLogMessage.objects.bulk_create(
+            models.ResourceUsageLogMessage(usage=usage, kind=models.ResourceUsageLogMessage.VOTES,
+                                           user=user, message=f"Sammelzustimmung {comment_note}.")
+            for usage in usages
+        )
+
+        # possibly confirm usages, but inform everybody only once
+        notifications = models.UsageNotifications()
+        for usage in usages:
+            usage.update_state(notifications)
+        notifications.send()
+
+        return super().form_valid(form)
+
+
+@method_decorator(require_jwt_login, name="dispatch")
+class ResourceUsageBulkRejectView(ResourceUsageBulkMixin, FormView):
+    queryset = models.ResourceUsage.objects.filter(rejected_at__isnull=True)
+    title = "Sammelablehnung"
+    submit_label = "Ablehnen"
+    submit_class = "btn-danger"
+
+    def get_candidates(self, user):
+        admin_resources = set()
+        for manager in models.ResourceManager.objects.filter(admin=True, funktion__user=user):
+            admin_resources.update(manager.resource.traverse_down())
+
+        return self.get_changeable().filter(resource__in=admin_resources)
+
+    def form_valid(self, form):
+        user = models.User.get(self.request)
+        usages = list(form.cleaned_data["usages"])
+
+        usages = self.lock_usages(usages)
+
+        # rejected usages have no conflicts, so fetch them first
+        related_usages = set(models.ResourceUsage.objects.filter(
+            conflict_pairs__conflicting__in=usages,
+            approved_at__isnull=True,
+        ).exclude(pk__in=[usage.pk for usage in usages]))
+
+        models.ResourceUsage.send_summary(usages, models.SUMMARY_REJECTED)
+
+        now = timezone.now()
+        models.ResourceUsage.objects.filter(
+            pk__in=[usage.pk for usage in usages],
+        ).update(rejected_at=now, rejected_by=user)
+        for usage in usages:
+            usage.rejected_at = now
+            usage.rejected_by = user
+        models.ResourceUsageConflict.update_for(usages)
+        models.ResourceDailyUsage.update_for_usages(usages)
+
+        models.ResourceUsageLogMessage.objects.bulk_create(
+            models.ResourceUsageLogMessage(usage=usage, kind=models.ResourceUsageLogMessage.REJECTS,
+                                           user=user, message="Abgelehnt (Sammelablehnung).")
+            for usage in usages
+        )
+
+        # check related usages waiting for confirmation (which could maybe be
+        # auto-accepted now), but only once
+        for related_usage in related_usages:
+            related_usage.update_state()
+
+        return super().form_valid(form)
+
+
 def _build_resources(**kwargs):
-    for resource in models.Resource.objects.filter(**kwargs).order_by("label"):
+    for resource in models.Resource.objects.filter(**kwargs).prefetch_related("tags").order_by("label"):
         children = [(child, depth + 1, child_count)
                     for child, depth, child_count in _build_resources(part_of=resource)]
 
@@ -859,12 +1334,16 @@ class ResourceListView(ListView):
                                  depth,
                                  children)
                                 for resource, depth, children in _build_resources(part_of__isnull=True)]
+        context["resource_tags"] = models.ResourceTag.objects.all()
+
         return context
 
 
 @method_decorator(require_jwt_login, name="dispatch")
 class ResourceDetailView(DetailView):
     model = models.Resource
+    # years before and after the current one with a heatmap
+    heatmap_years = 10
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
@@ -875,4 +1354,52 @@ class ResourceDetailView(DetailView):
             [self.object],
         ).order_by("termin__start")[:3]
 
+        context.update(self.get_heatmap_context())
+
         return context
+
+    def get_year(self):
+        current_year = timezone.localdate().year
+        try:
+            year = int(self.request.GET["year"])
+        except KeyError:
+            return current_year
+        except ValueError:
+            raise Http404
+
+        if abs(year - current_year) > self.heatmap_years:
+            raise Http404
+        return year
+
+    def get_heatmap_context(self):
+        # only read the aggregates, usages may be many or even archived
+        year = self.get_year()
+        daily_usages = {daily_usage.date: daily_usage
+                        for daily_usage in self.object.daily_usages.filter(date__year=year)}
+
+        def _level(daily_usage):
+            if daily_usage is None:
+                return 0
+            hours = daily_usage.booked_seconds / 3600
+            return 1 if hours <= 2 else 2 if hours <= 4 else 3 if hours <= 8 else 4
+
+        # one row per weekday, one column per week
+        first_day = date(year, 1, 1)
+        day = first_day - timedelta(days=first_day.weekday())
+        rows = [[] for _ in range(7)]
+        while day.year <= year:
+            for weekday in range(7):
+                daily_usage = daily_usages.get(day)
+                rows[weekday].append((day if day.year == year else None, daily_usage, _level(daily_usage)))
+                day += timedelta(days=1)
+
+        current_year = timezone.localdate().year
+        return {
+            "heatmap_year": year,
+            "heatmap_previous_year": year - 1 if year - 1 >= current_year - self.heatmap_years else None,
+            "heatmap_next_year": year + 1 if year + 1 <= current_year + self.heatmap_years else None,
+            "heatmap_rows": list(zip(["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"], rows)),
+            "heatmap_booked_hours": sum(daily_usage.booked_seconds for daily_usage in daily_usages.values()) / 3600,
+            "heatmap_approved_hours": sum(daily_usage.approved_seconds for daily_usage in daily_usages.values()) / 3600,
+            "heatmap_days": len(daily_usages),
+        }